@@ -1,29 +1,229 @@
 import os
-from amadeus import Client, ResponseError
-
-def init_amadeus():
-    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
-    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-    
-    amadeus = Client(
-        client_id=amadeus_api_key,
-        client_secret=amadeus_api_secret,
-        hostname ="production"
+import json
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from apis.amadeus_client import init_amadeus
+import apis.cache
+from apis.cache import cache, CACHE_BACKEND
+from apis.coalesce import single_flight
+from apis.resilience import call_upstream, UpstreamError
+from apis.tracing import span, propagate
+from helpers import geohash
+from helpers.geo_ranking import haversine_km, extract_coords
+
+# Spatial cache settings: activities are stored per geohash tile (precision 5
+# is roughly a 5 km x 5 km cell) in memory and as one JSON file per tile.
+ACTIVITY_TILE_PRECISION = int(os.getenv("ACTIVITY_TILE_PRECISION", "5"))
+ACTIVITY_CACHE_TTL = int(os.getenv("ACTIVITY_CACHE_TTL", str(24 * 3600)))
+# Largest radius of one upstream query (Amadeus accepts up to 20 km); missing
+# tiles are filled by as few queries of at most this radius as cover them
+ACTIVITY_MAX_RADIUS_KM = int(os.getenv("ACTIVITY_MAX_RADIUS_KM", "20"))
+ACTIVITY_CACHE_DIR = os.getenv(
+    "ACTIVITY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "activities")
+)
+
+@single_flight
+def _query_activities(lat, lon, radius_km):
+    """Raw Amadeus Tours & Activities query; raises UpstreamError on failure."""
+    amadeus = init_amadeus()
+    response = call_upstream(
+        "amadeus.activities",
+        amadeus.shopping.activities.get,
+        latitude=lat,
+        longitude=lon,
+        radius=radius_km
     )
-    return amadeus
+    return response.data or []
 
 def find_activities(lat, lon, radius_km=3):
     """
     Use Amadeus Tours & Activities around a lat/lon.
     """
-    amadeus = init_amadeus()
     try:
-        response = amadeus.shopping.activities.get(
-            latitude=lat,
-            longitude=lon,
-            radius=radius_km
+        return _query_activities(lat, lon, radius_km)
+    except UpstreamError as e:
+        print(f"Amadeus Activities Query Error: {e}")
+        return []
+
+
+class ActivityTileCache:
+    """
+    Activities keyed by geohash tile. Missing tiles are filled together by
+    one upstream query whose circle covers all of them (split into groups of
+    neighbouring tiles when that would exceed 'max_radius_km'); each tile
+    keeps the activities that fall inside its cell, so a cached tile is
+    complete and tiles can be unioned for any query circle.
+
+    Tiles live in memory plus one JSON file each, or, when 'store' is given
+    (the shared SQLite cache of apis.cache), only in that store so worker
+    processes share them instead of each holding a copy.
+    """
+
+    def __init__(self, precision=ACTIVITY_TILE_PRECISION, ttl=ACTIVITY_CACHE_TTL,
+                 cache_dir=ACTIVITY_CACHE_DIR, max_workers=8, store=None,
+                 max_radius_km=ACTIVITY_MAX_RADIUS_KM):
+        self.precision = precision
+        self.max_radius_km = max_radius_km
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.store = store
+        self._tiles = {}  # tile -> (fetched_at, activities)
+        self._lock = threading.Lock()
+
+    # -- storage -----------------------------------------------------------
+    def _path(self, tile):
+        return os.path.join(self.cache_dir, f"{tile}.json")
+
+    def _store_key(self, tile):
+        return f"activity_tile:{tile}"
+
+    def get(self, tile):
+        """Cached activities of 'tile', or None if missing or expired."""
+        if self.store is not None:
+            hit, activities = self.store.get(self._store_key(tile))
+            return activities if hit else None
+        now = time.time()
+        with self._lock:
+            entry = self._tiles.get(tile)
+        if entry is None and self.cache_dir:
+            try:
+                with open(self._path(tile)) as f:
+                    stored = json.load(f)
+                entry = (stored["fetched_at"], stored["activities"])
+                with self._lock:
+                    self._tiles[tile] = entry
+            except (OSError, ValueError, KeyError):
+                entry = None
+        if entry is None or now - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def put(self, tile, activities):
+        if self.store is not None:
+            self.store.set(self._store_key(tile), activities, self.ttl)
+            return
+        entry = (time.time(), activities)
+        with self._lock:
+            self._tiles[tile] = entry
+        if self.cache_dir:
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                # Unique per writer: coalesced callers may store the same tile at once
+                tmp_path = f"{self._path(tile)}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump({"fetched_at": entry[0], "activities": activities}, f)
+                os.replace(tmp_path, self._path(tile))
+            except OSError as e:
+                print(f"Activity cache write error for tile {tile}: {e}")
+
+    def clear(self):
+        """Forget every tile (memory and files; the shared store is left alone)."""
+        with self._lock:
+            self._tiles.clear()
+        if self.store is None and self.cache_dir and os.path.isdir(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    # -- fetching ----------------------------------------------------------
+    @staticmethod
+    def _query_circle(tiles):
+        """(lat, lon, radius_km) of a query circle covering every cell of 'tiles'."""
+        cells = [geohash.bounds(tile) for tile in tiles]
+        lat_lo, lat_hi = min(c[0] for c in cells), max(c[1] for c in cells)
+        lon_lo, lon_hi = min(c[2] for c in cells), max(c[3] for c in cells)
+        c_lat, c_lon = (lat_lo + lat_hi) / 2, (lon_lo + lon_hi) / 2
+        # Farthest corner of the bounding box, rounded up to the whole km Amadeus expects
+        corner_km = haversine_km(c_lat, c_lon, [lat_lo, lat_lo, lat_hi, lat_hi], [lon_lo, lon_hi, lon_lo, lon_hi]).max()
+        return c_lat, c_lon, int(corner_km) + 1
+
+    def _query_groups(self, tiles):
+        """'tiles' split into groups of neighbours that one query of at most max_radius_km covers."""
+        groups, pending = [], [sorted(tiles)]
+        while pending:
+            group = pending.pop()
+            if len(group) == 1 or self._query_circle(group)[2] <= self.max_radius_km:
+                groups.append(group)
+                continue
+            # Split by the next geohash character: cells sharing it are adjacent
+            depth = len(os.path.commonprefix(group)) + 1
+            parents = {}
+            for tile in group:
+                parents.setdefault(tile[:depth], []).append(tile)
+            pending.extend(parents.values())
+        return groups
+
+    def _fill_tiles(self, tiles):
+        """Fetch 'tiles' with one upstream query and store the activities of each."""
+        c_lat, c_lon, radius_km = self._query_circle(tiles)
+        activities = _query_activities(c_lat, c_lon, radius_km)
+        lats, lons = extract_coords(activities)
+        filled = {tile: [] for tile in tiles}
+        for act, a_lat, a_lon in zip(activities, lats, lons):
+            if math.isnan(a_lat) or math.isnan(a_lon):
+                continue
+            inside = filled.get(geohash.encode(a_lat, a_lon, self.precision))
+            if inside is not None:
+                inside.append(act)
+        for tile, inside in filled.items():
+            self.put(tile, inside)
+        return [act for inside in filled.values() for act in inside]
+
+    def find(self, lat, lon, radius_km):
+        """
+        Activities within 'radius_km' of (lat, lon): union of the covering
+        tiles (fetching only the missing ones, usually with a single query),
+        then filtered by exact distance and sorted nearest first.
+        """
+        tiles = geohash.covering_cells(lat, lon, radius_km, self.precision)
+        found, missing = [], []
+        with span("cache", "activity_tiles") as s:
+            for tile in tiles:
+                cached = self.get(tile)
+                if cached is None:
+                    missing.append(tile)
+                else:
+                    found.extend(cached)
+            s.tags.update(tiles=len(tiles), missing=len(missing))
+
+        if missing:
+            groups = self._query_groups(missing)
+            with ThreadPoolExecutor(max_workers=min(len(groups), self.max_workers)) as executor:
+                for activities in executor.map(propagate(self._fill_tiles), groups):
+                    found.extend(activities)
+
+        if not found:
+            return []
+        lats, lons = extract_coords(found)
+        distances = haversine_km(lat, lon, lats, lons)
+        order = sorted(
+            (i for i in range(len(found)) if distances[i] <= radius_km),
+            key=lambda i: distances[i]
         )
-        return response.data
-    except ResponseError as e:
+        return [found[i] for i in order]
+
+
+activity_cache = ActivityTileCache(store=cache if CACHE_BACKEND == "sqlite" else None)
+
+
+def use_cache_backend(backend):
+    """apis.cache.use_backend(backend), also moving the activity tiles to the shared store when "sqlite"."""
+    store = apis.cache.use_backend(backend)
+    activity_cache.store = store if backend == "sqlite" else None
+    return store
+
+def find_activities_cached(lat, lon, radius_km=3):
+    """
+    Same contract as find_activities, served from the geohash tile cache.
+    Activities without coordinates cannot be placed in a tile and are skipped.
+    """
+    try:
+        return activity_cache.find(lat, lon, radius_km)
+    except UpstreamError as e:
         print(f"Amadeus Activities Query Error: {e}")
-        return []
\ No newline at end of file
+        return []
@@ -0,0 +1,254 @@
+import os
+import json
+import gzip
+import hashlib
+from flask import Blueprint, Response, request
+
+from activities_api import find_activities_cached
+from apis.flight_api import guess_airport_code, find_flights, find_flights_multi, nearby_airport_codes
+from apis.geolocate_api import geocode_place, coordinate_search_for
+from apis.hotel_api import get_hotels_in_city, get_hotel_offers, flatten_hotel_offers
+from helpers.bundle_optimizer import parse_duration_minutes
+from helpers.geo_ranking import rank_candidates
+from helpers.llm_helpers_sol import parse_location, process_user_input
+
+# Versioned JSON API mirroring the wizard steps. Unlike the pages, every
+# endpoint is stateless (all inputs in the query string), so clients can
+# fetch steps in parallel and HTTP caches can store the answers:
+#   GET /api/v1/classify?q=...                    step 1
+#   GET /api/v1/location?q=...                    steps 2-3
+#   GET /api/v1/airport?city=...[&nearby=1]       step 4
+#   GET /api/v1/flights?origin=&dest=&dep=...     step 6
+#   GET /api/v1/hotels?city_code=[&lat=&lon=]     step 7 (hotel list)
+#   GET /api/v1/offers?hotel_ids=&check_in=...    step 7 (offers)
+#   GET /api/v1/activities?lat=&lon=              step 8
+# Responses are compact JSON with a weak ETag of the payload; a request whose
+# If-None-Match still matches gets an empty 304. Bodies larger than
+# API_GZIP_MIN_BYTES are gzipped for clients that accept it.
+API_GZIP_MIN_BYTES = int(os.getenv("API_GZIP_MIN_BYTES", "512"))
+API_GZIP_LEVEL = int(os.getenv("API_GZIP_LEVEL", "6"))
+
+# Seconds clients may reuse an answer before revalidating it. Reference data
+# (locations, airports, hotel lists) changes slowly; prices do not.
+MAX_AGE_REFERENCE = int(os.getenv("API_MAX_AGE_REFERENCE", "3600"))
+MAX_AGE_PRICES = int(os.getenv("API_MAX_AGE_PRICES", "60"))
+
+api_v1 = Blueprint("api_v1", __name__, url_prefix="/api/v1")
+
+
+class ApiError(Exception):
+    """Invalid request; answered as {"error": message} with 'status'."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@api_v1.errorhandler(ApiError)
+def _api_error(e):
+    return Response(json.dumps({"error": e.message}), status=e.status, mimetype="application/json")
+
+
+def _arg(name, required=True, kind=str, default=None):
+    value = request.args.get(name, "").strip()
+    if not value:
+        if required:
+            raise ApiError(f"missing query parameter '{name}'")
+        return default
+    try:
+        return kind(value)
+    except ValueError:
+        raise ApiError(f"invalid value for '{name}': {value!r}")
+
+
+def _flag(name):
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+
+def _codes(name):
+    return [c.strip().upper() for c in request.args.get(name, "").split(",") if c.strip()]
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def api_response(payload, max_age):
+    """
+    Compact JSON for 'payload' with a weak ETag (the same for the plain and
+    the gzipped body), 304 on a matching If-None-Match, gzip when accepted.
+    """
+    body = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    etag = hashlib.sha1(body).hexdigest()[:20]
+
+    response = Response(mimetype="application/json")
+    response.set_etag(etag, weak=True)
+    response.cache_control.max_age = max_age
+    response.vary.add("Accept-Encoding")
+    if request.if_none_match.contains_weak(etag):
+        response.status_code = 304
+        return response
+
+    if len(body) >= API_GZIP_MIN_BYTES and "gzip" in request.accept_encodings:
+        body = gzip.compress(body, API_GZIP_LEVEL)
+        response.content_encoding = "gzip"
+    response.set_data(body)
+    return response
+
+
+# -- payload builders --------------------------------------------------------
+def flight_payload(offer):
+    """Structured Amadeus flight offer (what step 6 pre-renders as text)."""
+    price = offer.get("price", {})
+    itineraries = []
+    for itinerary in offer.get("itineraries", []):
+        segments = [{
+            "from": seg.get("departure", {}).get("iataCode"),
+            "to": seg.get("arrival", {}).get("iataCode"),
+            "departure": seg.get("departure", {}).get("at"),
+            "arrival": seg.get("arrival", {}).get("at"),
+            "carrier": seg.get("carrierCode"),
+            "number": seg.get("number"),
+            "duration_minutes": parse_duration_minutes(seg.get("duration")),
+        } for seg in itinerary.get("segments", [])]
+        itineraries.append({
+            "duration_minutes": parse_duration_minutes(itinerary.get("duration")),
+            "stops": max(len(segments) - 1, 0),
+            "segments": segments,
+        })
+    return {
+        "id": offer.get("id"),
+        "price": _float(price.get("grandTotal")),
+        "currency": price.get("currency", "USD"),
+        "seats": offer.get("numberOfBookableSeats"),
+        "airline": (offer.get("validatingAirlineCodes") or [None])[0],
+        "itineraries": itineraries,
+    }
+
+
+def _coords(record):
+    geo = record.get("geoCode") or {}
+    return _float(geo.get("latitude")), _float(geo.get("longitude"))
+
+
+def _ranked(records, lat, lon, prices=None, limit=None):
+    if lat is None or lon is None:
+        return [(r, None) for r in (records[:limit] if limit else records)]
+    return rank_candidates(records, lat, lon, prices=prices, k=limit)
+
+
+def _km(dist_km):
+    return round(float(dist_km), 2) if dist_km is not None else None
+
+
+# -- endpoints ---------------------------------------------------------------
+@api_v1.route("/classify", methods=["GET"])
+def classify():
+    """Step 1: which service the request is for."""
+    return api_response({"service": process_user_input(_arg("q"))}, MAX_AGE_REFERENCE)
+
+
+@api_v1.route("/location", methods=["GET"])
+def location():
+    """Steps 2-3: parsed location and its coordinates."""
+    loc_parsed = parse_location(_arg("q"))
+    geo = geocode_place(coordinate_search_for(loc_parsed)) if loc_parsed.get("city") else None
+    return api_response({
+        "city": loc_parsed.get("city", ""),
+        "state": loc_parsed.get("state", ""),
+        "country": loc_parsed.get("country", ""),
+        "clarifications": loc_parsed.get("clarifications", ""),
+        "lat": geo["latitude"] if geo else None,
+        "lon": geo["longitude"] if geo else None,
+    }, MAX_AGE_REFERENCE)
+
+
+@api_v1.route("/airport", methods=["GET"])
+def airport():
+    """Step 4: IATA code for a city (and its nearby airports with nearby=1)."""
+    city = _arg("city")
+    payload = {"code": guess_airport_code(city)}
+    if _flag("nearby"):
+        payload["nearby"] = nearby_airport_codes(city)
+    return api_response(payload, MAX_AGE_REFERENCE)
+
+
+@api_v1.route("/flights", methods=["GET"])
+def flights():
+    """
+    Step 6: flight offers, cheapest first. origin_codes/dest_codes
+    (comma-separated) search every pair instead of origin/dest.
+    """
+    dep, ret = _arg("dep"), _arg("ret", required=False)
+    search_kwargs = {
+        "max_price": _arg("max_price", required=False, kind=int),
+        "adults": _arg("adults", required=False, kind=int, default=1),
+        "travel_class": _arg("travel_class", required=False),
+        "non_stop": _flag("non_stop"),
+    }
+    origin_codes, dest_codes = _codes("origin_codes"), _codes("dest_codes")
+    if origin_codes and dest_codes:
+        offers = find_flights_multi(origin_codes, dest_codes, dep, ret, **search_kwargs)
+    else:
+        offers = find_flights(_arg("origin").upper(), _arg("dest").upper(), dep, ret, **search_kwargs)
+    payload = sorted((flight_payload(f) for f in offers or []),
+                     key=lambda f: f["price"] if f["price"] is not None else float("inf"))
+    return api_response({"flights": payload}, MAX_AGE_PRICES)
+
+
+@api_v1.route("/hotels", methods=["GET"])
+def hotels():
+    """Step 7: hotels of a city code, closest to (lat, lon) first when given."""
+    lat = _arg("lat", required=False, kind=float)
+    lon = _arg("lon", required=False, kind=float)
+    hotels_data = get_hotels_in_city(_arg("city_code").upper(),
+                                     radius_km=_arg("radius_km", required=False, kind=int, default=10)) or []
+    payload = []
+    for h, dist_km in _ranked(hotels_data, lat, lon, limit=_arg("limit", required=False, kind=int, default=50)):
+        h_lat, h_lon = _coords(h)
+        payload.append({"id": h.get("hotelId", ""), "name": h.get("name", ""),
+                        "lat": h_lat, "lon": h_lon, "distance_km": _km(dist_km)})
+    return api_response({"hotels": payload}, MAX_AGE_REFERENCE)
+
+
+@api_v1.route("/offers", methods=["GET"])
+def offers():
+    """Step 7: priced offers for up to a few hotel ids, cheapest first."""
+    hotel_ids = _codes("hotel_ids")
+    if not hotel_ids:
+        raise ApiError("missing query parameter 'hotel_ids'")
+    offers_data = get_hotel_offers(
+        hotel_ids,
+        check_in=_arg("check_in"),
+        check_out=_arg("check_out", required=False),
+        adults=_arg("adults", required=False, kind=int, default=1),
+        rooms=_arg("rooms", required=False, kind=int, default=1),
+        price_range=_arg("price_range", required=False)
+    )
+    payload = [dict(offer, price=_float(offer["price"])) for offer in flatten_hotel_offers(offers_data)]
+    payload.sort(key=lambda o: o["price"] if o["price"] is not None else float("inf"))
+    return api_response({"offers": payload}, MAX_AGE_PRICES)
+
+
+@api_v1.route("/activities", methods=["GET"])
+def activities():
+    """Step 8: activities around (lat, lon), ranked by distance and price."""
+    lat, lon = _arg("lat", kind=float), _arg("lon", kind=float)
+    acts_data = find_activities_cached(lat, lon, radius_km=_arg("radius_km", required=False, kind=int, default=5))
+    prices = [act.get("price", {}).get("amount") for act in acts_data]
+    payload = []
+    for act, dist_km in _ranked(acts_data, lat, lon, prices=prices,
+                                limit=_arg("limit", required=False, kind=int, default=30)):
+        a_lat, a_lon = _coords(act)
+        payload.append({
+            "id": act.get("id"),
+            "name": act.get("name", ""),
+            "price": _float(act.get("price", {}).get("amount")),
+            "currency": act.get("price", {}).get("currencyCode"),
+            "lat": a_lat, "lon": a_lon, "distance_km": _km(dist_km),
+        })
+    return api_response({"activities": payload}, MAX_AGE_PRICES)
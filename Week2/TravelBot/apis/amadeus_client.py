@@ -0,0 +1,55 @@
+import os
+import threading
+
+from apis.resilience import attempt_timeout
+
+# Socket timeout of Amadeus HTTP calls made outside call_upstream; inside it
+# each call gets what is left of its attempt's deadline instead
+AMADEUS_HTTP_TIMEOUT = float(os.getenv("AMADEUS_HTTP_TIMEOUT", "10"))
+
+# One client per configuration for the whole process: a client fetches its
+# access token on first use and keeps it until it expires, so a new client
+# per call would cost an extra token request every time
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _urlopen(request):
+    """urlopen with a timeout: the amadeus client's default has none, so a hung call never returns."""
+    from urllib.request import urlopen
+
+    return urlopen(request, timeout=attempt_timeout(AMADEUS_HTTP_TIMEOUT))
+
+
+def init_amadeus():
+    """
+    Amadeus client for the production API, or for any Amadeus-compatible
+    host given by AMADEUS_HOST / AMADEUS_PORT / AMADEUS_SSL (e.g. the
+    benchmark stub servers in benchmarks/). The client is shared by every
+    caller with the same configuration.
+    """
+    from amadeus import Client  # deferred: see preload.py
+
+    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
+    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
+
+    options = {}
+    if os.getenv("AMADEUS_HOST"):
+        options = {
+            "host": os.getenv("AMADEUS_HOST"),
+            "port": int(os.getenv("AMADEUS_PORT", "443")),
+            "ssl": os.getenv("AMADEUS_SSL", "1") == "1",
+        }
+
+    key = (amadeus_api_key, amadeus_api_secret, tuple(sorted(options.items())))
+    with _clients_lock:
+        amadeus = _clients.get(key)
+        if amadeus is None:
+            amadeus = _clients[key] = Client(
+                client_id=amadeus_api_key,
+                client_secret=amadeus_api_secret,
+                hostname ="production",
+                http=_urlopen,
+                **options
+            )
+    return amadeus
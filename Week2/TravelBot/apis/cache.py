@@ -0,0 +1,199 @@
+import os
+import copy
+import json
+import time
+import hashlib
+import functools
+import inspect
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from apis.coalesce import normalize
+from apis.tracing import span
+
+# Result cache for slow lookups whose answers rarely change (LLM location
+# parsing, airport codes, geocoding, hotel lists). Empty results are not
+# cached: our API wrappers return [] / None on errors too, and an outage must
+# not be remembered as "no hotels in Paris".
+
+CACHE_MAX_ENTRIES = int(os.getenv("TRAVELBOT_CACHE_MAX_ENTRIES", "10000"))
+
+# "memory": one cache per process (development server).
+# "sqlite": one cache file shared by every worker process on the host, so
+# adding workers neither duplicates entries nor dilutes the hit rate.
+CACHE_BACKEND = os.getenv("TRAVELBOT_CACHE_BACKEND", "memory")
+CACHE_DB_PATH = os.getenv(
+    "TRAVELBOT_CACHE_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "cache.sqlite3")
+)
+
+DAY = 24 * 3600
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU with per-entry expiry."""
+
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (hit, value)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, copy.deepcopy(entry[1])
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    Cross-process cache in a SQLite file in WAL mode: readers never block
+    the writer, and with mmap the pages live once in the OS page cache no
+    matter how many workers read them. Values are stored as JSON.
+    """
+
+    def __init__(self, path=CACHE_DB_PATH, max_entries=CACHE_MAX_ENTRIES * 10):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def _conn(self):
+        # One connection per thread and per process: connections must not
+        # cross a fork (the app is preloaded in the server's master process)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """Return (hit, value)."""
+        try:
+            row = self._conn().execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Cache read error: {e}")
+            return False, None
+        if row is None or row[1] < time.time():
+            return False, None
+        return True, json.loads(row[0])
+
+    def set(self, key, value, ttl):
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl)
+            )
+            self._writes += 1
+            if self._writes % 1000 == 0:
+                self.evict()
+        except sqlite3.Error as e:
+            print(f"Cache write error: {e}")
+
+    def evict(self):
+        """Drop expired entries, then the soonest-expiring ones over max_entries."""
+        conn = self._conn()
+        conn.execute("DELETE FROM cache WHERE expires_at < ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache")
+
+    def __len__(self):
+        return self._conn().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+cache = SQLiteCache() if CACHE_BACKEND == "sqlite" else MemoryCache()
+
+
+def use_backend(backend):
+    """
+    Replace the process-wide cache with a 'backend' one ("memory" or
+    "sqlite") and return it. For commands that take the backend as a flag:
+    call it from main(), before the first lookup. The web app picks its
+    backend from TRAVELBOT_CACHE_BACKEND at import instead.
+    """
+    global cache, CACHE_BACKEND
+    if backend not in ("memory", "sqlite"):
+        raise ValueError(f"Unknown cache backend {backend!r}")
+    if backend != CACHE_BACKEND:
+        CACHE_BACKEND = backend
+        # Re-read the path: a command loads .env after this module was imported
+        cache = SQLiteCache(os.getenv("TRAVELBOT_CACHE_DB", CACHE_DB_PATH)) if backend == "sqlite" else MemoryCache()
+    return cache
+
+# Hit/miss counters per namespace, reported by the warm-up command
+cache_stats = {}
+
+
+def make_key(namespace, arguments):
+    payload = json.dumps(normalize(arguments), default=repr, separators=(",", ":"))
+    return f"{namespace}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+
+def cached(namespace, ttl):
+    """
+    Decorator caching fn's non-empty results for 'ttl' seconds, keyed by its
+    normalized arguments (same normalization as request coalescing).
+    """
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = make_key(namespace, bound.arguments)
+            stats = cache_stats.setdefault(namespace, {"hit": 0, "miss": 0})
+
+            with span("cache", namespace) as s:
+                hit, value = cache.get(key)
+                s.tags["hit"] = hit
+            if hit:
+                stats["hit"] += 1
+                return value
+            stats["miss"] += 1
+            value = fn(*args, **kwargs)
+            if value:
+                cache.set(key, value, ttl)
+            return value
+
+        wrapper.cache_namespace = namespace
+        return wrapper
+    return decorate
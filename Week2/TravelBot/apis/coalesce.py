@@ -0,0 +1,92 @@
+import copy
+import functools
+import inspect
+import threading
+
+# Single-flight request coalescing: concurrent calls of the same function with
+# the same normalized arguments share one upstream call. The first caller runs
+# it; everyone arriving while it is in flight waits and gets a copy of its
+# result (or its exception).
+
+_inflight = {}
+_lock = threading.Lock()
+
+# Counters for monitoring: upstream calls made vs. calls served by another
+# caller's in-flight request.
+coalesce_stats = {"leader": 0, "shared": 0}
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+def normalize(value):
+    """
+    Make an argument hashable and insensitive to cosmetic differences:
+    strings are stripped and case-folded, floats rounded to 6 decimals
+    (~0.1 m for coordinates), lists/tuples/sets and dicts become tuples.
+    """
+    if isinstance(value, str):
+        return " ".join(value.split()).casefold()
+    if isinstance(value, bool) or value is None or isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, (list, tuple)):
+        return tuple(normalize(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(normalize(v) for v in value))
+    if isinstance(value, dict):
+        return tuple(sorted((k, normalize(v)) for k, v in value.items()))
+    return repr(value)
+
+
+def single_flight(fn):
+    """Decorator coalescing concurrent identical calls of 'fn'."""
+    signature = inspect.signature(fn)
+    name = f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (name, normalize(bound.arguments))
+
+        with _lock:
+            call = _inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _inflight[key] = _Call()
+                coalesce_stats["leader"] += 1
+            else:
+                call.waiters += 1
+                coalesce_stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            # Callers may mutate what they get back, so followers get a copy
+            return copy.deepcopy(call.result)
+
+        result = None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with _lock:
+                _inflight.pop(key, None)
+            # No new waiters can join now; snapshot the result before the
+            # leader's caller gets a chance to mutate it
+            if call.waiters and call.error is None:
+                call.result = copy.deepcopy(result)
+            call.done.set()
+
+    return wrapper
@@ -1,19 +1,21 @@
 import os
-from amadeus import Client, ResponseError
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from apis.amadeus_client import init_amadeus
+from apis.cache import cached, DAY
+from apis.coalesce import single_flight
+from apis.resilience import call_upstream, UpstreamError
+from apis.tracing import propagate
+
+# Multi-airport search budget: how many airports each side expands to and how
+# many origin x destination find_flights queries one search may fan out to.
+MULTI_AIRPORT_MAX_AIRPORTS = int(os.getenv("MULTI_AIRPORT_MAX_AIRPORTS", "3"))
+MULTI_AIRPORT_MAX_QUERIES = int(os.getenv("MULTI_AIRPORT_MAX_QUERIES", "6"))
 
-def init_amadeus():
-    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
-    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-    
-    amadeus = Client(
-        client_id=amadeus_api_key,
-        client_secret=amadeus_api_secret,
-        hostname ="production"
-    )
-    return amadeus
 
 #https://developers.amadeus.com/self-service/category/flights/api-doc/airline-code-lookup/api-reference
+@cached("guess_airport_code", ttl=7 * DAY)
+@single_flight
 def guess_airport_code(place_query: str):
     """
     Use Amadeus reference_data.locations to find possible airport/city codes
@@ -21,7 +23,9 @@ def guess_airport_code(place_query: str):
     """
     amadeus = init_amadeus()
     try:
-        response = amadeus.reference_data.locations.get(
+        response = call_upstream(
+            "amadeus.locations",
+            amadeus.reference_data.locations.get,
             keyword=place_query,
             subType="AIRPORT,CITY",
             page={"limit": 5}  # optionally increase/decrease
@@ -31,11 +35,12 @@ def guess_airport_code(place_query: str):
             return None
         # Just pick the first match for demonstration
         return data[0].get("iataCode")
-    except ResponseError as e:
+    except UpstreamError as e:
         print(f"Error guessing airport code for '{place_query}': {e}")
         return None
 
 #https://developers.amadeus.com/self-service/category/flights/api-doc/flight-offers-search/api-reference
+@single_flight
 def find_flights(origin_code, dest_code, departure_date,
                  return_date=None, max_price=None,
                  adults=1, travel_class=None, non_stop=False):
@@ -68,9 +73,122 @@ def find_flights(origin_code, dest_code, departure_date,
             # If the Amadeus API supports 'nonStop' param, set it:
             flight_params["nonStop"] = True
 
-        response = amadeus.shopping.flight_offers_search.get(**flight_params)
+        response = call_upstream("amadeus.flight_offers", amadeus.shopping.flight_offers_search.get, **flight_params)
         return response.data
-    except ResponseError as e:
+    except UpstreamError as e:
         print(f"Amadeus Flight Query Error: {e}")
         print("Params used:", flight_params)
         return []
+
+
+#https://developers.amadeus.com/self-service/category/flights/api-doc/airport-nearest-relevant/api-reference
+@cached("nearby_airport_codes", ttl=7 * DAY)
+@single_flight
+def nearby_airport_codes(place_query: str, limit=MULTI_AIRPORT_MAX_AIRPORTS):
+    """
+    Expand 'place_query' (a city name or an IATA code) to the set of airports
+    that serve it. The keyword matches come first, followed by the airports
+    Amadeus ranks as most relevant around the top match's coordinates.
+    Returns a list of at most 'limit' unique IATA codes (possibly empty).
+    """
+    amadeus = init_amadeus()
+    codes = []
+    try:
+        response = call_upstream(
+            "amadeus.locations",
+            amadeus.reference_data.locations.get,
+            keyword=place_query,
+            subType="AIRPORT,CITY",
+            page={"limit": 5}
+        )
+        data = response.data or []
+        for loc in data:
+            if loc.get("subType") == "AIRPORT" and loc.get("iataCode"):
+                codes.append(loc["iataCode"])
+
+        geo = data[0].get("geoCode", {}) if data else {}
+        if geo.get("latitude") is not None and geo.get("longitude") is not None:
+            response = call_upstream(
+                "amadeus.airports",
+                amadeus.reference_data.locations.airports.get,
+                latitude=geo["latitude"],
+                longitude=geo["longitude"]
+            )
+            for loc in response.data or []:
+                if loc.get("iataCode"):
+                    codes.append(loc["iataCode"])
+    except UpstreamError as e:
+        print(f"Error finding nearby airports for '{place_query}': {e}")
+
+    unique_codes = []
+    for code in codes:
+        if code not in unique_codes:
+            unique_codes.append(code)
+    return unique_codes[:limit]
+
+
+def _offer_key(offer):
+    """Identify an offer by its flown segments so the same itinerary found
+    through two airport pairs is only listed once."""
+    return tuple(
+        (
+            seg.get("carrierCode"), seg.get("number"),
+            seg.get("departure", {}).get("iataCode"), seg.get("departure", {}).get("at"),
+        )
+        for itin in offer.get("itineraries", [])
+        for seg in itin.get("segments", [])
+    )
+
+
+def _offer_price(offer):
+    try:
+        return float(offer.get("price", {}).get("grandTotal", "inf"))
+    except (TypeError, ValueError):
+        return float("inf")
+
+
+@single_flight
+def find_flights_multi(origin_codes, dest_codes, departure_date,
+                       return_date=None, max_queries=MULTI_AIRPORT_MAX_QUERIES,
+                       on_progress=None, **search_kwargs):
+    """
+    Multi-airport search: run find_flights for every origin x destination pair
+    concurrently and merge the offers into one list.
+      - origin_codes / dest_codes: lists of IATA codes, most relevant first
+      - max_queries: cap on the total number of find_flights calls; pairs made
+        of the most relevant airports are searched first
+      - on_progress: optional callback(done, total, offers_so_far) invoked as
+        each pair's search completes, with the merged offers ranked so far
+      - search_kwargs: forwarded to find_flights (max_price, adults, ...)
+    Offers found through several pairs are deduplicated (cheapest copy kept),
+    ranked by price and re-numbered so their ids stay unique.
+    """
+    pairs = [
+        (i + j, origin, dest)
+        for i, origin in enumerate(origin_codes)
+        for j, dest in enumerate(dest_codes)
+        if origin != dest
+    ]
+    pairs = [(origin, dest) for _, origin, dest in sorted(pairs, key=lambda p: p[0])]
+    pairs = pairs[:max(1, max_queries)]
+    if not pairs:
+        return []
+
+    merged = {}
+    with ThreadPoolExecutor(max_workers=len(pairs)) as executor:
+        futures = [
+            executor.submit(propagate(find_flights), origin, dest, departure_date, return_date, **search_kwargs)
+            for origin, dest in pairs
+        ]
+        for done, future in enumerate(as_completed(futures), start=1):
+            for offer in future.result() or []:
+                key = _offer_key(offer)
+                if key not in merged or _offer_price(offer) < _offer_price(merged[key]):
+                    merged[key] = offer
+            if on_progress is not None:
+                on_progress(done, len(pairs), sorted(merged.values(), key=_offer_price))
+
+    ranked = sorted(merged.values(), key=_offer_price)
+    for i, offer in enumerate(ranked, start=1):
+        offer["id"] = str(i)
+    return ranked
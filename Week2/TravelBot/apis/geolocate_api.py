@@ -1,11 +1,33 @@
-import requests
+import os
 
+from apis.cache import cached, DAY
+from apis.coalesce import single_flight
+from apis.resilience import call_upstream, attempt_timeout, get_policy, UpstreamError
+
+# Overridable so benchmarks can point geocoding at a local stub
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+
+def _nominatim_search(base_url, headers, params):
+    import requests  # deferred: see preload.py
+
+    # Socket timeout: what is left of this attempt's share of the deadline
+    response = requests.get(base_url, headers=headers, params=params,
+                            timeout=attempt_timeout(get_policy("nominatim.search")["deadline"]))
+    response.raise_for_status()
+    return response.json()
+
+def coordinate_search_for(loc_parsed):
+    """Free-form geocoding query built from a parse_location result."""
+    return f"{loc_parsed.get('city', '')} {loc_parsed.get('state', '')}, {loc_parsed.get('country', '')}"
+
+@cached("geocode_place", ttl=30 * DAY)
+@single_flight
 def geocode_place(place_query: str):
     """
     Make a GET request to Nominatim with the free-form query.
     Return lat/lon from the top match if found, plus the full display_name.
     """
-    base_url = "https://nominatim.openstreetmap.org/search"
+    base_url = NOMINATIM_URL
     params = {
         "q": place_query,
         "format": "json",
@@ -15,9 +37,8 @@ def geocode_place(place_query: str):
         "User-Agent": "YourAppName/1.0 (contact@yourdomain.com)"
     }
     try:
-        response = requests.get(base_url, headers=headers, params=params)
-        data = response.json()
-    except Exception as e:
+        data = call_upstream("nominatim.search", _nominatim_search, base_url, headers, params)
+    except UpstreamError as e:
         print(f"Nominatim request error: {e}")
         return None
 
@@ -1,19 +1,12 @@
-import os
-from amadeus import Client, ResponseError
+from apis.amadeus_client import init_amadeus
+from apis.cache import cached, DAY
+from apis.coalesce import single_flight
+from apis.resilience import call_upstream, UpstreamError
 
 
-def init_amadeus():
-    amadeus_api_key = os.getenv("AMADEUS_API_KEY")
-    amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-    
-    amadeus = Client(
-        client_id=amadeus_api_key,
-        client_secret=amadeus_api_secret,
-        hostname ="production"
-    )
-    return amadeus
-
 #https://developers.amadeus.com/self-service/category/hotels/api-doc/hotel-list/api-reference
+@cached("get_hotels_in_city", ttl=DAY)
+@single_flight
 def get_hotels_in_city(city_code: str, radius_km=10):
     """
     Use reference_data.locations.hotels.by_city to list hotels in that city.
@@ -21,17 +14,20 @@ def get_hotels_in_city(city_code: str, radius_km=10):
     """
     amadeus = init_amadeus()
     try:
-        response = amadeus.reference_data.locations.hotels.by_city.get(
+        response = call_upstream(
+            "amadeus.hotels_by_city",
+            amadeus.reference_data.locations.hotels.by_city.get,
             cityCode=city_code,
             radius=radius_km,
             radiusUnit="KM"
         )
         return response.data  # list of hotels
-    except ResponseError as e:
+    except UpstreamError as e:
         print(f"Error retrieving hotels by city: {e}")
         return []
     
 #https://developers.amadeus.com/self-service/category/hotels/api-doc/hotel-search/api-reference
+@single_flight
 def get_hotel_offers(
     hotel_ids,
     check_in,
@@ -65,8 +61,25 @@ def get_hotel_offers(
         if price_range:
             params["priceRange"] = price_range  # e.g., "200-300"
 
-        response = amadeus.shopping.hotel_offers_search.get(**params)
+        response = call_upstream("amadeus.hotel_offers", amadeus.shopping.hotel_offers_search.get, **params)
         return response.data
-    except ResponseError as e:
+    except UpstreamError as e:
         print(f"Error retrieving hotel offers: {e}")
-        return []
\ No newline at end of file
+        return []
+
+def flatten_hotel_offers(offers_data):
+    """Flatten v3 Hotel Search results into the offer dicts shown on step 7."""
+    offers = []
+    for item in offers_data or []:
+        if "offers" in item:
+            for o in item["offers"]:
+                offers.append({
+                    "id": o.get("id", "N/A"),
+                    "hotel_id": item.get("hotel", {}).get("hotelId", ""),
+                    "price": o.get("price", {}).get("total", "0"),
+                    "check_in": o.get("checkInDate", "N/A"),
+                    "check_out": o.get("checkOutDate", "N/A"),
+                    "rooms": o.get("room", {}).get("typeEstimated", {}).get("category", "N/A"),
+                    "guests": o.get("guests", {}).get("adults", "N/A")
+                })
+    return offers
@@ -0,0 +1,281 @@
+import os
+import time
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from apis.tracing import span
+
+# Shared resilience layer for every upstream call (Amadeus, Nominatim):
+#   - a per-endpoint deadline covering all attempts of one call
+#   - jittered exponential-backoff retries (all our upstream calls are reads)
+#   - a circuit breaker that fails fast while a provider keeps failing
+#   - optional hedging: a second attempt fires once the first one has taken
+#     longer than the endpoint's recent p95 latency
+#   - attempts run in a bounded thread pool; the HTTP call of an attempt gets
+#     attempt_timeout() as its socket timeout, so an abandoned attempt frees
+#     its thread soon after the deadline, and no hedge or retry is started
+#     while the pool is saturated
+# Failures surface as UpstreamError so callers need one except clause.
+
+
+class UpstreamError(Exception):
+    """An upstream call failed (after retries) or was not attempted."""
+
+
+class UpstreamTimeout(UpstreamError):
+    """The endpoint's deadline passed before any attempt succeeded."""
+
+
+class CircuitOpenError(UpstreamError):
+    """The endpoint's circuit breaker is open; the call was not attempted."""
+
+
+# Defaults per endpoint. Any field can be overridden from the environment,
+# e.g. UPSTREAM_AMADEUS_FLIGHT_OFFERS_DEADLINE=8 or UPSTREAM_NOMINATIM_SEARCH_HEDGE=0.
+DEFAULT_POLICY = {
+    "deadline": 5.0,          # seconds for the whole call, retries included
+    "retries": 2,             # extra attempts after the first one
+    "backoff_base": 0.2,      # seconds; attempt n sleeps U(0, base * 2**n)
+    "backoff_cap": 2.0,
+    "hedge": 1,               # 1 = fire a hedged attempt after the p95 delay
+    "hedge_after": 1.0,       # hedge delay until enough latencies are recorded
+    "failure_threshold": 5,   # consecutive failures that open the breaker
+    "reset_timeout": 30.0,    # seconds the breaker stays open
+}
+
+ENDPOINT_POLICIES = {
+    "amadeus.locations": {"deadline": 4.0},
+    "amadeus.airports": {"deadline": 4.0},
+    "amadeus.flight_offers": {"deadline": 12.0, "retries": 1, "hedge_after": 4.0},
+    "amadeus.hotels_by_city": {"deadline": 6.0},
+    "amadeus.hotel_offers": {"deadline": 12.0, "retries": 1, "hedge_after": 4.0},
+    "amadeus.activities": {"deadline": 8.0},
+    # Nominatim's usage policy allows ~1 request/second: no hedging
+    "nominatim.search": {"deadline": 4.0, "hedge": 0},
+}
+
+
+def get_policy(endpoint):
+    """Effective policy of 'endpoint': defaults, then endpoint table, then env."""
+    policy = dict(DEFAULT_POLICY)
+    policy.update(ENDPOINT_POLICIES.get(endpoint, {}))
+    prefix = "UPSTREAM_" + endpoint.upper().replace(".", "_") + "_"
+    for field, default in policy.items():
+        value = os.getenv(prefix + field.upper())
+        if value is not None:
+            policy[field] = type(default)(float(value))
+    return policy
+
+
+def is_retryable(exc):
+    """
+    Retry network failures, 429 and 5xx. Errors carrying a 'response'
+    attribute come from amadeus (ResponseError) or requests (RequestException);
+    anything else is a bug or a parse error and is not retried.
+    """
+    if isinstance(exc, TimeoutError):
+        return True
+    if not hasattr(exc, "response"):
+        return False
+    status = getattr(exc.response, "status_code", None)
+    return status is None or status == 429 or status >= 500
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open after a pause."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Rolling window of successful attempt latencies for p95 hedging."""
+
+    def __init__(self, size=200, min_samples=20):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def p95(self, default):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return default
+            ordered = sorted(self.samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+_breakers = {}
+_latencies = {}
+_registry_lock = threading.Lock()
+# Attempts run here so a hung upstream only pins a pool thread, never the
+# request thread past its deadline.
+UPSTREAM_MAX_THREADS = int(os.getenv("UPSTREAM_MAX_THREADS", "32"))
+_executor = ThreadPoolExecutor(max_workers=UPSTREAM_MAX_THREADS, thread_name_prefix="upstream")
+# Attempts submitted and not finished (running or queued)
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+# Deadline of the attempt running in the current pool thread
+_attempt = threading.local()
+
+
+def get_breaker(endpoint):
+    with _registry_lock:
+        if endpoint not in _breakers:
+            policy = get_policy(endpoint)
+            _breakers[endpoint] = CircuitBreaker(int(policy["failure_threshold"]), policy["reset_timeout"])
+        return _breakers[endpoint]
+
+
+def _get_latency(endpoint):
+    with _registry_lock:
+        return _latencies.setdefault(endpoint, LatencyTracker())
+
+
+def attempt_timeout(default):
+    """
+    Seconds left for the upstream attempt running in this thread, for use as
+    the HTTP call's timeout; 'default' outside call_upstream.
+    """
+    end = getattr(_attempt, "end", None)
+    if end is None:
+        return default
+    return max(end - time.monotonic(), 0.05)
+
+
+def pool_saturated():
+    """True when every upstream thread is busy: new attempts would only queue."""
+    with _in_flight_lock:
+        return _in_flight >= UPSTREAM_MAX_THREADS
+
+
+def _timed(fn, args, kwargs, end):
+    global _in_flight
+    try:
+        if time.monotonic() >= end:
+            # Queued behind hung attempts until its deadline: do not start it
+            raise TimeoutError("attempt expired in the upstream queue")
+        _attempt.end = end
+        start = time.monotonic()
+        result = fn(*args, **kwargs)
+        return result, time.monotonic() - start
+    finally:
+        _attempt.end = None
+        with _in_flight_lock:
+            _in_flight -= 1
+
+
+def _submit(fn, args, kwargs, end):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += 1
+    return _executor.submit(_timed, fn, args, kwargs, end)
+
+
+def _attempt_once(endpoint, policy, fn, args, kwargs, remaining):
+    """One (possibly hedged) attempt, bounded by 'remaining' seconds."""
+    end = time.monotonic() + remaining
+    futures = [_submit(fn, args, kwargs, end)]
+
+    if policy["hedge"]:
+        hedge_delay = _get_latency(endpoint).p95(policy["hedge_after"])
+        done, _ = wait(futures, timeout=min(hedge_delay, remaining))
+        if not done and not pool_saturated():
+            futures.append(_submit(fn, args, kwargs, end))
+
+    error = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(end - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        for future in done:
+            if future.exception() is None:
+                result, latency = future.result()
+                _get_latency(endpoint).record(latency)
+                return result
+            error = future.exception()
+    if error is not None and not pending:
+        raise error
+    raise TimeoutError(f"{endpoint} attempt timed out")
+
+
+def call_upstream(endpoint, fn, *args, **kwargs):
+    """
+    Call fn(*args, **kwargs) under the policy of 'endpoint'. Returns its
+    result or raises UpstreamError (UpstreamTimeout / CircuitOpenError).
+    """
+    with span("upstream", endpoint) as s:
+        policy = get_policy(endpoint)
+        breaker = get_breaker(endpoint)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint}: circuit open, failing fast")
+
+        deadline = time.monotonic() + policy["deadline"]
+        last_error = None
+        for attempt in range(int(policy["retries"]) + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            s.tags["attempts"] = attempt + 1
+            try:
+                result = _attempt_once(endpoint, policy, fn, args, kwargs, remaining)
+                breaker.record_success()
+                return result
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e):
+                    # The provider answered (e.g. 400/404): not an outage
+                    breaker.record_success()
+                    raise UpstreamError(f"{endpoint}: {e}") from e
+                breaker.record_failure()
+                if not breaker.allow() or pool_saturated():
+                    # A retry would only queue behind hung attempts
+                    break
+                backoff = random.uniform(0, min(policy["backoff_cap"], policy["backoff_base"] * 2 ** attempt))
+                time.sleep(max(0.0, min(backoff, deadline - time.monotonic())))
+
+        if last_error is None or isinstance(last_error, TimeoutError):
+            raise UpstreamTimeout(f"{endpoint}: no response within {policy['deadline']}s")
+        raise UpstreamError(f"{endpoint}: {last_error}") from last_error
@@ -0,0 +1,370 @@
+import os
+import sys
+import json
+import time
+import uuid
+import bisect
+import sqlite3
+import functools
+import threading
+import contextvars
+
+# Request-scoped tracing. Every request gets a root span; LLM calls, upstream
+# calls, cache lookups and template renders open child spans tagged with the
+# request's route and service. Finished spans are
+#   - written as JSON lines (TRAVELBOT_TRACE_LOG: "-" for stderr or a file
+#     path; empty, the default, disables the log), and
+#   - aggregated into histograms served at /metrics in the Prometheus text
+#     format. With TRAVELBOT_METRICS_BACKEND=sqlite every worker process
+#     copies its histograms to a shared SQLite file at most every
+#     METRICS_FLUSH_SECONDS (and before serving /metrics), and /metrics
+#     sums all workers, so a scrape hitting any worker sees the whole host.
+# TRAVELBOT_TRACING=0 turns spans into no-ops.
+TRACING_ENABLED = os.getenv("TRAVELBOT_TRACING", "1") == "1"
+TRACE_LOG = os.getenv("TRAVELBOT_TRACE_LOG", "")
+METRICS_BACKEND = os.getenv("TRAVELBOT_METRICS_BACKEND", "memory")
+METRICS_DB_PATH = os.getenv(
+    "TRAVELBOT_METRICS_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache", "metrics.sqlite3")
+)
+METRICS_FLUSH_SECONDS = float(os.getenv("TRAVELBOT_METRICS_FLUSH_SECONDS", "5"))
+
+# Histogram bucket upper bounds, in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_span = contextvars.ContextVar("travelbot_span", default=None)
+# {"route": ..., "service": ...} of the request being served
+_request_tags = contextvars.ContextVar("travelbot_request_tags", default={})
+
+
+class Span:
+    """One timed operation. 'tags' may be extended while the span is open."""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "kind", "name", "tags", "start", "duration", "error")
+
+    def __init__(self, kind, name, parent, tags):
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex[:16]
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.kind = kind
+        self.name = name
+        self.tags = tags
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id,
+            "kind": self.kind, "name": self.name, "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3), "error": self.error,
+            **_request_tags.get(), **self.tags,
+        }
+
+
+class _NoopSpan:
+    @property
+    def tags(self):
+        # A fresh dict each time: updates made by callers are dropped
+        return {}
+
+
+_NOOP = _NoopSpan()
+
+
+class Histograms:
+    """Thread-safe duration histograms keyed by (kind, name, route, service)."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum, errors]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, seconds, error=False):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 3)
+            series[index] += 1
+            series[-2] += seconds
+            if error:
+                series[-1] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def snapshot(self):
+        """{labels: series} copy of every series of this process."""
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self, snapshot=None, metric="travelbot_span_duration_seconds"):
+        """Prometheus text exposition of 'snapshot' (default: this process's series)."""
+        lines = [
+            f"# HELP {metric} Duration of traced operations (LLM, upstream, cache, template, request).",
+            f"# TYPE {metric} histogram",
+        ]
+        errors = []
+        if snapshot is None:
+            snapshot = self.snapshot()
+        for labels, series in sorted(snapshot.items()):
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{metric}_bucket{{{label_text},le="+Inf"}} {cumulative}')
+            lines.append(f"{metric}_sum{{{label_text}}} {series[-2]:.6f}")
+            lines.append(f"{metric}_count{{{label_text}}} {cumulative}")
+            errors.append(f"travelbot_span_errors_total{{{label_text}}} {series[-1]}")
+        lines += ["# HELP travelbot_span_errors_total Traced operations that raised.",
+                  "# TYPE travelbot_span_errors_total counter"] + errors
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+histograms = Histograms()
+
+
+class SQLiteMetricsStore:
+    """
+    Histogram series of every worker process in one SQLite file. Each worker
+    replaces its own rows with its cumulative series; read() sums them. Rows
+    of workers that exited are kept, so the summed counters never go down.
+    """
+
+    def __init__(self, path=METRICS_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS series ("
+            " worker TEXT, labels TEXT, counts TEXT, PRIMARY KEY (worker, labels))"
+        )
+
+    def _conn(self):
+        # Per thread and per process: never reuse a connection across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def write(self, worker, snapshot):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO series VALUES (?, ?, ?)",
+                [(worker, json.dumps(labels), json.dumps(series)) for labels, series in snapshot.items()]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def read(self):
+        """{labels: series} summed over all workers."""
+        merged = {}
+        for labels, counts in self._conn().execute("SELECT labels, counts FROM series"):
+            labels = tuple(tuple(pair) for pair in json.loads(labels))
+            series = json.loads(counts)
+            total = merged.get(labels)
+            merged[labels] = series if total is None else [a + b for a, b in zip(total, series)]
+        return merged
+
+    def clear(self):
+        self._conn().execute("DELETE FROM series")
+
+
+shared_metrics = SQLiteMetricsStore() if METRICS_BACKEND == "sqlite" else None
+
+_flush_lock = threading.Lock()
+_last_flush = 0.0
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+def _after_fork():
+    # The parent's series stay under the parent's worker id
+    global _worker_id, _last_flush
+    _worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    _last_flush = 0.0
+    histograms.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def flush_metrics(force=False):
+    """Copy this process's histograms to the shared store (throttled unless 'force')."""
+    global _last_flush
+    if shared_metrics is None:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < METRICS_FLUSH_SECONDS:
+        return
+    if not _flush_lock.acquire(blocking=force):
+        return
+    try:
+        _last_flush = now
+        shared_metrics.write(_worker_id, histograms.snapshot())
+    except sqlite3.Error as e:
+        print(f"Metrics flush error: {e}")
+    finally:
+        _flush_lock.release()
+
+
+def render_metrics():
+    """/metrics body: all workers' series with the shared store, else this process's."""
+    if shared_metrics is None:
+        return histograms.render()
+    flush_metrics(force=True)
+    return histograms.render(shared_metrics.read())
+
+_log_lock = threading.Lock()
+_log_file = None
+
+
+def _export(span):
+    global _log_file
+    if not TRACE_LOG:
+        return
+    line = json.dumps(span.to_dict(), default=str)
+    with _log_lock:
+        if TRACE_LOG == "-":
+            sys.stderr.write(line + "\n")
+            return
+        if _log_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(TRACE_LOG)), exist_ok=True)
+            _log_file = open(TRACE_LOG, "a", buffering=1)
+        _log_file.write(line + "\n")
+
+
+class span:
+    """
+    Context manager timing one operation:
+
+        with span("upstream", "amadeus.flight_offers") as s:
+            ...
+            s.tags["attempts"] = 2
+    """
+
+    __slots__ = ("kind", "name", "tags", "_span", "_token")
+
+    def __init__(self, kind, name, **tags):
+        self.kind = kind
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        if not TRACING_ENABLED:
+            self._span = None
+            return _NOOP
+        self._span = Span(self.kind, self.name, _current_span.get(), self.tags)
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb):
+        current = self._span
+        if current is None:
+            return False
+        current.duration = time.time() - current.start
+        if exc is not None:
+            current.error = type(exc).__name__
+        _current_span.reset(self._token)
+        request = _request_tags.get()
+        histograms.observe(
+            (("kind", current.kind), ("name", current.name),
+             ("route", request.get("route", "")), ("service", request.get("service", ""))),
+            current.duration,
+            error=exc is not None
+        )
+        flush_metrics()
+        _export(current)
+        return False
+
+
+def traced(kind, name=None):
+    """Decorator wrapping every call of fn in span(kind, name or fn.__name__)."""
+    def decorate(fn):
+        span_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def set_request_tags(**tags):
+    """Tag every span of the current request (route, service)."""
+    return _request_tags.set(tags)
+
+
+def propagate(fn):
+    """
+    fn bound to the caller's trace (parent span and request tags), for work
+    handed to another thread. Safe to call concurrently from many threads.
+    """
+    parent, tags = _current_span.get(), _request_tags.get()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        span_token = _current_span.set(parent)
+        tags_token = _request_tags.set(tags)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _request_tags.reset(tags_token)
+            _current_span.reset(span_token)
+    return wrapper
+
+
+def init_app(app):
+    """Root span per request, template render spans and the /metrics endpoint."""
+    from flask import g, request, session, template_rendered, before_render_template, Response
+
+    @app.before_request
+    def _start_request_span():
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        g.trace_tags_token = set_request_tags(route=route, service=session.get("service", ""))
+        g.trace_request_span = span("request", f"{request.method} {route}", method=request.method)
+        g.trace_request_span.__enter__()
+
+    @app.teardown_request
+    def _finish_request_span(exc):
+        request_span = g.pop("trace_request_span", None)
+        if request_span is not None:
+            request_span.__exit__(type(exc) if exc else None, exc, None)
+        token = g.pop("trace_tags_token", None)
+        if token is not None:
+            _request_tags.reset(token)
+
+    def _template_started(sender, template, context, **extra):
+        render_span = span("template", template.name or "inline")
+        render_span.__enter__()
+        g.setdefault("trace_template_spans", []).append(render_span)
+
+    def _template_finished(sender, template, context, **extra):
+        spans = g.get("trace_template_spans")
+        if spans:
+            spans.pop().__exit__(None, None, None)
+
+    # weak=False: these closures are referenced nowhere else
+    before_render_template.connect(_template_started, app, weak=False)
+    template_rendered.connect(_template_finished, app, weak=False)
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """Span duration histograms (Prometheus format), of every worker with the shared store."""
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
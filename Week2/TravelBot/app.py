@@ -1,24 +1,56 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, session
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, send_file
 from dotenv import load_dotenv
 
 # Import your agents
-from apis.flight_api import guess_airport_code, find_flights
-from apis.activities_api import find_activities
-from apis.hotel_api import get_hotel_offers, get_hotels_in_city
-from apis.geolocate_api import geocode_place
+from apis.flight_api import guess_airport_code, find_flights, find_flights_multi, nearby_airport_codes
+from activities_api import find_activities_cached
+from apis.hotel_api import get_hotel_offers, get_hotels_in_city, flatten_hotel_offers
+from apis.geolocate_api import geocode_place, coordinate_search_for
 
 # Import your helpers
 from helpers.llm_helpers_sol import (
     parse_location,
     process_user_input
 )
-from helpers.flight_functions import call_parse_flight_options
+from helpers.geo_ranking import rank_candidates
+from helpers.bundle_optimizer import optimize_bundles
+from helpers.formatting import format_flight_option
+from jobs import JobManager, DONE, FAILED
+from query_log import log_query
+from wizard import WizardState, is_empty, next_step
+from api_v1 import api_v1
+from apis import tracing
+from apis.tracing import span
 
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = os.urandom(16)
+# Every worker process must sign sessions with the same key: set
+# FLASK_SECRET_KEY in production (a preloaded app also shares the random one)
+app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(16)
+# Per-request spans (LLM, upstream, cache, templates) and /metrics
+tracing.init_app(app)
+# Stateless JSON API of the wizard steps under /api/v1
+app.register_blueprint(api_v1)
+
+# Long-running searches (steps 6 and 7) run as background jobs
+jobs = JobManager()
+
+
+@app.before_request
+def start_job_dispatcher():
+    # Every process serving requests also runs queued jobs (SQLite backend);
+    # started on the first request, i.e. after a gunicorn fork
+    jobs.start()
+
+# How many ranked hotels / activities to show on steps 7 and 8
+HOTEL_TOP_K = int(os.getenv("HOTEL_TOP_K", "50"))
+ACTIVITY_TOP_K = int(os.getenv("ACTIVITY_TOP_K", "30"))
+
+# Bundle optimizer: hotels priced per search and bundles offered to the user
+BUNDLE_MAX_HOTELS = int(os.getenv("BUNDLE_MAX_HOTELS", "20"))
+BUNDLE_TOP_K = int(os.getenv("BUNDLE_TOP_K", "5"))
 
 # -------------------------------------------------------------------------
 # HELPER: Initialize session defaults
@@ -33,6 +65,13 @@ def init_session():
         session["origin_code"] = ""
     if "destination_code" not in session:
         session["destination_code"] = ""
+    # Multi-airport mode: origin/destination expanded to their nearby airports
+    if "multi_airport" not in session:
+        session["multi_airport"] = False
+    if "origin_codes" not in session:
+        session["origin_codes"] = []
+    if "destination_codes" not in session:
+        session["destination_codes"] = []
     if "flight_choice" not in session:
         session["flight_choice"] = None
     if "hotel_choice" not in session:
@@ -51,7 +90,7 @@ def init_session():
         session["city"] = ""
     if "coordinate_search" not in session:
         session["coordinate_search"] = ""
-    
+
     # Single service flag: "vacation", "flight", "hotel", or "activities"
     if "service" not in session:
         session["service"] = "vacation"
@@ -69,8 +108,143 @@ def get_summary_context(step_num=1):
         "current_price": session.get("current_cost", 0.0),
         "current_step": step_num,
         "service": session.get("service", "vacation"),
+        "origin_codes": session.get("origin_codes", []),
+        "destination_codes": session.get("destination_codes", []),
     }
 
+def get_wizard():
+    """Memoized step outputs of this session (see wizard.py)."""
+    return WizardState(session)
+
+def redirect_next(step):
+    """Redirect to the step after 'step' in the current service's flow."""
+    return redirect(url_for(next_step(session["service"], step) or "step9"))
+
+def get_search_point():
+    """
+    Geocode the confirmed location once per coordinate_search.
+    Returns (lat, lon) or (None, None).
+    """
+    query = session.get("coordinate_search", "")
+    if not query:
+        return None, None
+
+    def geocode():
+        geo = geocode_place(query)
+        return {"lat": geo["latitude"], "lon": geo["longitude"]} if geo else {}
+
+    point = get_wizard().memo("search_point", {"query": query}, geocode)
+    return point.get("lat"), point.get("lon")
+
+def run_as_job(slot, task, params):
+    """
+    Return the job computing 'task' for 'params', submitting it unless the
+    session slot already tracks a job for the same params. Finished results
+    are kept as the wizard's output for 'slot', so a revisit long after the
+    job expired does not search again. A failed job, or one that found
+    nothing, is returned once and forgotten, so the next visit retries.
+    """
+    wizard = get_wizard()
+    hit, result = wizard.lookup(slot, params)
+    if hit:
+        return {"id": None, "status": DONE, "progress": 1.0, "partial": None, "result": result, "error": None}
+
+    current = session.get(slot) or {}
+    job = jobs.get(current.get("id")) if current.get("params") == params else None
+    if job is None:
+        job_id = jobs.submit(task, **params)
+        session[slot] = {"id": job_id, "params": params}
+        job = jobs.get(job_id)
+    elif job["status"] == FAILED or (job["status"] == DONE and is_empty(job["result"])):
+        # An empty result may be an outage: show it once, search again next visit
+        session.pop(slot, None)
+    elif job["status"] == DONE:
+        wizard.save(slot, params, job["result"])
+    return job
+
+def finished_job_result(slot, params):
+    """
+    Result of the finished job for 'slot' and 'params', without submitting
+    anything, or None. POST handlers use it: a form posted while the job is
+    missing or still running redirects to GET instead of starting a search.
+    """
+    hit, result = get_wizard().lookup(slot, params)
+    if hit:
+        return result
+    current = session.get(slot) or {}
+    job = jobs.get(current.get("id")) if current.get("params") == params else None
+    return job["result"] if job is not None and job["status"] == DONE else None
+
+def render_job_wait(job, title, step_num):
+    """Page shown while a job runs; it polls /jobs/<id> and reloads when done."""
+    return render_template(
+        "searching.html",
+        job_id=job["id"],
+        title=title,
+        summary=get_summary_context(step_num)
+    )
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Progress and partial results of a background job, as JSON."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "unknown"}), 404
+    return jsonify({
+        "status": job["status"],
+        "progress": job["progress"],
+        "partial": job["partial"],
+        "error": job["error"],
+    })
+
+# -------------------------------------------------------------------------
+# Batch quotes (see batch.py): upload CSV/JSONL trip requests, poll the job,
+# download the JSONL quotes
+# -------------------------------------------------------------------------
+BATCH_DIR = os.getenv(
+    "TRAVELBOT_BATCH_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "batch")
+)
+
+@jobs.task("batch_quote")
+def batch_quote_job(ctx, input_path, output_path):
+    """Background batch of trip quotes; reports the counts so far."""
+    from batch import quote_batch
+    report = quote_batch(input_path, output_path, fmt="jsonl",
+                         on_progress=lambda counts: ctx.report(partial=counts))
+    return report["counts"]
+
+@app.route("/batch", methods=["POST"])
+def batch_submit():
+    """Start a batch from an uploaded 'requests' file (.csv or .jsonl)."""
+    upload = request.files.get("requests")
+    if upload is None or not upload.filename:
+        return jsonify({"error": "upload the trip requests as 'requests'"}), 400
+    ext = ".csv" if upload.filename.lower().endswith(".csv") else ".jsonl"
+    batch_id = os.urandom(8).hex()
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    input_path = os.path.join(BATCH_DIR, batch_id + ext)
+    upload.save(input_path)
+    job_id = jobs.submit("batch_quote", input_path=input_path,
+                         output_path=os.path.join(BATCH_DIR, batch_id + ".quotes.jsonl"))
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for("job_status", job_id=job_id),
+        "results_url": url_for("batch_results", job_id=job_id),
+    }), 202
+
+@app.route("/batch/<job_id>/results", methods=["GET"])
+def batch_results(job_id):
+    """The JSONL quotes of a batch; quotes finished so far while it runs."""
+    job = jobs.get(job_id)
+    if job is None or job["task"] != "batch_quote":
+        return jsonify({"status": "unknown"}), 404
+    output_path = job["kwargs"]["output_path"]
+    if not os.path.exists(output_path):
+        return jsonify({"status": job["status"]}), 409
+    return send_file(output_path, mimetype="application/x-ndjson", as_attachment=True,
+                     download_name=f"quotes-{job_id}.jsonl")
+
 @app.route("/clear", methods=["POST"])
 def clear_session():
     """Clears the session and redirects to the index."""
@@ -132,24 +306,22 @@ def step3():
     if not session["location_raw"]:
         return redirect(url_for("step2"))
 
-    # parse location
-    loc_parsed = parse_location(session["location_raw"])
+    # parse location (once per distinct input)
+    loc_parsed = get_wizard().memo(
+        "location", {"raw": session["location_raw"]},
+        lambda: parse_location(session["location_raw"])
+    )
     session["location_parsed"] = loc_parsed
     session["city"] = loc_parsed.get("city", "")
     state = loc_parsed.get("state", "")
     country = loc_parsed.get("country", "")
     clarifications = loc_parsed.get("clarifications", "")
-    session["coordinate_search"] = f"{session['city']} {state}, {country}"
+    session["coordinate_search"] = coordinate_search_for(loc_parsed)
 
     if request.method == "POST":
-        service = session["service"]
+        log_query("location", query=session["location_raw"])
         # Next steps vary by service
-        if service in ["vacation", "flight"]:
-            return redirect(url_for("step4"))
-        elif service == "hotel":
-            return redirect(url_for("step5"))
-        elif service == "activities":
-            return redirect(url_for("step8"))
+        return redirect_next("step3")
     return render_template(
         "confirm_location.html",
         city=session["city"],
@@ -177,12 +349,37 @@ def step4():
         return redirect(url_for("step8"))
 
     # Guess code
-    guessed_code = guess_airport_code(session["city"])
+    wizard = get_wizard()
+    guessed_code = wizard.memo(
+        "airport", {"city": session["city"]},
+        lambda: guess_airport_code(session["city"])
+    )
 
     if request.method == "POST":
         session["destination_code"] = guessed_code or ""
+        log_query("route", origin=session["origin_code"], destination=session["destination_code"],
+                  city=session["city"])
+
+        # Optionally expand both ends to their nearby airports
+        session["multi_airport"] = "multi_airport" in request.form
+        if session["multi_airport"]:
+            origin_codes, dest_codes = wizard.memo(
+                "nearby_airports", {"origin": session["origin_code"], "city": session["city"]},
+                lambda: [nearby_airport_codes(session["origin_code"]), nearby_airport_codes(session["city"])]
+            )
+            # Keep the confirmed codes first so they are always searched
+            session["origin_codes"] = [session["origin_code"]] + [
+                c for c in origin_codes if c != session["origin_code"]
+            ]
+            session["destination_codes"] = [c for c in [guessed_code] if c] + [
+                c for c in dest_codes if c != guessed_code
+            ]
+        else:
+            session["origin_codes"] = []
+            session["destination_codes"] = []
+
         # Next -> step5 (dates) for flight or vacation
-        return redirect(url_for("step5"))
+        return redirect_next("step4")
 
     return render_template(
         "airport.html",
@@ -215,10 +412,8 @@ def step5():
         else:
             session["return_date"] = ""
 
-        if service in ["vacation", "flight"]:
-            return redirect(url_for("step6_options"))  # search flights
-        else:  # "hotel"
-            return redirect(url_for("step7"))
+        # vacation/flight -> step6_options (search flights), hotel -> step7
+        return redirect_next("step5")
 
     return render_template("dates.html", summary=get_summary_context(5))
 
@@ -228,6 +423,62 @@ def step5():
 # -------------------------------------------------------------------------
 
 
+def flight_search_params():
+    """
+    Everything the flight search needs from the session: origin/destination
+    codes, dates and the optional extras from step6_options.
+    """
+    multi = bool(session["multi_airport"] and session["origin_codes"] and session["destination_codes"])
+    return {
+        # Required Data
+        "origin": session["origin_code"],
+        "dest": session["destination_code"],
+        "dep": session["depart_date"],
+        "ret": session["return_date"] or None,
+        # Optional Fields
+        "adults": session.get("adults", 1),
+        "travel_class": session.get("travel_class", None),  # Economy, Business, etc.
+        "non_stop": session.get("non_stop", False),
+        "max_price": session.get("max_price", None),
+        # Multi-airport mode
+        "origin_codes": session["origin_codes"] if multi else [],
+        "destination_codes": session["destination_codes"] if multi else [],
+    }
+
+def run_flight_search(origin, dest, dep, ret, adults, travel_class, non_stop, max_price,
+                      origin_codes, destination_codes, on_progress=None):
+    """
+    Flight search for the params of flight_search_params(). Falls back to a
+    plain search without extras if nothing matches.
+    """
+    # Fetch Flight Offers (fanned out over nearby airports in multi-airport mode)
+    if origin_codes and destination_codes:
+        def search(**kwargs):
+            return find_flights_multi(origin_codes, destination_codes, dep, ret, on_progress=on_progress, **kwargs)
+    else:
+        def search(**kwargs):
+            return find_flights(origin, dest, dep, ret, **kwargs)
+
+    flights_data = search(max_price=max_price, adults=adults, travel_class=travel_class, non_stop=non_stop)
+
+    # If no flights found, retry with default values
+    if not flights_data:
+        flights_data = search(max_price=None, adults=1, travel_class=None, non_stop=False)
+
+    return flights_data
+
+def search_session_flights():
+    """Run the flight search for the current session in this thread."""
+    return run_flight_search(**flight_search_params())
+
+@jobs.task("flight_search")
+def flight_search_job(ctx, **params):
+    """Background flight search; reports the cheapest offers found so far."""
+    def on_progress(done, total, offers):
+        ctx.report(progress=done / total, partial=[format_flight_option(f)[0] for f in offers[:3]])
+    return run_flight_search(on_progress=on_progress, **params)
+
+
 @app.route("/step6_options", methods=["GET", "POST"])
 def step6_options():
     """
@@ -241,7 +492,9 @@ def step6_options():
     if request.method == "POST":
         user_input = request.form.get("flight_extras", "").strip()
         if user_input:
-            extras = call_parse_flight_options(user_input)
+            from helpers.flight_functions_sol import call_parse_flight_options
+            with span("llm", "call_parse_flight_options"):
+                extras = call_parse_flight_options(user_input)
             # e.g. extras = {"adults":2, "travelClass":"BUSINESS", "nonStop":True, "maxPrice":400}
 
             session["adults"] = extras.get("adults", 1)
@@ -271,28 +524,16 @@ def step6():
     elif service == "activities":
         return redirect(url_for("step8"))
 
-    # Required Data
-    origin = session["origin_code"]
-    dest = session["destination_code"]
-    dep = session["depart_date"]
-    ret = session["return_date"] or None
-
-    # Optional Fields
-    adults = session.get("adults", 1)
-    travel_class = session.get("travel_class", None)  # Economy, Business, etc.
-    non_stop = session.get("non_stop", False)
-    max_price = session.get("max_price", None)
-
-    # Fetch Flight Offers
-    flights_data = find_flights(
-        origin, dest, dep, ret, max_price=max_price, adults=adults, travel_class=travel_class, non_stop=non_stop
-    )
-
-    # If no flights found, retry with default values
-    if not flights_data:
-        flights_data = find_flights(
-            origin, dest, dep, ret, max_price=None, adults=1, travel_class=None, non_stop=False
-        )
+    if request.method == "POST":
+        # Resolve the selection against the results the form was rendered from
+        flights_data = finished_job_result("flight_job", flight_search_params())
+        if flights_data is None:
+            return redirect(url_for("step6"))
+    else:
+        job = run_as_job("flight_job", "flight_search", flight_search_params())
+        if job["status"] not in (DONE, FAILED):
+            return render_job_wait(job, "Searching flights", 6)
+        flights_data = job["result"] or []
 
     # Format Flight Options
     flight_options = []
@@ -300,54 +541,7 @@ def step6():
 
     if flights_data:
         for f in flights_data:
-            flight_id = f.get("id", "UnknownID")
-            price_str = f.get("price", {}).get("grandTotal", "0")
-            currency = f.get("price", {}).get("currency", "USD")
-            num_seats = f.get("numberOfBookableSeats", "N/A")
-            validating_airlines = ", ".join(f.get("validatingAirlineCodes", ["N/A"]))
-
-            try:
-                price_val = float(price_str)
-            except:
-                price_val = 0.0
-
-            summary_lines = [
-                f"Flight ID: {flight_id}",
-                f"Price: {currency} {price_str}",
-                f"Seats Available: {num_seats}",
-                f"Validating Airline: {validating_airlines}",
-            ]
-
-            for i, itin in enumerate(f.get("itineraries", []), start=1):
-                summary_lines.append(f"  Itinerary {i}: Duration {itin.get('duration', 'N/A')}")
-                for j, seg in enumerate(itin.get("segments", []), start=1):
-                    dep_iata = seg.get("departure", {}).get("iataCode", "")
-                    dep_time = seg.get("departure", {}).get("at", "N/A")
-                    arr_iata = seg.get("arrival", {}).get("iataCode", "")
-                    arr_time = seg.get("arrival", {}).get("at", "N/A")
-                    carrier = seg.get("carrierCode", "N/A")
-                    flight_num = seg.get("number", "N/A")
-                    aircraft = seg.get("aircraft", {}).get("code", "N/A")
-                    duration = seg.get("duration", "N/A")
-
-                    # Get Travel Class & Baggage Info
-                    travel_class_name = "N/A"
-                    baggage_info = "N/A"
-
-                    for traveler in f.get("travelerPricings", []):
-                        for fare_details in traveler.get("fareDetailsBySegment", []):
-                            if fare_details.get("segmentId") == seg.get("id"):
-                                travel_class_name = fare_details.get("cabin", "N/A")
-                                baggage_info = f"{fare_details.get('includedCheckedBags', {}).get('weight', 'N/A')} {fare_details.get('includedCheckedBags', {}).get('weightUnit', 'KG')}"
-
-                    seg_line = (
-                        f"    Segment {j}: {dep_iata} ({dep_time}) → {arr_iata} ({arr_time})\n"
-                        f"      - Carrier: {carrier}, Flight {flight_num}, Aircraft {aircraft}, Duration: {duration}\n"
-                        f"      - Travel Class: {travel_class_name}, Checked Baggage: {baggage_info}"
-                    )
-                    summary_lines.append(seg_line)
-
-            flight_summary = "\n".join(summary_lines)
+            flight_summary, price_val = format_flight_option(f)
             flight_options.append(flight_summary)
             flight_prices.append(price_val)
 
@@ -358,7 +552,7 @@ def step6():
             session["flight_choice"] = flight_options[chosen_index]
             session["current_cost"] = session.get("current_cost", 0.0) + flight_prices[chosen_index]
 
-        return redirect(url_for("step7_options") if service == "vacation" else url_for("step8"))
+        return redirect_next("step6")
 
     return render_template("flights.html", flights=flight_options, summary=get_summary_context(6))
 
@@ -378,7 +572,8 @@ def step7_options():
     if request.method == "POST":
         user_input = request.form.get("hotel_extras", "")
         from helpers.hotel_functions import call_parse_hotel_options
-        extras = call_parse_hotel_options(user_input)
+        with span("llm", "call_parse_hotel_options"):
+            extras = call_parse_hotel_options(user_input)
         # e.g. {"adults":2, "rooms":2, "priceRange":"-300"}
 
         session["hotel_adults"] = extras.get("adults", 1)
@@ -389,6 +584,39 @@ def step7_options():
 
     return render_template("hotel_options.html", summary=get_summary_context(7))
 
+def format_hotel_choice(offer):
+    """Summary line stored as hotel_choice once an offer is confirmed."""
+    return (
+        f"Hotel Offer {offer['id']} - ${offer['price']}, "
+        f"Check-in: {offer['check_in']}, Check-out: {offer['check_out']}, "
+        f"Rooms: {offer['rooms']}, Guests: {offer['guests']} adults"
+    )
+
+@jobs.task("hotel_search")
+def hotel_search_job(ctx, city_code, lat, lon):
+    """
+    Background hotel listing for a city code, closest to (lat, lon) first.
+    Returns [{"label", "id"}] as shown in the step 7 drop-down.
+    """
+    hotels_data = get_hotels_in_city(city_code, radius_km=10)
+    hotels = []
+
+    if hotels_data:
+        # Closest hotels to the chosen location first
+        if lat is not None and lon is not None:
+            ranked = rank_candidates(hotels_data, lat, lon, k=HOTEL_TOP_K)
+        else:
+            ranked = [(h, None) for h in hotels_data]
+
+        for h, dist_km in ranked:
+            hname = h.get("name", "Unknown Hotel")
+            hid = h.get("hotelId", "")
+            label = f"{hname} ({hid})"
+            if dist_km is not None:
+                label += f" - {dist_km:.1f} km"
+            hotels.append({"label": label, "id": hid})
+    return hotels
+
 @app.route("/step7", methods=["GET", "POST"])
 def step7():
     init_session()
@@ -399,17 +627,22 @@ def step7():
     elif service == "activities":
         return redirect(url_for("step8"))
 
-    dest_code = session["destination_code"]
-    hotels_data = get_hotels_in_city(dest_code, radius_km=10)
-    hotel_names, hotel_ids = [], []
-
-    if hotels_data:
-        for h in hotels_data:
-            hname = h.get("name", "Unknown Hotel")
-            hid = h.get("hotelId", "")
-            label = f"{hname} ({hid})"
-            hotel_names.append(label)
-            hotel_ids.append(hid)
+    lat, lon = get_search_point()
+    hotel_params = {"city_code": session["destination_code"], "lat": lat, "lon": lon}
+    if request.method == "POST":
+        # Resolve the selection against the results the form was rendered from
+        # (confirming an offer only needs the offers kept in the session)
+        hotels = finished_job_result("hotel_job", hotel_params)
+        if hotels is None and "see_offers" in request.form:
+            return redirect(url_for("step7"))
+        hotels = hotels or []
+    else:
+        job = run_as_job("hotel_job", "hotel_search", hotel_params)
+        if job["status"] not in (DONE, FAILED):
+            return render_job_wait(job, "Searching hotels", 7)
+        hotels = job["result"] or []
+    hotel_names = [h["label"] for h in hotels]
+    hotel_ids = [h["id"] for h in hotels]
 
     if request.method == "POST":
         if "see_offers" in request.form:
@@ -417,41 +650,40 @@ def step7():
             if 0 <= idx < len(hotel_ids):
                 selected_id = hotel_ids[idx]
 
-                # Fetch offers using user preferences
-                offers_data = get_hotel_offers(
-                    [selected_id],
-                    check_in=session["depart_date"],
-                    check_out=session["return_date"] or None,
-                    adults=session.get("adults", 1),
-                    rooms=session.get("rooms", 1),
-                    price_range=session.get("price_range")
-                )
-
-                # If no offers found, retry with default values
-                if not offers_data:
+                offer_params = {
+                    "hotel_id": selected_id,
+                    "check_in": session["depart_date"],
+                    "check_out": session["return_date"] or None,
+                    "adults": session.get("adults", 1),
+                    "rooms": session.get("rooms", 1),
+                    "price_range": session.get("price_range"),
+                }
+
+                def fetch_offers():
+                    # Fetch offers using user preferences
                     offers_data = get_hotel_offers(
                         [selected_id],
-                        check_in=session["depart_date"],
-                        check_out=session["return_date"] or None,
-                        adults=1,
-                        rooms=1,
-                        price_range=None
+                        check_in=offer_params["check_in"],
+                        check_out=offer_params["check_out"],
+                        adults=offer_params["adults"],
+                        rooms=offer_params["rooms"],
+                        price_range=offer_params["price_range"]
                     )
 
+                    # If no offers found, retry with default values
+                    if not offers_data:
+                        offers_data = get_hotel_offers(
+                            [selected_id],
+                            check_in=offer_params["check_in"],
+                            check_out=offer_params["check_out"],
+                            adults=1,
+                            rooms=1,
+                            price_range=None
+                        )
+                    return flatten_hotel_offers(offers_data)
+
                 # Store offers in session with correct details
-                session["current_offers"] = []
-                if offers_data:
-                    for item in offers_data:
-                        if "offers" in item:
-                            for o in item["offers"]:
-                                session["current_offers"].append({
-                                    "id": o.get("id", "N/A"),
-                                    "price": o.get("price", {}).get("total", "0"),
-                                    "check_in": o.get("checkInDate", "N/A"),
-                                    "check_out": o.get("checkOutDate", "N/A"),
-                                    "rooms": o.get("room", {}).get("typeEstimated", {}).get("category", "N/A"),
-                                    "guests": o.get("guests", {}).get("adults", "N/A")
-                                })
+                session["current_offers"] = get_wizard().memo("hotel_offers", offer_params, fetch_offers)
 
             return redirect(url_for("step7"))
 
@@ -463,18 +695,11 @@ def step7():
                 try:
                     price_val = float(price_str)
                 except:
-                    price_val = 0.0
+                    price_val = None
                 session["current_cost"] = session.get("current_cost", 0.0) + price_val
-                session["hotel_choice"] = (
-                    f"Hotel Offer {chosen_offer['id']} - ${price_str}, "
-                    f"Check-in: {chosen_offer['check_in']}, Check-out: {chosen_offer['check_out']}, "
-                    f"Rooms: {chosen_offer['rooms']}, Guests: {chosen_offer['guests']} adults"
-                )
-
-            if service == "vacation":
-                return redirect(url_for("step8"))
-            else:
-                return redirect(url_for("step9"))
+                session["hotel_choice"] = format_hotel_choice(chosen_offer)
+
+            return redirect_next("step7")
 
     offers = session.get("current_offers", [])
     return render_template(
@@ -489,6 +714,38 @@ def step7():
 # -------------------------------------------------------------------------
 # STEP 8: Activities
 # -------------------------------------------------------------------------
+def ranked_activities(lat, lon):
+    """
+    Activities near (lat, lon) as shown on step 8, best ACTIVITY_TOP_K by
+    distance and price: [{"index", "label", "price"}], price None when
+    unknown. Computed once per point.
+    """
+    def compute():
+        activities = []
+        acts_data = find_activities_cached(lat, lon, radius_km=5)
+        if acts_data:
+            # Rank by distance and price, keep the best ACTIVITY_TOP_K
+            prices = [act.get("price", {}).get("amount") for act in acts_data]
+            ranked = rank_candidates(acts_data, lat, lon, prices=prices, k=ACTIVITY_TOP_K)
+            for i, (act, dist_km) in enumerate(ranked):
+                aname = act.get("name", "Unknown Activity")
+                price_str = act.get("price", {}).get("amount", "0")
+                try:
+                    price_val = float(price_str)
+                except:
+                    price_val = None
+                label = f"{aname} (${price_str})"
+                if dist_km is not None:
+                    label += f" - {dist_km:.1f} km"
+                activities.append({
+                    "index": i,
+                    "label": label,
+                    "price": price_val
+                })
+        return activities
+
+    return get_wizard().memo("activities", {"lat": lat, "lon": lon}, compute)
+
 @app.route("/step8", methods=["GET", "POST"])
 def step8():
     init_session()
@@ -502,29 +759,9 @@ def step8():
         return redirect(url_for("step9"))
 
     # geocode
-    lat, lon = None, None
-    if session["coordinate_search"]:
-        geo = geocode_place(session["coordinate_search"])
-        if geo:
-            lat = geo["latitude"]
-            lon = geo["longitude"]
-
-    activities = []
-    if lat and lon:
-        acts_data = find_activities(lat, lon, radius_km=5)
-        if acts_data:
-            for i, act in enumerate(acts_data):
-                aname = act.get("name", "Unknown Activity")
-                price_str = act.get("price", {}).get("amount", "0")
-                try:
-                    price_val = float(price_str)
-                except:
-                    price_val = 0.0
-                activities.append({
-                    "index": i,
-                    "label": f"{aname} (${price_str})",
-                    "price": price_val
-                })
+    lat, lon = get_search_point()
+
+    activities = ranked_activities(lat, lon) if lat and lon else []
 
     if request.method == "POST":
         chosen_indices = request.form.getlist("activity_choice")
@@ -534,17 +771,16 @@ def step8():
             idx_int = int(idx_str)
             if 0 <= idx_int < len(activities):
                 chosen_list.append(activities[idx_int]["label"])
-                total_extra += activities[idx_int]["price"]
+                total_extra += activities[idx_int]["price"] or 0.0
 
         session["activity_choices"] = chosen_list
         session["current_cost"] = session.get("current_cost", 0.0) + total_extra
 
         # next step
-        if service in ["vacation", "activities"]:
-            return redirect(url_for("step9"))
-        else:
-            # flight => done after 8
-            return render_template("done.html", summary=get_summary_context(8))
+        if next_step(service, "step8"):
+            return redirect_next("step8")
+        # flight => done after 8
+        return render_template("final.html", summary=get_summary_context(8))
 
     return render_template(
         "activities.html",
@@ -553,6 +789,127 @@ def step8():
     )
 
 
+# -------------------------------------------------------------------------
+# BUNDLES: best flight + hotel + activity combination under a budget
+# -------------------------------------------------------------------------
+def gather_bundle_candidates():
+    """
+    Collect the candidate sets of steps 6, 7 and 8 in one go:
+    flight offers, priced offers of the nearest hotels, and nearby activities.
+    Flights and activities reuse the outputs of steps 6 and 8 when present.
+    """
+    wizard = get_wizard()
+    # Same step output as the step 6 job
+    flights_data = wizard.memo("flight_job", flight_search_params(), search_session_flights) or []
+
+    lat, lon = get_search_point()
+
+    def price_nearest_hotels():
+        hotel_offers = []
+        hotels_data = get_hotels_in_city(session["destination_code"], radius_km=10)
+        if hotels_data:
+            if lat is not None and lon is not None:
+                ranked = rank_candidates(hotels_data, lat, lon, k=BUNDLE_MAX_HOTELS)
+            else:
+                ranked = [(h, None) for h in hotels_data[:BUNDLE_MAX_HOTELS]]
+            distances = {h.get("hotelId", ""): dist_km for h, dist_km in ranked}
+            offers_data = get_hotel_offers(
+                list(distances),
+                check_in=session["depart_date"],
+                check_out=session["return_date"] or None,
+                adults=session.get("adults", 1),
+                rooms=session.get("rooms", 1),
+                price_range=session.get("price_range")
+            )
+            for offer in flatten_hotel_offers(offers_data):
+                offer["distance_km"] = distances.get(offer["hotel_id"])
+                hotel_offers.append(offer)
+        return hotel_offers
+
+    hotel_offers = wizard.memo("bundle_hotel_offers", {
+        "city_code": session["destination_code"], "lat": lat, "lon": lon,
+        "check_in": session["depart_date"], "check_out": session["return_date"] or None,
+        "adults": session.get("adults", 1), "rooms": session.get("rooms", 1),
+        "price_range": session.get("price_range"),
+    }, price_nearest_hotels)
+
+    activities = ranked_activities(lat, lon) if lat and lon else []
+
+    return flights_data, hotel_offers, activities
+
+def bundle_inputs(budget):
+    """Inputs the offered bundles depend on: the budget and the trip."""
+    return {
+        "budget": budget, "flights": flight_search_params(),
+        "adults": session.get("adults", 1), "rooms": session.get("rooms", 1),
+        "price_range": session.get("price_range"),
+    }
+
+def offered_bundles():
+    """Bundles last offered for the session's budget; kept server-side, not in the cookie."""
+    budget = session.get("bundle_budget")
+    if budget is None:
+        return []
+    hit, options = get_wizard().lookup("bundle_options", bundle_inputs(budget))
+    return options if hit else []
+
+@app.route("/bundles", methods=["GET", "POST"])
+def bundles():
+    """
+    Suggest complete trips (flight + hotel offer + optional activity) under a
+    total budget, as an alternative to picking each part on steps 6-8.
+    """
+    init_session()
+    if session["service"] != "vacation" or not session["destination_code"] or not session["depart_date"]:
+        return redirect(url_for("step6"))
+
+    error = None
+    if request.method == "POST" and "choose_bundle" in request.form:
+        idx = int(request.form.get("chosen_bundle_index", "-1"))
+        options = offered_bundles()
+        if 0 <= idx < len(options):
+            chosen = options[idx]
+            session["flight_choice"] = chosen["flight_choice"]
+            session["hotel_choice"] = chosen["hotel_choice"]
+            session["activity_choices"] = [chosen["activity"]] if chosen["activity"] else []
+            session["current_cost"] = chosen["total_price"]
+            return redirect(url_for("step9"))
+        error = "Please choose one of the bundles."
+
+    elif request.method == "POST":
+        try:
+            budget = float(request.form.get("budget", ""))
+        except ValueError:
+            budget = 0.0
+        if budget <= 0:
+            error = "Please enter a budget."
+        else:
+            flights_data, hotel_offers, activities = gather_bundle_candidates()
+            options = []
+            for b in optimize_bundles(flights_data, hotel_offers, activities, budget, k=BUNDLE_TOP_K):
+                flight_summary, _ = format_flight_option(flights_data[b["flight"]])
+                activity = activities[b["activity"]]["label"] if b["activity"] is not None else None
+                options.append({
+                    "flight_choice": flight_summary,
+                    "hotel_choice": format_hotel_choice(hotel_offers[b["hotel"]]),
+                    "activity": activity,
+                    "total_price": b["total_price"],
+                })
+            # Only the budget goes in the cookie; the options are a wizard step output
+            get_wizard().save("bundle_options", bundle_inputs(budget), options)
+            session["bundle_budget"] = budget
+            if not options:
+                error = "No combination fits this budget."
+
+    return render_template(
+        "bundles.html",
+        bundles=offered_bundles(),
+        budget=session.get("bundle_budget", ""),
+        error=error,
+        summary=get_summary_context(6)
+    )
+
+
 # -------------------------------------------------------------------------
 # STEP 9: Final Summary
 # -------------------------------------------------------------------------
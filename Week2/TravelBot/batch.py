@@ -0,0 +1,461 @@
+"""
+Batch trip quotes: price many trip requests (origin, destination, dates,
+passengers, budget) through the same pipeline as the wizard and write one
+quote per request.
+
+    python batch.py trips.csv quotes.jsonl --concurrency 8 --rate 5
+    python batch.py trips.jsonl quotes.parquet
+
+Input is CSV (with a header) or JSONL with the fields origin, destination,
+depart_date and optionally id, return_date, adults, rooms, budget. Rows are
+streamed, so the input can be larger than memory. Quotes are written as they
+finish; rerunning the same command after an interruption skips every request
+already quoted with a final status (the output is the checkpoint). Requests
+that ended in an error, or without an airport, flights or hotels (which is
+also what an upstream outage looks like), are dropped from the output and
+quoted again. --no-resume starts over.
+"""
+import os
+import sys
+import csv
+import json
+import glob
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+from activities_api import find_activities_cached, use_cache_backend
+from apis.flight_api import guess_airport_code, find_flights
+from apis.geolocate_api import geocode_place, coordinate_search_for
+from apis.hotel_api import get_hotels_in_city, get_hotel_offers, flatten_hotel_offers
+from apis.ratelimit import RateLimiter
+from apis.tracing import propagate
+from helpers.bundle_optimizer import optimize_bundles, flight_features
+from helpers.formatting import format_flight_option
+from helpers.geo_ranking import rank_candidates
+from helpers.llm_helpers_sol import parse_location
+
+# Hotels priced and activities considered per quote
+BATCH_MAX_HOTELS = int(os.getenv("BATCH_MAX_HOTELS", "20"))
+BATCH_MAX_ACTIVITIES = int(os.getenv("BATCH_MAX_ACTIVITIES", "10"))
+# Parquet output: rows per part file (unwritten rows are redone on resume)
+PARQUET_ROWS_PER_PART = int(os.getenv("BATCH_PARQUET_ROWS_PER_PART", "500"))
+
+# Statuses that are kept on resume; every other one is quoted again
+FINAL_STATUSES = ("ok", "invalid", "no_destination")
+
+# Output columns, in order, with their Parquet types
+QUOTE_FIELDS = [
+    ("id", "string"), ("status", "string"), ("error", "string"),
+    ("origin", "string"), ("destination", "string"),
+    ("depart_date", "string"), ("return_date", "string"),
+    ("adults", "int64"), ("rooms", "int64"), ("budget", "float64"),
+    ("city", "string"), ("country", "string"),
+    ("origin_code", "string"), ("destination_code", "string"),
+    ("flight_offers", "int64"), ("flight_id", "string"), ("flight_price", "float64"),
+    ("flight_duration_minutes", "int64"), ("flight_stops", "int64"), ("flight_summary", "string"),
+    ("hotel_offers", "int64"), ("hotel_id", "string"), ("hotel_offer_id", "string"),
+    ("hotel_price", "float64"), ("hotel_distance_km", "float64"),
+    ("activity", "string"), ("activity_price", "float64"),
+    ("total_price", "float64"), ("within_budget", "bool_"), ("seconds", "float64"),
+]
+
+
+def _text(value):
+    return str(value).strip() if value is not None else ""
+
+
+def _number(value, kind, default=None):
+    try:
+        return kind(value) if _text(value) else default
+    except (TypeError, ValueError):
+        return default
+
+
+def normalize_row(row_id, raw):
+    """Input row (CSV or JSON) -> the request fields of a quote."""
+    return {
+        "id": _text(raw.get("id")) or str(row_id),
+        "origin": _text(raw.get("origin")),
+        "destination": _text(raw.get("destination")),
+        "depart_date": _text(raw.get("depart_date")),
+        "return_date": _text(raw.get("return_date")) or None,
+        "adults": _number(raw.get("adults"), int, 1),
+        "rooms": _number(raw.get("rooms"), int, 1),
+        "budget": _number(raw.get("budget"), float),
+    }
+
+
+def read_requests(path):
+    """Yield normalized requests from a CSV or JSONL file, one row at a time."""
+    with open(path, newline="") as f:
+        if path.lower().endswith(".csv"):
+            for row_id, raw in enumerate(csv.DictReader(f)):
+                yield normalize_row(row_id, raw)
+            return
+        for row_id, line in enumerate(f):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+            except ValueError:
+                print(f"Skipping malformed input line {row_id + 1}")
+                continue
+            yield normalize_row(row_id, raw)
+
+
+def _origin_code(origin, limiter):
+    # "DTW" is already an IATA code; anything else is a place to resolve
+    if len(origin) == 3 and origin.isalpha() and origin.isupper():
+        return origin
+    limiter.acquire()
+    return guess_airport_code(origin)
+
+
+def quote_trip(req, limiter):
+    """
+    Price one trip request: destination parsing, airport codes, flights,
+    the nearest hotels' offers and nearby activities, then the best bundle
+    within the budget (or the cheapest flight and hotel without one).
+    Returns the quote as a dict with the QUOTE_FIELDS keys.
+    """
+    start = time.monotonic()
+    quote = dict.fromkeys(name for name, _ in QUOTE_FIELDS)
+    quote.update(req)
+
+    if not (req["origin"] and req["destination"] and req["depart_date"]):
+        quote.update(status="invalid", error="origin, destination and depart_date are required")
+        return quote
+
+    limiter.acquire()
+    loc_parsed = parse_location(req["destination"])
+    quote["city"] = loc_parsed.get("city", "")
+    quote["country"] = loc_parsed.get("country", "")
+    if not quote["city"]:
+        quote.update(status="no_destination", seconds=time.monotonic() - start)
+        return quote
+
+    quote["origin_code"] = _origin_code(req["origin"], limiter)
+    limiter.acquire()
+    quote["destination_code"] = guess_airport_code(quote["city"])
+    if not quote["origin_code"] or not quote["destination_code"]:
+        quote.update(status="no_airport", seconds=time.monotonic() - start)
+        return quote
+
+    limiter.acquire()
+    flights = find_flights(
+        quote["origin_code"], quote["destination_code"], req["depart_date"], req["return_date"],
+        adults=req["adults"]
+    ) or []
+    quote["flight_offers"] = len(flights)
+
+    limiter.acquire()
+    geo = geocode_place(coordinate_search_for(loc_parsed))
+    lat, lon = (geo["latitude"], geo["longitude"]) if geo else (None, None)
+
+    hotel_offers = []
+    limiter.acquire()
+    hotels_data = get_hotels_in_city(quote["destination_code"], radius_km=10)
+    if hotels_data and req["return_date"]:
+        if lat is not None and lon is not None:
+            ranked = rank_candidates(hotels_data, lat, lon, k=BATCH_MAX_HOTELS)
+        else:
+            ranked = [(h, None) for h in hotels_data[:BATCH_MAX_HOTELS]]
+        distances = {h.get("hotelId", ""): dist_km for h, dist_km in ranked}
+        limiter.acquire()
+        offers_data = get_hotel_offers(
+            list(distances),
+            check_in=req["depart_date"],
+            check_out=req["return_date"],
+            adults=req["adults"],
+            rooms=req["rooms"]
+        )
+        for offer in flatten_hotel_offers(offers_data):
+            offer["distance_km"] = distances.get(offer["hotel_id"])
+            hotel_offers.append(offer)
+    quote["hotel_offers"] = len(hotel_offers)
+
+    activities = []
+    if lat is not None and lon is not None:
+        limiter.acquire()
+        acts_data = find_activities_cached(lat, lon, radius_km=5)
+        prices = [act.get("price", {}).get("amount") for act in acts_data]
+        for act, _ in rank_candidates(acts_data, lat, lon, prices=prices, k=BATCH_MAX_ACTIVITIES):
+            activities.append({
+                "label": act.get("name", "Unknown Activity"),
+                "price": _number(act.get("price", {}).get("amount"), float)
+            })
+
+    if not flights:
+        quote.update(status="no_flights", seconds=time.monotonic() - start)
+        return quote
+
+    flight_prices, durations, stops = flight_features(flights)
+    hotel_prices = [_number(h["price"], float, float("inf")) for h in hotel_offers]
+    best = None
+    if req["budget"] and hotel_offers:
+        bundles = optimize_bundles(flights, hotel_offers, activities, req["budget"], k=1)
+        best = bundles[0] if bundles else None
+    if best is None:
+        # No budget (or nothing fits): cheapest flight and hotel, no activity
+        best = {
+            "flight": int(flight_prices.argmin()),
+            "hotel": hotel_prices.index(min(hotel_prices)) if hotel_offers else None,
+            "activity": None,
+        }
+
+    f = best["flight"]
+    quote.update(
+        flight_id=flights[f].get("id"),
+        flight_price=float(flight_prices[f]),
+        flight_duration_minutes=int(durations[f]),
+        flight_stops=int(stops[f]),
+        flight_summary=format_flight_option(flights[f])[0],
+    )
+    total = quote["flight_price"]
+    if best["hotel"] is not None:
+        offer = hotel_offers[best["hotel"]]
+        quote.update(
+            hotel_id=offer["hotel_id"], hotel_offer_id=offer["id"],
+            hotel_price=hotel_prices[best["hotel"]], hotel_distance_km=offer.get("distance_km"),
+        )
+        total += quote["hotel_price"]
+    if best["activity"] is not None:
+        activity = activities[best["activity"]]
+        quote.update(activity=activity["label"], activity_price=activity["price"])
+        total += activity["price"]
+
+    quote["total_price"] = round(total, 2)
+    quote["within_budget"] = total <= req["budget"] if req["budget"] else None
+    quote["status"] = "ok" if req["return_date"] is None or best["hotel"] is not None else "no_hotels"
+    quote["seconds"] = time.monotonic() - start
+    return quote
+
+
+class JsonlQuoteWriter:
+    """One JSON line per quote, flushed as it is written."""
+
+    def __init__(self, path, resume):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if resume and os.path.exists(path):
+            _keep_final_lines(path)
+        self._file = open(path, "a" if resume else "w")
+
+    def write(self, quote):
+        self._file.write(json.dumps(quote) + "\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _final_line(line):
+    # A run killed mid-write can leave a partial last line, which fails to parse
+    try:
+        return json.loads(line).get("status") in FINAL_STATUSES
+    except ValueError:
+        return False
+
+
+def _keep_final_lines(path):
+    """Rewrite 'path' without the quotes that will be redone."""
+    tmp_path = path + ".tmp"
+    with open(path) as src, open(tmp_path, "w") as dst:
+        for line in src:
+            if line.endswith("\n") and _final_line(line):
+                dst.write(line)
+    os.replace(tmp_path, path)
+
+
+class ParquetQuoteWriter:
+    """
+    Quotes as part files of a Parquet dataset directory (read it back with
+    pandas.read_parquet(path) or pyarrow.dataset). Each part is written once
+    PARQUET_ROWS_PER_PART quotes are buffered, and on close.
+    """
+
+    def __init__(self, path, resume, rows_per_part=PARQUET_ROWS_PER_PART):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa, self._pq = pa, pq
+        self.schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in QUOTE_FIELDS])
+        self.path = path
+        self.rows_per_part = rows_per_part
+        os.makedirs(path, exist_ok=True)
+        parts = _parquet_parts(path)
+        for part in parts:
+            if resume:
+                self._keep_final_rows(part)
+            else:
+                os.remove(part)
+        # Numbered after the last part, so no part is overwritten
+        self._next_part = int(os.path.basename(parts[-1])[5:10]) + 1 if resume and parts else 0
+        self._buffer = []
+
+    def _keep_final_rows(self, part):
+        import pyarrow.compute as pc
+
+        table = self._pq.read_table(part)
+        final = pc.fill_null(pc.is_in(table.column("status"), value_set=self._pa.array(FINAL_STATUSES)), False)
+        if not pc.all(final).as_py():
+            self._pq.write_table(table.filter(final), part + ".tmp")
+            os.replace(part + ".tmp", part)
+
+    def write(self, quote):
+        self._buffer.append(quote)
+        if len(self._buffer) >= self.rows_per_part:
+            self.flush()
+
+    def flush(self):
+        if not self._buffer:
+            return
+        table = self._pa.Table.from_pylist(self._buffer, schema=self.schema)
+        part = os.path.join(self.path, f"part-{self._next_part:05d}.parquet")
+        # Write then rename, so a part file is either complete or absent
+        self._pq.write_table(table, part + ".tmp")
+        os.replace(part + ".tmp", part)
+        self._next_part += 1
+        self._buffer = []
+
+    def close(self):
+        self.flush()
+
+
+def _parquet_parts(path):
+    return sorted(glob.glob(os.path.join(path, "part-*.parquet")))
+
+
+def completed_ids(output_path, fmt):
+    """Ids of the requests already quoted with a final status in 'output_path'."""
+    if not os.path.exists(output_path):
+        return set()
+    done = set()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        for part in _parquet_parts(output_path):
+            table = pq.read_table(part, columns=["id", "status"])
+            for quote_id, status in zip(table.column("id").to_pylist(), table.column("status").to_pylist()):
+                if status in FINAL_STATUSES:
+                    done.add(quote_id)
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                quote = json.loads(line)
+            except ValueError:
+                continue
+            if quote.get("status") in FINAL_STATUSES:
+                done.add(quote.get("id"))
+    return done
+
+
+def output_format(output_path, fmt=None):
+    """'fmt', or "parquet"/"jsonl" from the output extension."""
+    return fmt or ("parquet" if output_path.lower().endswith(".parquet") else "jsonl")
+
+
+def quote_batch(input_path, output_path, fmt=None, concurrency=8, rate=5.0,
+                resume=True, on_progress=None):
+    """
+    Quote every request of 'input_path' into 'output_path' ("jsonl" or
+    "parquet"; by default from the output extension), with at most
+    'concurrency' requests in flight and 'rate' upstream/LLM calls per
+    second across all of them. on_progress(counts) is called after each
+    finished request. Returns the report dict of main().
+    """
+    fmt = output_format(output_path, fmt)
+    start = time.monotonic()
+    done = completed_ids(output_path, fmt) if resume else set()
+    writer = ParquetQuoteWriter(output_path, resume) if fmt == "parquet" else JsonlQuoteWriter(output_path, resume)
+    limiter = RateLimiter(rate)
+    counts = Counter()
+
+    def run(req):
+        try:
+            return quote_trip(req, limiter)
+        except Exception as e:
+            print(f"Quote {req['id']} failed: {e}")
+            quote = dict.fromkeys(name for name, _ in QUOTE_FIELDS)
+            quote.update(req, status="error", error=str(e))
+            return quote
+
+    def record(finished):
+        for future in finished:
+            quote = future.result()
+            writer.write(quote)
+            counts[quote["status"]] += 1
+            counts["quoted"] += 1
+            if on_progress is not None:
+                on_progress(dict(counts))
+
+    # Submit lazily so only 'concurrency' rows are held in memory at once;
+    # requests to the same destination share the cached/coalesced lookups
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="quote")
+    in_flight = set()
+    try:
+        for req in read_requests(input_path):
+            if req["id"] in done:
+                counts["skipped"] += 1
+                continue
+            if len(in_flight) >= concurrency:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                record(finished)
+            in_flight.add(executor.submit(propagate(run), req))
+        record(wait(in_flight).done)
+    finally:
+        # On interruption: keep what finished, drop what did not
+        executor.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+
+    return {"counts": dict(counts), "seconds": time.monotonic() - start, "output": output_path, "format": fmt}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quote a batch of trip requests.")
+    parser.add_argument("input", help="CSV or JSONL trip requests")
+    parser.add_argument("output", help="quotes: .jsonl file or .parquet dataset directory")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default=None)
+    parser.add_argument("--concurrency", type=int, default=8, help="requests quoted at once")
+    parser.add_argument("--rate", type=float, default=5.0, help="max upstream/LLM calls per second (0 = unlimited)")
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+    parser.add_argument("--cache-backend", choices=["sqlite", "memory"], default="sqlite",
+                        help="sqlite shares the result caches with the web workers and the next run")
+    args = parser.parse_args(argv)
+
+    if output_format(args.output, args.format) == "parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            print("Parquet output needs pyarrow (pip install pyarrow), or write a .jsonl file instead.")
+            return 2
+
+    load_dotenv()
+    use_cache_backend(args.cache_backend)
+
+    def progress(counts):
+        if counts["quoted"] % 100 == 0:
+            print(f"  {counts['quoted']} quoted ({counts.get('ok', 0)} ok)")
+
+    try:
+        report = quote_batch(args.input, args.output, args.format, args.concurrency,
+                             args.rate, not args.no_resume, progress)
+    except OSError as e:
+        print(f"Batch failed: {e}")
+        return 2
+
+    counts = report["counts"]
+    print(
+        f"Quoted {counts.get('quoted', 0)} requests in {report['seconds']:.1f}s "
+        f"({counts.get('skipped', 0)} already done) -> {report['output']}"
+    )
+    for status, count in sorted(counts.items()):
+        if status not in ("quoted", "skipped"):
+            print(f"  {status}: {count}")
+    return 0 if counts.get("error", 0) == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
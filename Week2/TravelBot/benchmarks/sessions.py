@@ -0,0 +1,378 @@
+"""
+End-to-end benchmark of the wizard: drives complete vacation, flight, hotel
+and activities sessions (/process_input -> /step2 ... /step9) through the
+Flask app against the local stub upstreams of stub_upstreams.py.
+
+    python benchmarks/sessions.py --sessions 20 --concurrency 4
+    python benchmarks/sessions.py --latency openai=300:0.3 --save-baseline benchmarks/baselines/default.json
+    python benchmarks/sessions.py --compare benchmarks/baselines/default.json
+
+Reports per service: p50/p95/p99 latency of every route, requests and
+sessions per second, upstream calls per session and memory per session
+(server-side memory retained, measured in a separate sequential pass, plus
+the size of the session cookie). --compare exits 1 on a regression.
+Baselines are per machine: record one locally with --save-baseline before
+comparing against it (benchmarks/baselines/ is not committed).
+"""
+import os
+import re
+import sys
+import gc
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import tracemalloc
+import urllib.request
+from datetime import date, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STUB_SCRIPT = os.path.join(APP_DIR, "benchmarks", "stub_upstreams.py")
+
+SERVICES = ("vacation", "flight", "hotel", "activities")
+# Destinations known to the stubs, used round-robin so caches see repeats
+CITIES = ("Paris", "Tokyo", "Barcelona", "Rome", "London", "Lisbon", "Chicago", "New York")
+# The intent classifier (stubbed) picks the service named in the request
+QUERIES = {
+    "vacation": "Plan a vacation for me",
+    "flight": "I need a flight",
+    "hotel": "Find me a hotel",
+    "activities": "Things to do, activities please",
+}
+
+_JOB_URL = re.compile(r"/jobs/([0-9a-f]{32})")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class StubUpstreams:
+    """stub_upstreams.py in a child process, so it does not share our GIL."""
+
+    def __init__(self, latency_specs, seed=0):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        args = [sys.executable, STUB_SCRIPT, "--port", str(self.port), "--seed", str(seed)]
+        for spec in latency_specs or []:
+            args += ["--latency", spec]
+        self.process = subprocess.Popen(args, stdout=subprocess.DEVNULL)
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                self.stats()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError("stub upstreams did not start")
+                time.sleep(0.05)
+
+    def stats(self):
+        with urllib.request.urlopen(self.url + "/_stats", timeout=2) as resp:
+            return json.load(resp)
+
+    def reset(self):
+        urllib.request.urlopen(urllib.request.Request(self.url + "/_reset", data=b"", method="POST"), timeout=2).close()
+
+    def close(self):
+        self.process.terminate()
+        self.process.wait(timeout=5)
+
+
+def configure_environment(stub_url, cache_dir):
+    """Point the app at the stubs; must run before the app is imported."""
+    host, port = stub_url.rsplit("//", 1)[1].split(":")
+    os.environ.update({
+        "OPENAI_API_KEY": "stub",
+        "OPENAI_API_BASE": stub_url + "/v1",   # langchain ChatOpenAI
+        "OPENAI_BASE_URL": stub_url + "/v1",   # openai client
+        "AMADEUS_API_KEY": "stub",
+        "AMADEUS_API_SECRET": "stub",
+        "AMADEUS_HOST": host,
+        "AMADEUS_PORT": port,
+        "AMADEUS_SSL": "0",
+        "NOMINATIM_URL": stub_url + "/search",
+        "ACTIVITY_CACHE_DIR": os.path.join(cache_dir, "activities"),
+        "TRAVELBOT_QUERY_LOG": "",
+        "TRAVELBOT_JOB_BACKEND": "memory",
+        "TRAVELBOT_CACHE_BACKEND": "memory",
+    })
+    if APP_DIR not in sys.path:
+        sys.path.insert(0, APP_DIR)
+
+
+class Recorder:
+    """Thread-safe latency samples per route."""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds):
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+
+    def count(self):
+        return sum(len(s) for s in self.samples.values())
+
+
+def _percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class WizardSession:
+    """One user going through the wizard with its own cookie jar."""
+
+    def __init__(self, app, recorder, poll_interval):
+        self.client = app.test_client()
+        self.recorder = recorder
+        self.poll_interval = poll_interval
+
+    def request(self, method, path, data=None):
+        route = f"{method} {_JOB_URL.sub('/jobs/<id>', path)}"
+        start = time.perf_counter()
+        resp = self.client.open(path, method=method, data=data)
+        body = resp.get_data(as_text=True)
+        self.recorder.record(route, time.perf_counter() - start)
+        if resp.status_code >= 500:
+            raise RuntimeError(f"{route} returned {resp.status_code}")
+        return body
+
+    def get_after_job(self, path):
+        """GET a step that may answer with the job wait page; poll like the page does."""
+        body = self.request("GET", path)
+        match = _JOB_URL.search(body)
+        while match and "job-progress" in body:
+            while True:
+                status = json.loads(self.request("GET", f"/jobs/{match.group(1)}"))["status"]
+                if status in ("done", "failed", "unknown"):
+                    break
+                time.sleep(self.poll_interval)
+            body = self.request("GET", path)
+            match = _JOB_URL.search(body)
+        return body
+
+    def cookie_bytes(self):
+        try:
+            cookie = self.client.get_cookie("session")
+        except AttributeError:  # Werkzeug < 2.3
+            cookie = next((c for c in self.client.cookie_jar if c.name == "session"), None)
+        return len(cookie.value) if cookie is not None else 0
+
+    def run(self, service, city):
+        depart = date.today() + timedelta(days=30)
+        dates = {"dep_date": depart.isoformat(), "ret_date": (depart + timedelta(days=7)).isoformat()}
+
+        self.request("GET", "/")
+        self.request("POST", "/process_input", {"user_query": QUERIES[service]})
+        self.request("GET", "/step2")
+        self.request("POST", "/step2", {"location": city})
+        self.request("GET", "/step3")
+        self.request("POST", "/step3")
+
+        if service in ("vacation", "flight"):
+            self.request("GET", "/step4")
+            self.request("POST", "/step4")
+        if service in ("vacation", "flight", "hotel"):
+            self.request("GET", "/step5")
+            self.request("POST", "/step5", dates)
+        if service in ("vacation", "flight"):
+            self.request("GET", "/step6_options")
+            self.request("POST", "/step6_options", {"flight_extras": "1 adult, economy"})
+            self.get_after_job("/step6")
+            self.request("POST", "/step6", {"chosen_flight_index": "0"})
+        if service == "vacation":
+            self.request("GET", "/step7_options")
+            self.request("POST", "/step7_options", {"hotel_extras": "1 adult, 1 room"})
+        if service in ("vacation", "hotel"):
+            self.get_after_job("/step7")
+            self.request("POST", "/step7", {"see_offers": "1", "selected_hotel": "0"})
+            self.request("GET", "/step7")
+            self.request("POST", "/step7", {"confirm_hotel_offer": "1", "chosen_offer_index": "0"})
+        if service in ("vacation", "flight", "activities"):
+            self.request("GET", "/step8")
+            self.request("POST", "/step8", {"activity_choice": ["0", "1"]})
+        if service != "flight":
+            self.request("GET", "/step9")
+
+
+def reset_caches():
+    """Start a service from cold caches so its numbers do not depend on run order."""
+    from apis.cache import cache
+    from activities_api import activity_cache
+    cache.clear()
+    activity_cache.clear()
+
+
+def run_service(app, stubs, service, sessions, concurrency, poll_interval):
+    """Run 'sessions' sessions of 'service' with 'concurrency' users at a time."""
+    reset_caches()
+    recorder = Recorder()
+    cookie_sizes = []
+    stubs.reset()
+
+    def one(i):
+        session = WizardSession(app, recorder, poll_interval)
+        session.run(service, CITIES[i % len(CITIES)])
+        cookie_sizes.append(session.cookie_bytes())
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(sessions)))
+    elapsed = time.perf_counter() - start
+    upstream = stubs.stats()
+
+    routes = {}
+    for route, samples in sorted(recorder.samples.items()):
+        ordered = sorted(samples)
+        routes[route] = {
+            "count": len(ordered),
+            "p50_ms": _percentile(ordered, 0.50) * 1000,
+            "p95_ms": _percentile(ordered, 0.95) * 1000,
+            "p99_ms": _percentile(ordered, 0.99) * 1000,
+        }
+    return {
+        "sessions": sessions,
+        "seconds": elapsed,
+        "requests_per_second": recorder.count() / elapsed,
+        "sessions_per_second": sessions / elapsed,
+        "routes": routes,
+        "upstream_calls_per_session": {k: v / sessions for k, v in sorted(upstream.items())},
+        "upstream_calls_total_per_session": sum(upstream.values()) / sessions,
+        "cookie_bytes": max(cookie_sizes) if cookie_sizes else 0,
+    }
+
+
+def memory_per_session(app, service, sessions, poll_interval):
+    """Bytes of server-side memory still held after each sequential session."""
+    recorder = Recorder()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(sessions):
+        WizardSession(app, recorder, poll_interval).run(service, CITIES[i % len(CITIES)])
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return max(0, after - before) / sessions
+
+
+def run_benchmark(services=SERVICES, sessions=12, concurrency=4, latency=None,
+                  memory_sessions=4, poll_interval=0.1, seed=0):
+    """Run every service type; returns the report dict."""
+    stubs = StubUpstreams(latency, seed)
+    cache_dir = tempfile.mkdtemp(prefix="travelbot-bench-")
+    try:
+        configure_environment(stubs.url, cache_dir)
+        from app import app  # imported only now: configuration is read at import
+        from preload import preload
+        preload()  # as wsgi.py does: keep one-time import cost out of the first service
+
+        report = {
+            "config": {"sessions": sessions, "concurrency": concurrency, "latency": latency or [],
+                       "memory_sessions": memory_sessions, "python": sys.version.split()[0]},
+            "services": {},
+        }
+        for service in services:
+            result = run_service(app, stubs, service, sessions, concurrency, poll_interval)
+            if memory_sessions:
+                result["memory_bytes_per_session"] = memory_per_session(app, service, memory_sessions, poll_interval)
+            report["services"][service] = result
+        return report
+    finally:
+        stubs.close()
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def print_report(report):
+    for service, result in report["services"].items():
+        print(f"\n== {service}: {result['sessions']} sessions in {result['seconds']:.1f}s, "
+              f"{result['requests_per_second']:.1f} req/s, {result['sessions_per_second']:.2f} sessions/s")
+        print(f"   {'route':<26}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        for route, stats in result["routes"].items():
+            print(f"   {route:<26}{stats['count']:>7}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+        calls = ", ".join(f"{k} {v:.1f}" for k, v in result["upstream_calls_per_session"].items())
+        print(f"   upstream calls/session: {result['upstream_calls_total_per_session']:.1f} ({calls})")
+        memory = result.get("memory_bytes_per_session")
+        if memory is not None:
+            print(f"   memory/session: {memory / 1024:.1f} KiB server-side, {result['cookie_bytes']} B cookie")
+
+
+def compare(report, baseline, tolerance=0.2, min_delta_ms=25.0):
+    """
+    Regressions of 'report' against 'baseline', as a list of messages. Tails
+    are noisier than medians, so p95 gets twice the tolerance of p50.
+    """
+    problems = []
+    for service, result in report["services"].items():
+        base = baseline.get("services", {}).get(service)
+        if base is None:
+            continue
+        for route, stats in result["routes"].items():
+            old = base["routes"].get(route)
+            if old is None or stats["count"] < 5:
+                continue
+            for key, allowed in (("p50_ms", tolerance), ("p95_ms", 2 * tolerance)):
+                if stats[key] - old[key] > min_delta_ms and stats[key] > old[key] * (1 + allowed):
+                    problems.append(f"{service} {route}: {key[:3]} {old[key]:.1f} -> {stats[key]:.1f} ms")
+        if result["upstream_calls_total_per_session"] > base["upstream_calls_total_per_session"] + 0.5:
+            problems.append(f"{service}: upstream calls/session {base['upstream_calls_total_per_session']:.1f}"
+                            f" -> {result['upstream_calls_total_per_session']:.1f}")
+        if result["requests_per_second"] < base["requests_per_second"] * (1 - tolerance):
+            problems.append(f"{service}: req/s {base['requests_per_second']:.1f} -> {result['requests_per_second']:.1f}")
+        old_mem, new_mem = base.get("memory_bytes_per_session"), result.get("memory_bytes_per_session")
+        if old_mem and new_mem and new_mem > old_mem * (1 + tolerance) and new_mem - old_mem > 4096:
+            problems.append(f"{service}: memory/session {old_mem / 1024:.1f} -> {new_mem / 1024:.1f} KiB")
+        if result["cookie_bytes"] > base["cookie_bytes"] * (1 + tolerance):
+            problems.append(f"{service}: session cookie {base['cookie_bytes']} -> {result['cookie_bytes']} B")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark complete TravelBot wizard sessions against stub upstreams.")
+    parser.add_argument("--services", nargs="+", choices=SERVICES, default=list(SERVICES))
+    parser.add_argument("--sessions", type=int, default=12, help="sessions per service")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent users")
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=MEDIAN_MS[:SIGMA]",
+                        help="stub latency of openai, amadeus or nominatim (repeatable)")
+    parser.add_argument("--memory-sessions", type=int, default=4, help="sequential sessions for the memory pass (0 = skip)")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="seconds between job status polls")
+    parser.add_argument("--json", help="write the full report here")
+    parser.add_argument("--save-baseline", metavar="PATH", help="record this run as the baseline")
+    parser.add_argument("--compare", metavar="PATH", help="baseline to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    parser.add_argument("--min-delta-ms", type=float, default=25.0, help="ignore latency changes smaller than this")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args.services, args.sessions, args.concurrency, args.latency,
+                           args.memory_sessions, args.poll_interval)
+    print_report(report)
+
+    for path in filter(None, (args.json, args.save_baseline)):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nReport written to {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            problems = compare(report, json.load(f), args.tolerance, args.min_delta_ms)
+        if problems:
+            print(f"\nRegressions against {args.compare}:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
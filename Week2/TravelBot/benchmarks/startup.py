@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark: time `import app` in fresh interpreters and fail when
+it exceeds the budget or pulls in a dependency that should load lazily.
+
+    python benchmarks/startup.py --runs 5 --budget-ms 400
+    python benchmarks/startup.py --detail      # slowest modules (-X importtime)
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must not be imported by `import app` (see preload.py)
+LAZY_MODULES = ("langchain", "langchain_core", "langchain_community", "openai", "amadeus", "requests")
+
+STARTUP_BUDGET_MS = float(os.getenv("TRAVELBOT_STARTUP_BUDGET_MS", "400"))
+
+_PROBE = (
+    "import sys, time, json\n"
+    "start = time.perf_counter()\n"
+    "import app\n"
+    "elapsed = time.perf_counter() - start\n"
+    "lazy = %r\n"
+    "print(json.dumps({'ms': elapsed * 1000,"
+    " 'loaded': [m for m in lazy if m in sys.modules]}))\n"
+) % (LAZY_MODULES,)
+
+
+def measure_once():
+    """Import the app in a fresh interpreter; returns (milliseconds, eagerly loaded lazy modules)."""
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE], cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(out.strip().splitlines()[-1])
+    return result["ms"], result["loaded"]
+
+
+def slowest_imports(limit=15):
+    """Top 'limit' modules by cumulative import time, from python -X importtime."""
+    err = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=APP_DIR, capture_output=True, text=True, check=True
+    ).stderr
+    rows = []
+    for line in err.splitlines():
+        # "import time:   self_us | cumulative_us | module"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure TravelBot cold-start import time.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--detail", action="store_true", help="list the slowest imports")
+    args = parser.parse_args(argv)
+
+    times, eager = [], set()
+    for _ in range(args.runs):
+        ms, loaded = measure_once()
+        times.append(ms)
+        eager.update(loaded)
+
+    median = statistics.median(times)
+    print(f"import app: median {median:.0f} ms, min {min(times):.0f} ms, max {max(times):.0f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    if args.detail:
+        for cumulative_us, name in slowest_imports():
+            print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    ok = True
+    if eager:
+        print(f"FAIL: imported at startup but should load lazily: {', '.join(sorted(eager))}")
+        ok = False
+    if median > args.budget_ms:
+        print(f"FAIL: startup over budget by {median - args.budget_ms:.0f} ms")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Local stand-ins for OpenAI, Amadeus and Nominatim, for benchmarking the
+wizard without network access, API keys or rate limits.
+
+    python benchmarks/stub_upstreams.py --port 8765 --latency amadeus=300:0.6
+
+One HTTP server answers all three APIs with small canned payloads after a
+random delay drawn per upstream from a log-normal distribution (median ms,
+sigma). Delays are seeded by the request itself (and how often it was seen),
+so the same workload gets the same delays in every run whatever the thread
+interleaving. GET /_stats returns the calls served per upstream and endpoint,
+POST /_reset clears them.
+"""
+import json
+import math
+import time
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+# upstream -> (median_ms, sigma) of the log-normal response delay
+DEFAULT_LATENCY = {
+    "openai": (700.0, 0.5),
+    "amadeus": (250.0, 0.6),
+    "nominatim": (150.0, 0.4),
+}
+
+CITIES = {
+    "paris": ("Paris", "", "France", "PAR", 48.8566, 2.3522),
+    "tokyo": ("Tokyo", "", "Japan", "TYO", 35.6762, 139.6503),
+    "new york": ("New York", "New York", "United States", "NYC", 40.7128, -74.0060),
+    "barcelona": ("Barcelona", "", "Spain", "BCN", 41.3874, 2.1686),
+    "rome": ("Rome", "", "Italy", "ROM", 41.9028, 12.4964),
+    "london": ("London", "", "United Kingdom", "LON", 51.5072, -0.1276),
+    "lisbon": ("Lisbon", "", "Portugal", "LIS", 38.7223, -9.1393),
+    "chicago": ("Chicago", "Illinois", "United States", "CHI", 41.8781, -87.6298),
+}
+DETROIT = ("Detroit", "Michigan", "United States", "DTW", 42.2162, -83.3554)
+
+
+def lookup_city(text):
+    """The known city mentioned in 'text' (Detroit when none is)."""
+    text = (text or "").casefold()
+    for name, city in CITIES.items():
+        if name in text or city[3].casefold() == text.strip():
+            return city
+    return DETROIT
+
+
+def _rng(*parts):
+    """Deterministic RNG per request so identical queries get identical data."""
+    seed = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return random.Random(int(seed[:12], 16))
+
+
+# -- canned payloads ----------------------------------------------------------
+
+def amadeus_locations(query):
+    city = lookup_city(query.get("keyword", ""))
+    return [
+        {"subType": "CITY", "iataCode": city[3], "name": city[0].upper(),
+         "geoCode": {"latitude": city[4], "longitude": city[5]}},
+        {"subType": "AIRPORT", "iataCode": city[3][:2] + "X", "name": city[0].upper() + " INTL",
+         "geoCode": {"latitude": city[4] + 0.1, "longitude": city[5] + 0.1}},
+    ]
+
+
+def amadeus_airports(query):
+    lat, lon = float(query["latitude"]), float(query["longitude"])
+    rng = _rng("airports", round(lat, 2), round(lon, 2))
+    return [
+        {"iataCode": "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3)),
+         "geoCode": {"latitude": lat + rng.uniform(-.5, .5), "longitude": lon + rng.uniform(-.5, .5)}}
+        for _ in range(3)
+    ]
+
+
+def amadeus_flight_offers(query):
+    origin, dest = query["originLocationCode"], query["destinationLocationCode"]
+    date = query.get("departureDate", "2026-01-01")
+    rng = _rng("flights", origin, dest, date)
+    offers = []
+    for i in range(int(query.get("max", 10))):
+        hours = rng.randint(2, 14)
+        offers.append({
+            "id": str(i + 1),
+            "price": {"grandTotal": f"{rng.uniform(150, 1500):.2f}", "currency": "USD"},
+            "itineraries": [{
+                "duration": f"PT{hours}H{rng.randint(0, 59)}M",
+                "segments": [{
+                    "id": "1", "carrierCode": rng.choice(["DL", "AF", "UA", "BA"]),
+                    "number": str(rng.randint(100, 9999)),
+                    "departure": {"iataCode": origin, "at": f"{date}T{rng.randint(6, 20):02d}:00:00"},
+                    "arrival": {"iataCode": dest, "at": f"{date}T23:00:00"},
+                    "duration": f"PT{hours}H",
+                }],
+            }],
+            "travelerPricings": [],
+        })
+    return offers
+
+
+def amadeus_hotels_by_city(query):
+    city = lookup_city(query.get("cityCode", ""))
+    rng = _rng("hotels", query.get("cityCode"))
+    return [
+        {"name": f"STUB HOTEL {i}", "hotelId": f"{query.get('cityCode', 'XXX')}{i:05d}",
+         "geoCode": {"latitude": city[4] + rng.uniform(-.08, .08), "longitude": city[5] + rng.uniform(-.08, .08)}}
+        for i in range(40)
+    ]
+
+
+def amadeus_hotel_offers(query):
+    data = []
+    for hotel_id in query.get("hotelIds", "").split(","):
+        rng = _rng("hotel_offers", hotel_id, query.get("checkInDate"))
+        data.append({
+            "hotel": {"hotelId": hotel_id},
+            "offers": [{
+                "id": f"{hotel_id}-{j}",
+                "price": {"total": f"{rng.uniform(80, 600):.2f}"},
+                "checkInDate": query.get("checkInDate", "2026-01-01"),
+                "checkOutDate": query.get("checkOutDate", "2026-01-05"),
+                "room": {"typeEstimated": {"category": rng.choice(["STANDARD_ROOM", "SUPERIOR_ROOM"])}},
+                "guests": {"adults": int(query.get("adults", 1))},
+            } for j in range(3)],
+        })
+    return data
+
+
+def amadeus_activities(query):
+    lat, lon = float(query["latitude"]), float(query["longitude"])
+    radius = float(query.get("radius", 1))
+    rng = _rng("activities", round(lat, 3), round(lon, 3), radius)
+    spread = radius / 111.0
+    return [
+        {"id": f"A{i}", "name": f"Stub activity {i}",
+         "geoCode": {"latitude": lat + rng.uniform(-spread, spread), "longitude": lon + rng.uniform(-spread, spread)},
+         "price": {"amount": f"{rng.uniform(10, 150):.2f}", "currencyCode": "USD"}}
+        for i in range(15)
+    ]
+
+
+def nominatim_search(query):
+    city = lookup_city(query.get("q", ""))
+    return [{"lat": str(city[4]), "lon": str(city[5]), "display_name": f"{city[0]}, {city[2]}"}]
+
+
+def openai_chat(body):
+    """Answer the app's three prompt shapes: service intent, location parse, tool call."""
+    messages = body.get("messages", [])
+    text = "\n".join(m.get("content") or "" for m in messages if isinstance(m, dict))
+    message = {"role": "assistant", "content": None}
+
+    if body.get("tools"):
+        name = body["tools"][0]["function"]["name"]
+        arguments = {"adults": 1} if "hotel" in name else {"adults": 1, "nonStop": False}
+        message["tool_calls"] = [{
+            "id": "call_stub", "type": "function",
+            "function": {"name": name, "arguments": json.dumps(arguments)},
+        }]
+    elif "User request:" in text:
+        request_text = text.split("User request:", 1)[1].casefold()
+        service = next((s for s in ("flight", "hotel", "activities") if s in request_text.split("\n")[0]), "vacation")
+        message["content"] = json.dumps({"service": service})
+    else:
+        parsed = text.rsplit("Now parse this user input:", 1)[-1]
+        city = lookup_city(parsed.split("Return a JSON object", 1)[0])
+        message["content"] = "```json\n" + json.dumps({
+            "city": city[0], "state": city[1], "country": city[2], "clarifications": ""
+        }) + "\n```"
+
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message,
+                     "finish_reason": "tool_calls" if body.get("tools") else "stop"}],
+        "usage": {"prompt_tokens": len(text) // 4, "completion_tokens": 20, "total_tokens": len(text) // 4 + 20},
+    }
+
+
+# (method, path) -> (upstream, endpoint name, handler)
+ROUTES = {
+    ("GET", "/v1/reference-data/locations"): ("amadeus", "locations", amadeus_locations),
+    ("GET", "/v1/reference-data/locations/airports"): ("amadeus", "airports", amadeus_airports),
+    ("GET", "/v2/shopping/flight-offers"): ("amadeus", "flight_offers", amadeus_flight_offers),
+    ("GET", "/v1/reference-data/locations/hotels/by-city"): ("amadeus", "hotels_by_city", amadeus_hotels_by_city),
+    ("GET", "/v3/shopping/hotel-offers"): ("amadeus", "hotel_offers", amadeus_hotel_offers),
+    ("GET", "/v1/shopping/activities"): ("amadeus", "activities", amadeus_activities),
+    ("GET", "/search"): ("nominatim", "search", nominatim_search),
+}
+
+
+class StubState:
+    """Latency settings and call counters shared by the handler threads."""
+
+    def __init__(self, latency, seed=0):
+        self.latency = latency
+        self.seed = seed
+        self.calls = Counter()
+        self._seen = Counter()
+        self._lock = threading.Lock()
+
+    def delay(self, upstream, request_key):
+        median_ms, sigma = self.latency.get(upstream, (0.0, 0.0))
+        if median_ms <= 0:
+            return
+        with self._lock:
+            self._seen[request_key] += 1
+            occurrence = self._seen[request_key]
+        gauss = _rng(self.seed, request_key, occurrence).gauss(0.0, sigma)
+        time.sleep(median_ms / 1000.0 * math.exp(gauss))
+
+    def count(self, upstream, endpoint):
+        with self._lock:
+            self.calls[f"{upstream}.{endpoint}"] += 1
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self._seen.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.calls)
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload, content_type="application/json"):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            return self.rfile.read(length) if length else b""
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path == "/_stats":
+                return self._send(200, state.snapshot())
+            route = ROUTES.get(("GET", url.path))
+            if route is None:
+                return self._send(404, {"errors": [{"detail": f"no stub for {url.path}"}]})
+            upstream, endpoint, handler = route
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            state.count(upstream, endpoint)
+            state.delay(upstream, self.path)
+            if upstream == "amadeus":
+                return self._send(200, {"data": handler(query)}, "application/vnd.amadeus+json")
+            return self._send(200, handler(query))
+
+        def do_POST(self):
+            url = urlparse(self.path)
+            body = self._body()
+            if url.path == "/_reset":
+                state.reset()
+                return self._send(200, {})
+            if url.path == "/v1/security/oauth2/token":
+                state.count("amadeus", "token")
+                return self._send(200, {"access_token": "stub-token", "token_type": "Bearer",
+                                        "expires_in": 1799}, "application/json")
+            if url.path.endswith("/chat/completions"):
+                state.count("openai", "chat")
+                state.delay("openai", body)
+                return self._send(200, openai_chat(json.loads(body or b"{}")))
+            return self._send(404, {"error": f"no stub for {url.path}"})
+
+    return Handler
+
+
+def parse_latency(specs):
+    """['amadeus=300:0.6', ...] -> DEFAULT_LATENCY updated with those (median_ms, sigma)."""
+    latency = dict(DEFAULT_LATENCY)
+    for spec in specs or []:
+        upstream, _, value = spec.partition("=")
+        median, _, sigma = value.partition(":")
+        latency[upstream] = (float(median), float(sigma or 0.0))
+    return latency
+
+
+def serve(port, latency, seed=0):
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(StubState(latency, seed)))
+    server.daemon_threads = True
+    print(f"Stub upstreams on http://127.0.0.1:{server.server_address[1]} latency={latency}", flush=True)
+    server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve stub OpenAI/Amadeus/Nominatim APIs.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", action="append", metavar="UPSTREAM=MEDIAN_MS[:SIGMA]",
+                        help="log-normal delay of openai, amadeus or nominatim (repeatable)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    serve(args.port, parse_latency(args.latency), args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import gc
+import os
+import sys
+import subprocess
+import multiprocessing
+
+# gunicorn -c gunicorn.conf.py wsgi:application
+#
+# The app is imported once in the master and forked into the workers, so
+# code and module state are shared copy-on-write instead of loaded per
+# worker. Caches and jobs live in shared SQLite files (see wsgi.py), so
+# memory per extra worker stays small and the hit rate does not depend on
+# which worker serves a request.
+
+bind = os.getenv("TRAVELBOT_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("TRAVELBOT_WORKERS", str(min(4, multiprocessing.cpu_count()))))
+# Requests mostly wait on upstream APIs and the LLM: threads are cheap
+# concurrency within one worker
+worker_class = "gthread"
+threads = int(os.getenv("TRAVELBOT_THREADS", "8"))
+preload_app = True
+timeout = int(os.getenv("TRAVELBOT_TIMEOUT", "60"))
+graceful_timeout = 30
+accesslog = os.getenv("TRAVELBOT_ACCESS_LOG", "-")
+
+
+def on_starting(server):
+    # Metrics start from zero with each deployment; rows of the previous
+    # run's workers would otherwise be summed forever
+    from apis import tracing
+    if tracing.shared_metrics is not None:
+        tracing.shared_metrics.clear()
+
+    # Optional cache warm-up before accepting traffic. It runs as its own
+    # process: the thread pools it uses must not exist in the master when
+    # workers are forked. Results land in the shared cache.
+    if os.getenv("TRAVELBOT_WARMUP_ON_START", "0") == "1":
+        server.log.info("Warming caches from the query log")
+        subprocess.run(
+            [sys.executable, "warmup.py", "--max-seconds", os.getenv("TRAVELBOT_WARMUP_SECONDS", "120")],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=False
+        )
+
+
+def when_ready(server):
+    # Keep the preloaded objects out of the garbage collector's scans so
+    # workers do not touch (and copy) those pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Every worker takes jobs from the shared queue
+    from wsgi import jobs
+    jobs.start()
@@ -0,0 +1,161 @@
+# helpers/bundle_optimizer.py
+
+import os
+import re
+import numpy as np
+
+# Default scoring weights (lower score is better). Each term is scaled so that
+# a weight of 1.0 means "the worst candidate costs one point":
+#   price    - total bundle price as a fraction of the budget
+#   duration - flight duration relative to the longest flight
+#   stops    - flight stops relative to the most stops
+#   distance - hotel distance relative to the farthest hotel (unknown
+#              distances count as the farthest)
+#   activity - bonus subtracted when the bundle includes an activity
+BUNDLE_WEIGHTS = {
+    "price": float(os.getenv("BUNDLE_WEIGHT_PRICE", "1.0")),
+    "duration": float(os.getenv("BUNDLE_WEIGHT_DURATION", "0.3")),
+    "stops": float(os.getenv("BUNDLE_WEIGHT_STOPS", "0.2")),
+    "distance": float(os.getenv("BUNDLE_WEIGHT_DISTANCE", "0.2")),
+    "activity": float(os.getenv("BUNDLE_WEIGHT_ACTIVITY", "0.1")),
+}
+
+# Upper bound on the number of (flight, hotel, activity) cells scored at once
+_CHUNK_CELLS = 1_000_000
+
+_DURATION_RE = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?")
+
+
+def parse_duration_minutes(iso_duration):
+    """'PT7H30M' / 'P1DT2H' -> minutes. Unknown formats count as 0."""
+    match = _DURATION_RE.fullmatch(iso_duration or "")
+    if not match:
+        return 0
+    days, hours, minutes = (int(g) if g else 0 for g in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+def _to_float(value, default=np.inf):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def flight_features(flights):
+    """Arrays (price, duration_minutes, stops) for Amadeus flight offers."""
+    price = np.array([_to_float(f.get("price", {}).get("grandTotal")) for f in flights], dtype=np.float64)
+    duration = np.array([
+        sum(parse_duration_minutes(it.get("duration")) for it in f.get("itineraries", []))
+        for f in flights
+    ], dtype=np.float64)
+    stops = np.array([
+        sum(max(len(it.get("segments", [])) - 1, 0) for it in f.get("itineraries", []))
+        for f in flights
+    ], dtype=np.float64)
+    return price, duration, stops
+
+
+def skyband(price, score, k):
+    """
+    Indices of candidates dominated by fewer than k others on (price, score).
+    A candidate dominated by k others can be swapped for each of them in any
+    bundle, giving k bundles that are no worse, so it can never be in a top-k.
+    """
+    n = len(price)
+    if n <= k:
+        return np.arange(n)
+    le = (price[:, None] <= price[None, :]) & (score[:, None] <= score[None, :])
+    lt = (price[:, None] < price[None, :]) | (score[:, None] < score[None, :])
+    dominated_by = (le & lt).sum(axis=0)
+    return np.flatnonzero(dominated_by < k)
+
+
+def _fill_worst(values):
+    """NaNs (unknown) replaced by the largest known value, like geo_ranking._normalize."""
+    return np.where(np.isnan(values), np.nanmax(values) if np.isfinite(values).any() else 0.0, values)
+
+
+def _scaled(values):
+    top = np.max(values) if len(values) else 0.0
+    return values / top if top > 0 else np.zeros_like(values)
+
+
+def optimize_bundles(flights, hotel_offers, activities, budget, k=5, weights=None):
+    """
+    Return the top-k trip bundles whose total price is within 'budget'.
+      - flights: Amadeus flight offers (as listed on /step6)
+      - hotel_offers: dicts with "price" and optional "distance_km" (/step7)
+      - activities: dicts with "price" (/step8); a bundle takes one or none.
+        Activities without a price never fit the budget, like flights and
+        hotels without one
+    Each result is a dict with flight/hotel/activity indices into the inputs
+    (activity is None when no activity is included), total_price and score.
+    """
+    w = dict(BUNDLE_WEIGHTS)
+    w.update(weights or {})
+    if not flights or not hotel_offers or budget is None or budget <= 0:
+        return []
+
+    f_price, f_duration, f_stops = flight_features(flights)
+    h_price = np.array([_to_float(h.get("price")) for h in hotel_offers], dtype=np.float64)
+    h_dist = _fill_worst(np.array([_to_float(h.get("distance_km"), np.nan) for h in hotel_offers], dtype=np.float64))
+    # Index 0 is "no activity"
+    a_price = np.array([0.0] + [_to_float(a.get("price")) for a in activities], dtype=np.float64)
+
+    # Per-component score; the total score of a bundle is their sum
+    f_score = w["price"] * f_price / budget + w["duration"] * _scaled(f_duration) + w["stops"] * _scaled(f_stops)
+    h_score = w["price"] * h_price / budget + w["distance"] * _scaled(h_dist)
+    a_score = w["price"] * a_price / budget - w["activity"] * (np.arange(len(a_price)) > 0)
+
+    # Prune anything that cannot fit the budget even with the cheapest partners
+    f_idx = np.flatnonzero(f_price + h_price.min() + a_price.min() <= budget)
+    h_idx = np.flatnonzero(h_price + f_price.min() + a_price.min() <= budget)
+    a_idx = np.flatnonzero(a_price + f_price.min() + h_price.min() <= budget)
+    if not len(f_idx) or not len(h_idx):
+        return []
+
+    # Keep only candidates that can still appear in a top-k bundle
+    f_idx = f_idx[skyband(f_price[f_idx], f_score[f_idx], k)]
+    h_idx = h_idx[skyband(h_price[h_idx], h_score[h_idx], k)]
+    a_idx = a_idx[skyband(a_price[a_idx], a_score[a_idx], k)]
+
+    hp, hs = h_price[h_idx], h_score[h_idx]
+    ap, as_ = a_price[a_idx], a_score[a_idx]
+    ha_price = hp[:, None] + ap[None, :]
+    ha_score = hs[:, None] + as_[None, :]
+
+    best_scores = np.empty(0)
+    best_cells = np.empty((0, 3), dtype=np.int64)
+    chunk = max(1, _CHUNK_CELLS // ha_price.size)
+    for start in range(0, len(f_idx), chunk):
+        fi = f_idx[start:start + chunk]
+        total = f_price[fi][:, None, None] + ha_price[None, :, :]
+        score = f_score[fi][:, None, None] + ha_score[None, :, :]
+        score = np.where(total <= budget, score, np.inf).ravel()
+
+        take = min(k, np.count_nonzero(np.isfinite(score)))
+        if take == 0:
+            continue
+        top = np.argpartition(score, take - 1)[:take]
+        f_pos, h_pos, a_pos = np.unravel_index(top, (len(fi), len(h_idx), len(a_idx)))
+        cells = np.stack([fi[f_pos], h_idx[h_pos], a_idx[a_pos]], axis=1)
+
+        best_scores = np.concatenate([best_scores, score[top]])
+        best_cells = np.concatenate([best_cells, cells])
+        if len(best_scores) > k:
+            keep = np.argpartition(best_scores, k - 1)[:k]
+            best_scores, best_cells = best_scores[keep], best_cells[keep]
+
+    order = np.argsort(best_scores, kind="stable")
+    bundles = []
+    for i in order:
+        f, h, a = (int(x) for x in best_cells[i])
+        bundles.append({
+            "flight": f,
+            "hotel": h,
+            "activity": a - 1 if a > 0 else None,
+            "total_price": round(float(f_price[f] + h_price[h] + a_price[a]), 2),
+            "score": float(best_scores[i]),
+        })
+    return bundles
@@ -0,0 +1,59 @@
+# helpers/formatting.py
+
+# Text summaries of API results, shared by the wizard (app.py) and the batch
+# quotes command (batch.py) so neither has to import the other.
+
+
+def format_flight_option(f):
+    """
+    Render one Amadeus flight offer as the multi-line summary shown on step 6.
+    Returns (summary_text, price_value).
+    """
+    flight_id = f.get("id", "UnknownID")
+    price_str = f.get("price", {}).get("grandTotal", "0")
+    currency = f.get("price", {}).get("currency", "USD")
+    num_seats = f.get("numberOfBookableSeats", "N/A")
+    validating_airlines = ", ".join(f.get("validatingAirlineCodes", ["N/A"]))
+
+    try:
+        price_val = float(price_str)
+    except:
+        price_val = 0.0
+
+    summary_lines = [
+        f"Flight ID: {flight_id}",
+        f"Price: {currency} {price_str}",
+        f"Seats Available: {num_seats}",
+        f"Validating Airline: {validating_airlines}",
+    ]
+
+    for i, itin in enumerate(f.get("itineraries", []), start=1):
+        summary_lines.append(f"  Itinerary {i}: Duration {itin.get('duration', 'N/A')}")
+        for j, seg in enumerate(itin.get("segments", []), start=1):
+            dep_iata = seg.get("departure", {}).get("iataCode", "")
+            dep_time = seg.get("departure", {}).get("at", "N/A")
+            arr_iata = seg.get("arrival", {}).get("iataCode", "")
+            arr_time = seg.get("arrival", {}).get("at", "N/A")
+            carrier = seg.get("carrierCode", "N/A")
+            flight_num = seg.get("number", "N/A")
+            aircraft = seg.get("aircraft", {}).get("code", "N/A")
+            duration = seg.get("duration", "N/A")
+
+            # Get Travel Class & Baggage Info
+            travel_class_name = "N/A"
+            baggage_info = "N/A"
+
+            for traveler in f.get("travelerPricings", []):
+                for fare_details in traveler.get("fareDetailsBySegment", []):
+                    if fare_details.get("segmentId") == seg.get("id"):
+                        travel_class_name = fare_details.get("cabin", "N/A")
+                        baggage_info = f"{fare_details.get('includedCheckedBags', {}).get('weight', 'N/A')} {fare_details.get('includedCheckedBags', {}).get('weightUnit', 'KG')}"
+
+            seg_line = (
+                f"    Segment {j}: {dep_iata} ({dep_time}) → {arr_iata} ({arr_time})\n"
+                f"      - Carrier: {carrier}, Flight {flight_num}, Aircraft {aircraft}, Duration: {duration}\n"
+                f"      - Travel Class: {travel_class_name}, Checked Baggage: {baggage_info}"
+            )
+            summary_lines.append(seg_line)
+
+    return "\n".join(summary_lines), price_val
@@ -0,0 +1,99 @@
+# helpers/geohash.py
+
+import math
+
+from helpers.geo_ranking import haversine_km
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_KM_PER_DEG_LAT = 111.32
+
+
+def encode(lat, lon, precision=5):
+    """Standard geohash of (lat, lon) with 'precision' characters."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    chars, bits, ch, even = [], 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                ch = (ch << 1) | 1
+                lon_lo = mid
+            else:
+                ch <<= 1
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def bounds(geohash):
+    """Return the cell of 'geohash' as (lat_lo, lat_hi, lon_lo, lon_hi)."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    even = True
+    for c in geohash:
+        value = _BASE32.index(c)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            if even:
+                mid = (lon_lo + lon_hi) / 2
+                if bit:
+                    lon_lo = mid
+                else:
+                    lon_hi = mid
+            else:
+                mid = (lat_lo + lat_hi) / 2
+                if bit:
+                    lat_lo = mid
+                else:
+                    lat_hi = mid
+            even = not even
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def cell_size_deg(precision):
+    """(lat_height, lon_width) of a geohash cell at 'precision', in degrees."""
+    lon_bits = math.ceil(5 * precision / 2)
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lon_bits
+
+
+def covering_cells(lat, lon, radius_km, precision=5):
+    """
+    Geohash cells at 'precision' whose area may intersect the circle of
+    'radius_km' around (lat, lon). Cells are walked over the circle's bounding
+    box and kept when their closest point is within the radius.
+    """
+    dlat = radius_km / _KM_PER_DEG_LAT
+    dlon = radius_km / (_KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    cell_lat, cell_lon = cell_size_deg(precision)
+
+    cells = []
+    y = max(lat - dlat, -90.0)
+    while y <= min(lat + dlat, 90.0) + cell_lat:
+        x = lon - dlon
+        while x <= lon + dlon + cell_lon:
+            wrapped = (x + 180.0) % 360.0 - 180.0
+            cell = encode(min(y, 89.999999), wrapped, precision)
+            if cell not in cells:
+                lat_lo, lat_hi, lon_lo, lon_hi = bounds(cell)
+                near_lat = min(max(lat, lat_lo), lat_hi)
+                # Measured on the side of the cell nearest to lon, also across the antimeridian
+                near_lon = min(max(lon + 360.0 * round((((lon_lo + lon_hi) / 2) - lon) / 360.0), lon_lo), lon_hi)
+                if haversine_km(lat, lon, [near_lat], [near_lon])[0] <= radius_km:
+                    cells.append(cell)
+            x += cell_lon
+        y += cell_lat
+    return cells
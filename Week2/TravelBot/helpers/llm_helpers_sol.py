@@ -1,22 +1,28 @@
 import os
 import json
-import requests
 
-from langchain.chat_models import ChatOpenAI
-from langchain.output_parsers import ResponseSchema, StructuredOutputParser
-from langchain.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate
-from langchain_core.prompts import ChatPromptTemplate
+from apis.cache import cached, DAY
+from apis.tracing import traced
+
+# langchain (and openai under it) take about a second to import, so they are
+# imported on first use rather than when the app starts; see preload.py.
 
 def get_llm(temperature=0.3, model_name="gpt-4"):
     """Returns a ChatOpenAI instance with the specified parameters."""
+    from langchain.chat_models import ChatOpenAI
+
     openai_api_key = os.getenv("OPENAI_API_KEY")
     return ChatOpenAI(openai_api_key=openai_api_key, temperature=temperature, model_name=model_name)
 
+@cached("parse_location", ttl=30 * DAY)
+@traced("llm")
 def parse_location(location_string: str) -> dict:
     """
     Parse a user-supplied location into city, state, country, and clarifications.
     Demonstrates a few-shot approach using a list of dict examples.
     """
+    from langchain.output_parsers import ResponseSchema, StructuredOutputParser
+
     # 1) Define the JSON schema
     schemas = [
         ResponseSchema(name="city", description="City name, or best guess if not explicit"),
@@ -100,11 +106,15 @@ def parse_location(location_string: str) -> dict:
 
 
 
+@traced("llm")
 def process_user_input(user_text: str) -> str:
     """
     Decide which service category the user wants: vacation, flight, hotel, or activities.
     Returns one of these as a JSON snippet: {"service": "<category>"}.
     """
+    from langchain.prompts import SystemMessagePromptTemplate, HumanMessagePromptTemplate
+    from langchain_core.prompts import ChatPromptTemplate
+
     system_instructions = """
     You are a travel assistant deciding which category fits the user's request.
     The categories: 'vacation', 'flight', 'hotel', 'activities'.
@@ -0,0 +1,309 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from apis.tracing import propagate
+
+# Background jobs for long-running searches. A route submits a job and returns
+# at once; the page then polls /jobs/<id> for progress, partial results and
+# finally the result. Two backends:
+#   - "memory": jobs live in this process (single worker / development)
+#   - "sqlite": jobs are rows in a local SQLite queue file shared by every
+#     worker process on the host; any worker can claim, run and report them.
+#     A claimed job is leased: its worker renews the lease every third of
+#     JOB_LEASE_SECONDS, and a running job whose lease ran out (its worker
+#     crashed or was recycled) is queued again by the next claim.
+JOB_BACKEND = os.getenv("TRAVELBOT_JOB_BACKEND", "memory")
+JOB_DB_PATH = os.getenv(
+    "TRAVELBOT_JOB_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "jobs.sqlite3")
+)
+JOB_WORKERS = int(os.getenv("TRAVELBOT_JOB_WORKERS", "4"))
+JOB_RESULT_TTL = int(os.getenv("TRAVELBOT_JOB_TTL", "900"))
+JOB_LEASE_SECONDS = float(os.getenv("TRAVELBOT_JOB_LEASE", "60"))
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class MemoryJobStore:
+    """Jobs kept in a dict of this process."""
+
+    def __init__(self, ttl=JOB_RESULT_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def create(self, job_id, task, kwargs):
+        now = time.time()
+        with self._lock:
+            self._jobs[job_id] = {
+                "id": job_id, "task": task, "kwargs": kwargs, "status": QUEUED,
+                "progress": 0.0, "partial": None, "result": None, "error": None,
+                "created_at": now, "updated_at": now,
+            }
+
+    def update(self, job_id, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields, updated_at=time.time())
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def claim(self, lease=JOB_LEASE_SECONDS):
+        # Memory jobs are handed to the pool on submit, never polled
+        return None
+
+    def renew(self, job_ids):
+        pass
+
+    def evict_expired(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [j for j, job in self._jobs.items()
+                           if job["status"] in (DONE, FAILED) and job["updated_at"] < cutoff]:
+                del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Jobs as rows of a SQLite file, so every worker process sees them."""
+
+    def __init__(self, path=JOB_DB_PATH, ttl=JOB_RESULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, task TEXT, kwargs TEXT, status TEXT,"
+                " progress REAL, partial TEXT, result TEXT, error TEXT,"
+                " created_at REAL, updated_at REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def _conn(self):
+        # Per thread and per process: never reuse a connection across fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def create(self, job_id, task, kwargs):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs VALUES (?, ?, ?, ?, 0, NULL, NULL, NULL, ?, ?)",
+            (job_id, task, json.dumps(kwargs), QUEUED, now, now)
+        )
+
+    def update(self, job_id, **fields):
+        columns, values = [], []
+        for name, value in fields.items():
+            columns.append(f"{name} = ?")
+            values.append(json.dumps(value) if name in ("partial", "result") else value)
+        self._conn().execute(
+            f"UPDATE jobs SET {', '.join(columns)}, updated_at = ? WHERE id = ?",
+            (*values, time.time(), job_id)
+        )
+
+    def _row_to_job(self, row):
+        job = dict(row)
+        job["kwargs"] = json.loads(job["kwargs"])
+        for name in ("partial", "result"):
+            job[name] = json.loads(job[name]) if job[name] is not None else None
+        return job
+
+    def get(self, job_id):
+        row = self._conn().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def claim(self, lease=JOB_LEASE_SECONDS):
+        """
+        Atomically move the oldest queued job to running and return it, after
+        queueing again the running jobs not renewed for 'lease' seconds.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ? AND updated_at < ?",
+                (QUEUED, now, RUNNING, now - lease)
+            ).rowcount
+            if requeued:
+                logger.warning("Requeued %d job(s) whose worker stopped renewing the lease", requeued)
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return self._row_to_job(row) if row is not None else None
+
+    def renew(self, job_ids):
+        """Extend the lease of the running jobs 'job_ids'."""
+        if not job_ids:
+            return
+        job_ids = list(job_ids)
+        self._conn().execute(
+            f"UPDATE jobs SET updated_at = ? WHERE status = ? AND id IN ({', '.join('?' * len(job_ids))})",
+            (time.time(), RUNNING, *job_ids)
+        )
+
+    def evict_expired(self):
+        self._conn().execute(
+            "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (DONE, FAILED, time.time() - self.ttl)
+        )
+
+
+class JobContext:
+    """Handed to a running task so it can report progress and partial results."""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def report(self, progress=None, partial=None):
+        fields = {}
+        if progress is not None:
+            fields["progress"] = float(progress)
+        if partial is not None:
+            fields["partial"] = partial
+        if fields:
+            self.store.update(self.job_id, **fields)
+
+
+class JobManager:
+    """
+    Runs registered tasks on a thread pool. Tasks are plain functions called
+    as fn(ctx, **kwargs); kwargs and results must be JSON-serializable so the
+    SQLite backend can hand them between processes.
+    """
+
+    def __init__(self, backend=JOB_BACKEND, max_workers=JOB_WORKERS, poll_interval=0.2,
+                 lease=JOB_LEASE_SECONDS):
+        self.store = SQLiteJobStore() if backend == "sqlite" else MemoryJobStore()
+        self.tasks = {}
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._claimed = set()  # ids of the jobs this process is running
+        self._claimed_lock = threading.Lock()
+        self._renewed_at = 0.0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._slots = threading.Semaphore(max_workers)
+        self._dispatcher = None
+        self._dispatch_lock = threading.Lock()
+
+    def task(self, name):
+        """Decorator registering fn under 'name'."""
+        def register(fn):
+            self.tasks[name] = fn
+            return fn
+        return register
+
+    def submit(self, name, **kwargs):
+        if name not in self.tasks:
+            raise KeyError(f"Unknown job task: {name}")
+        self.store.evict_expired()
+        job_id = uuid.uuid4().hex
+        self.store.create(job_id, name, kwargs)
+        if isinstance(self.store, MemoryJobStore):
+            # Spans of the job stay tagged with the submitting request's route
+            self._executor.submit(propagate(self._run), job_id, name, kwargs)
+        else:
+            self._ensure_dispatcher()
+        return job_id
+
+    def get(self, job_id):
+        """The job as a dict (status, progress, partial, result, error) or None."""
+        if not job_id:
+            return None
+        return self.store.get(job_id)
+
+    def _run(self, job_id, name, kwargs):
+        self.store.update(job_id, status=RUNNING)
+        try:
+            result = self.tasks[name](JobContext(self.store, job_id), **kwargs)
+            self.store.update(job_id, status=DONE, progress=1.0, result=result)
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", name, job_id)
+            self.store.update(job_id, status=FAILED, error=str(e))
+
+    # -- SQLite backend: every process polls the shared queue ---------------
+    def _ensure_dispatcher(self):
+        with self._dispatch_lock:
+            if self._dispatcher is None or not self._dispatcher.is_alive():
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="job-dispatch", daemon=True)
+                self._dispatcher.start()
+
+    def _dispatch_loop(self):
+        while True:
+            self._renew_leases()
+            # Bounded wait, so leases are renewed while every slot is busy
+            if not self._slots.acquire(timeout=self.poll_interval):
+                continue
+            try:
+                job = self.store.claim(self.lease)
+            except sqlite3.Error:
+                logger.exception("Job queue error")
+                job = None
+            if job is None:
+                self._slots.release()
+                time.sleep(self.poll_interval)
+                continue
+            with self._claimed_lock:
+                self._claimed.add(job["id"])
+            future = self._executor.submit(self._run_claimed, job)
+            future.add_done_callback(lambda _, job_id=job["id"]: self._release_claim(job_id))
+
+    def _release_claim(self, job_id):
+        with self._claimed_lock:
+            self._claimed.discard(job_id)
+        self._slots.release()
+
+    def _renew_leases(self):
+        now = time.monotonic()
+        if now - self._renewed_at < self.lease / 3:
+            return
+        self._renewed_at = now
+        with self._claimed_lock:
+            job_ids = list(self._claimed)
+        try:
+            self.store.renew(job_ids)
+        except sqlite3.Error:
+            logger.exception("Job lease renewal error")
+
+    def _run_claimed(self, job):
+        if job["task"] not in self.tasks:
+            self.store.update(job["id"], status=FAILED, error=f"Unknown job task: {job['task']}")
+            return
+        self._run(job["id"], job["task"], job["kwargs"])
+
+    def start(self):
+        """
+        Start polling the shared queue (SQLite backend) without a submit; the
+        app calls it on every request, so each serving process runs jobs.
+        """
+        if not isinstance(self.store, MemoryJobStore):
+            self._ensure_dispatcher()
@@ -0,0 +1,34 @@
+"""
+app.py imports its heavy dependencies (langchain, openai, amadeus, requests)
+on first use, so the app starts fast for tests, scripts and autoscaled
+instances. A long-running server would rather pay that cost once at boot
+than on its first requests: preload() imports them eagerly. wsgi.py calls it
+unless TRAVELBOT_PRELOAD=0; with gunicorn's preload_app it runs once in the
+master and the workers inherit the loaded modules.
+"""
+import time
+import importlib
+
+HEAVY_MODULES = (
+    "requests",
+    "amadeus",
+    "openai",
+    "langchain_core.prompts",
+    "langchain.prompts",
+    "langchain.output_parsers",
+    "langchain.chat_models",
+)
+
+
+def preload(modules=HEAVY_MODULES):
+    """Import 'modules' now. Returns {module: seconds} for those that loaded."""
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"Preload of {name} failed: {e}")
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings
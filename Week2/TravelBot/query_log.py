@@ -0,0 +1,41 @@
+import os
+import json
+import time
+import threading
+
+# Append-only JSONL log of what users search for. The warm-up command
+# (warmup.py) replays the most frequent entries to fill the caches after a
+# deploy. Set TRAVELBOT_QUERY_LOG to an empty string to disable logging.
+QUERY_LOG_PATH = os.getenv(
+    "TRAVELBOT_QUERY_LOG",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "query_log.jsonl")
+)
+
+_lock = threading.Lock()
+
+
+def log_query(kind, **fields):
+    """
+    Record one query, e.g. log_query("location", query="Paris") or
+    log_query("route", origin="DTW", destination="CDG", city="Paris").
+    """
+    if not QUERY_LOG_PATH:
+        return
+    line = json.dumps({"ts": time.time(), "kind": kind, **fields})
+    try:
+        with _lock:
+            os.makedirs(os.path.dirname(QUERY_LOG_PATH) or ".", exist_ok=True)
+            with open(QUERY_LOG_PATH, "a") as f:
+                f.write(line + "\n")
+    except OSError as e:
+        print(f"Query log write error: {e}")
+
+
+def read_query_log(path=QUERY_LOG_PATH):
+    """Yield the logged entries, skipping malformed lines."""
+    with open(path) as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import batch
+
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+
+
+def fake_quote(statuses):
+    def quote_trip(req, limiter):
+        quote = dict.fromkeys(name for name, _ in batch.QUOTE_FIELDS)
+        quote.update(req, status=statuses.get(req["id"], "ok"))
+        return quote
+    return quote_trip
+
+
+@pytest.fixture
+def requests_file(tmp_path):
+    path = tmp_path / "trips.jsonl"
+    write_jsonl(path, [{"id": str(i), "origin": "DTW", "destination": "Paris", "depart_date": "2026-12-01"}
+                       for i in range(5)])
+    return path
+
+
+def test_normalize_row_defaults():
+    req = batch.normalize_row(7, {"origin": " DTW ", "destination": "Paris", "adults": "x", "budget": "1500"})
+    assert req["id"] == "7" and req["origin"] == "DTW"
+    assert req["adults"] == 1 and req["rooms"] == 1 and req["budget"] == 1500.0
+    assert req["return_date"] is None
+
+
+def test_completed_ids_counts_only_final_statuses(tmp_path):
+    out = tmp_path / "quotes.jsonl"
+    rows = [{"id": "a", "status": "ok"}, {"id": "b", "status": "error"}, {"id": "c", "status": "no_flights"},
+            {"id": "d", "status": "invalid"}, {"id": "e", "status": "no_destination"}]
+    out.write_text("".join(json.dumps(r) + "\n" for r in rows) + '{"id": "f", "sta')
+    assert batch.completed_ids(str(out), "jsonl") == {"a", "d", "e"}
+    assert batch.completed_ids(str(tmp_path / "missing.jsonl"), "jsonl") == set()
+
+
+@pytest.mark.parametrize("name", ["quotes.jsonl", "quotes.parquet"])
+def test_resume_requotes_failed_rows(tmp_path, requests_file, monkeypatch, name):
+    if name.endswith(".parquet"):
+        pytest.importorskip("pyarrow")
+    out = str(tmp_path / name)
+    monkeypatch.setattr(batch, "quote_trip", fake_quote({"1": "error", "3": "no_flights"}))
+    batch.quote_batch(str(requests_file), out, rate=0)
+
+    monkeypatch.setattr(batch, "quote_trip", fake_quote({}))
+    report = batch.quote_batch(str(requests_file), out, rate=0)
+    assert report["counts"] == {"skipped": 3, "ok": 2, "quoted": 2}
+    assert batch.completed_ids(out, batch.output_format(out)) == {str(i) for i in range(5)}
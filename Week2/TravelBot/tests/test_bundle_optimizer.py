@@ -0,0 +1,98 @@
+import itertools
+import random
+
+from helpers.bundle_optimizer import BUNDLE_WEIGHTS, flight_features, optimize_bundles, parse_duration_minutes
+
+
+def flight(price, hours, stops):
+    return {"price": {"grandTotal": str(price)},
+            "itineraries": [{"duration": f"PT{hours}H", "segments": [{}] * (stops + 1)}]}
+
+
+def random_inputs(rng):
+    flights = [flight(rng.randint(100, 900), rng.randint(1, 20), rng.randint(0, 2)) for _ in range(rng.randint(1, 8))]
+    hotels = [{"price": str(rng.randint(50, 800)), "distance_km": rng.choice([None, rng.uniform(0, 10)])}
+              for _ in range(rng.randint(1, 8))]
+    activities = [{"price": rng.choice([None, rng.randint(0, 200)])} for _ in range(rng.randint(0, 5))]
+    return flights, hotels, activities
+
+
+def brute_force(flights, hotels, activities, budget, k):
+    """Every (flight, hotel, activity or none) bundle within the budget, scored one by one."""
+    w = BUNDLE_WEIGHTS
+    f_price, f_duration, f_stops = flight_features(flights)
+    max_duration, max_stops = max(f_duration), max(f_stops)
+    distances = [h["distance_km"] for h in hotels if h.get("distance_km") is not None]
+    # Unknown distances count as the farthest known one
+    max_distance = max(distances, default=0.0)
+
+    bundles = []
+    for f, hotel, activity in itertools.product(range(len(flights)), range(len(hotels)),
+                                                [None] + list(range(len(activities)))):
+        h_price = float(hotels[hotel]["price"])
+        a_price = 0.0 if activity is None else activities[activity]["price"]
+        if a_price is None:
+            continue
+        total = f_price[f] + h_price + a_price
+        if total > budget:
+            continue
+        distance = hotels[hotel].get("distance_km")
+        distance = max_distance if distance is None else distance
+        score = (w["price"] * total / budget
+                 + w["duration"] * (f_duration[f] / max_duration if max_duration else 0.0)
+                 + w["stops"] * (f_stops[f] / max_stops if max_stops else 0.0)
+                 + w["distance"] * (distance / max_distance if max_distance else 0.0)
+                 - w["activity"] * (activity is not None))
+        bundles.append(score)
+    return sorted(bundles)[:k]
+
+
+def test_parse_duration_minutes():
+    assert parse_duration_minutes("PT7H30M") == 450
+    assert parse_duration_minutes("P1DT2H") == 1560
+    assert parse_duration_minutes("garbage") == 0
+
+
+def test_matches_brute_force():
+    rng = random.Random(0)
+    for _ in range(200):
+        flights, hotels, activities = random_inputs(rng)
+        budget, k = rng.randint(200, 2000), rng.randint(1, 5)
+        fast = optimize_bundles(flights, hotels, activities, budget, k=k)
+        slow = brute_force(flights, hotels, activities, budget, k)
+        assert [round(b["score"], 9) for b in fast] == [round(score, 9) for score in slow]
+        assert all(b["total_price"] <= budget for b in fast)
+
+
+def test_unlimited_k_enumerates_every_bundle():
+    rng = random.Random(1)
+    flights, hotels, activities = random_inputs(rng)
+    priced = sum(1 for a in activities if a["price"] is not None)
+    bundles = optimize_bundles(flights, hotels, activities, budget=10 ** 9, k=10 ** 6)
+    assert len(bundles) == len(flights) * len(hotels) * (priced + 1)
+    assert len({(b["flight"], b["hotel"], b["activity"]) for b in bundles}) == len(bundles)
+
+
+def test_unknown_distance_scores_as_farthest():
+    flights = [flight(100, 2, 0)]
+    hotels = [{"price": "100"}, {"price": "100", "distance_km": 1.0}, {"price": "100", "distance_km": 5.0}]
+    best = optimize_bundles(flights, hotels, [], budget=1000, k=3)
+    assert best[0]["hotel"] == 1
+    assert best[-1]["score"] == best[-2]["score"]
+
+
+def test_unpriced_activity_is_never_included():
+    bundles = optimize_bundles([flight(100, 2, 0)], [{"price": "100"}], [{"price": None}, {"price": "10"}],
+                               budget=1000, k=10)
+    assert {b["activity"] for b in bundles} == {None, 1}
+
+
+def test_nothing_fits():
+    assert optimize_bundles([flight(900, 2, 0)], [{"price": "900"}], [], budget=1000) == []
+    assert optimize_bundles([], [{"price": "1"}], [], budget=1000) == []
+
+
+def test_flight_features():
+    price, duration, stops = flight_features([flight(120.5, 3, 1), {"price": {}}])
+    assert price[0] == 120.5 and duration[0] == 180 and stops[0] == 1
+    assert price[1] == float("inf") and duration[1] == 0 and stops[1] == 0
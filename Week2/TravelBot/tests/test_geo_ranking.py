@@ -0,0 +1,36 @@
+import math
+
+import numpy as np
+
+from helpers.geo_ranking import extract_coords, haversine_km, rank_candidates
+
+
+def record(name, lat=None, lon=None):
+    return {"name": name, "geoCode": {"latitude": lat, "longitude": lon}} if lat is not None else {"name": name}
+
+
+def test_haversine_paris_london():
+    assert abs(haversine_km(48.8566, 2.3522, [51.5074], [-0.1278])[0] - 343.5) < 1.0
+
+
+def test_extract_coords_handles_missing_and_malformed_values():
+    lats, lons = extract_coords([record("a", 1.5, 2.5), record("b"), {"geoCode": {"latitude": "3", "longitude": "x"}}])
+    assert lats[0] == 1.5 and lons[0] == 2.5
+    assert math.isnan(lats[1]) and math.isnan(lons[1])
+    assert lats[2] == 3.0 and math.isnan(lons[2])
+
+
+def test_rank_nearest_first_and_unlocated_last():
+    records = [record("far", 49.5, 2.35), record("none"), record("near", 48.86, 2.35), record("mid", 49.0, 2.35)]
+    ranked = rank_candidates(records, 48.8566, 2.3522, price_weight=0)
+    assert [r["name"] for r, _ in ranked] == ["near", "mid", "far", "none"]
+    assert ranked[-1][1] is None
+
+
+def test_top_k_matches_full_ranking():
+    rng = np.random.default_rng(0)
+    records = [record(str(i), 48 + rng.random(), 2 + rng.random()) for i in range(300)]
+    prices = list(rng.random(300) * 100)
+    full = rank_candidates(records, 48.5, 2.5, prices=prices)
+    top = rank_candidates(records, 48.5, 2.5, prices=prices, k=10)
+    assert [r["name"] for r, _ in top] == [r["name"] for r, _ in full[:10]]
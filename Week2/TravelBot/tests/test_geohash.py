@@ -0,0 +1,35 @@
+import random
+
+from helpers import geohash
+from helpers.geo_ranking import haversine_km
+
+
+def test_encode_known_values():
+    assert geohash.encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash.encode(48.8566, 2.3522, 5) == "u09tv"
+
+
+def test_bounds_contain_the_encoded_point():
+    rng = random.Random(0)
+    for _ in range(500):
+        lat, lon = rng.uniform(-89, 89), rng.uniform(-179, 179)
+        lat_lo, lat_hi, lon_lo, lon_hi = geohash.bounds(geohash.encode(lat, lon, 6))
+        assert lat_lo <= lat < lat_hi and lon_lo <= lon < lon_hi
+
+
+def test_cell_size_matches_bounds():
+    lat_lo, lat_hi, lon_lo, lon_hi = geohash.bounds("u09tv")
+    height, width = geohash.cell_size_deg(5)
+    assert abs((lat_hi - lat_lo) - height) < 1e-12 and abs((lon_hi - lon_lo) - width) < 1e-12
+
+
+def test_covering_cells_contain_every_point_in_the_circle():
+    rng = random.Random(1)
+    for lat, lon, radius_km in [(48.8566, 2.3522, 5), (35.68, 139.69, 12), (64.1, -21.9, 3), (0.0, 179.99, 4)]:
+        cells = set(geohash.covering_cells(lat, lon, radius_km, 5))
+        for _ in range(400):
+            p_lat = lat + rng.uniform(-1, 1) * radius_km / 111.0
+            p_lon = lon + rng.uniform(-1, 1) * radius_km / 50.0
+            p_lon = (p_lon + 180.0) % 360.0 - 180.0
+            if haversine_km(lat, lon, [p_lat], [p_lon])[0] <= radius_km:
+                assert geohash.encode(p_lat, p_lon, 5) in cells
@@ -0,0 +1,49 @@
+import time
+
+from jobs import DONE, QUEUED, RUNNING, JobManager, SQLiteJobStore
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_memory_job_runs_and_reports():
+    jobs = JobManager(backend="memory")
+
+    @jobs.task("add")
+    def add(ctx, a, b):
+        ctx.report(progress=0.5, partial=a)
+        return a + b
+
+    job_id = jobs.submit("add", a=1, b=2)
+    assert wait_for(lambda: jobs.get(job_id)["status"] == DONE)
+    assert jobs.get(job_id)["result"] == 3
+
+
+def test_stale_claim_is_requeued(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("job", "noop", {})
+    assert store.claim(lease=60)["id"] == "job"
+    assert store.get("job")["status"] == RUNNING
+    # The worker that claimed it died: nothing renews the lease
+    time.sleep(0.3)
+    assert store.claim(lease=60) is None
+    assert store.claim(lease=0.2)["id"] == "job"
+
+
+def test_renewed_claim_is_kept(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    store.create("job", "noop", {})
+    store.claim(lease=0.3)
+    for _ in range(3):
+        time.sleep(0.15)
+        store.renew(["job"])
+        assert store.claim(lease=0.3) is None
+    assert store.get("job")["status"] == RUNNING
+    assert store.get("missing") is None
+    assert QUEUED != RUNNING
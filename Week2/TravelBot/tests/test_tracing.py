@@ -0,0 +1,30 @@
+from apis import tracing
+
+
+def test_noop_span_drops_tags(monkeypatch):
+    monkeypatch.setattr(tracing, "TRACING_ENABLED", False)
+    with tracing.span("cache", "x") as s:
+        s.tags.update(hit=True)
+    with tracing.span("cache", "y") as s:
+        assert s.tags == {}
+
+
+def test_spans_feed_the_histograms():
+    tracing.histograms.clear()
+    with tracing.span("cache", "lookup"):
+        pass
+    text = tracing.histograms.render()
+    assert 'travelbot_span_duration_seconds_count{kind="cache",name="lookup",route="",service=""} 1' in text
+
+
+def test_shared_store_sums_workers(tmp_path):
+    store = tracing.SQLiteMetricsStore(str(tmp_path / "metrics.sqlite3"))
+    labels = (("kind", "cache"), ("name", "lookup"), ("route", ""), ("service", ""))
+    series = [0] * (len(tracing.BUCKETS) + 3)
+    series[0], series[-2] = 2, 0.002
+    store.write("worker-1", {labels: series})
+    store.write("worker-2", {labels: series})
+    store.write("worker-2", {labels: series})  # replaces, does not add
+    assert store.read()[labels][0] == 4
+    store.clear()
+    assert store.read() == {}
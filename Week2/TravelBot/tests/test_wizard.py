@@ -0,0 +1,49 @@
+from apis.cache import MemoryCache
+from wizard import WizardState, fingerprint, is_empty, next_step
+
+
+def test_fingerprint_ignores_key_order():
+    assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+
+
+def test_is_empty():
+    for value in (None, {}, [], "", ([], []), [[], {}]):
+        assert is_empty(value)
+    for value in ([1], {"a": 1}, ([1], []), [0], "x"):
+        assert not is_empty(value)
+
+
+def test_memo_reuses_output_until_inputs_change():
+    session, calls = {}, []
+    wizard = WizardState(session, store=MemoryCache())
+
+    def compute():
+        calls.append(1)
+        return {"code": "PAR"}
+
+    assert wizard.memo("airport", {"city": "Paris"}, compute) == {"code": "PAR"}
+    assert wizard.memo("airport", {"city": "Paris"}, compute) == {"code": "PAR"}
+    assert len(calls) == 1
+    wizard.memo("airport", {"city": "Lyon"}, compute)
+    assert len(calls) == 2
+    # Another request of the same session sees the stored output
+    assert WizardState(session, store=wizard.store).lookup("airport", {"city": "Lyon"}) == (True, {"code": "PAR"})
+
+
+def test_empty_outputs_are_recomputed():
+    calls = []
+    wizard = WizardState({}, store=MemoryCache())
+
+    def compute():
+        calls.append(1)
+        return []
+
+    wizard.memo("flights", {"dest": "PAR"}, compute)
+    wizard.memo("flights", {"dest": "PAR"}, compute)
+    assert len(calls) == 2
+
+
+def test_next_step_follows_the_service_flow():
+    assert next_step("hotel", "step3") == "step5"
+    assert next_step("activities", "step9") is None
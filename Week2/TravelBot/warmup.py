@@ -0,0 +1,156 @@
+"""
+Cache warm-up: replay the most frequent past queries through the same code
+paths the wizard uses, so the first users after a deploy hit warm caches.
+
+    python warmup.py --log .cache/query_log.jsonl --top-locations 200 --rate 5
+
+Run it before the app accepts traffic (e.g. from the server's start script).
+It fills the SQLite cache the web workers share (TRAVELBOT_CACHE_DB); an
+in-process memory cache would be gone when the command exits.
+"""
+import sys
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from activities_api import find_activities_cached, use_cache_backend
+from apis.cache import cache_stats
+from apis.flight_api import guess_airport_code, nearby_airport_codes
+from apis.geolocate_api import geocode_place, coordinate_search_for
+from apis.hotel_api import get_hotels_in_city
+from apis.ratelimit import RateLimiter
+from helpers.llm_helpers_sol import parse_location
+from query_log import QUERY_LOG_PATH, read_query_log
+
+
+def top_queries(entries, top_locations, top_routes):
+    """
+    Count logged locations and routes and keep the most frequent ones.
+    Returns (locations, routes, total_entries) where locations/routes are
+    lists of (value, count), most frequent first.
+    """
+    locations, routes = Counter(), Counter()
+    total = 0
+    for entry in entries:
+        total += 1
+        if entry.get("kind") == "location" and entry.get("query"):
+            locations[" ".join(entry["query"].split()).casefold()] += 1
+        elif entry.get("kind") == "route" and entry.get("origin") and entry.get("city"):
+            routes[(entry["origin"], entry["city"])] += 1
+    return locations.most_common(top_locations), routes.most_common(top_routes), total
+
+
+def warm_location(query, limiter):
+    """Steps 3, 4, 7 and 8 for one location: LLM parse, airport, geocode, hotels, activities."""
+    limiter.acquire()
+    loc_parsed = parse_location(query)
+    city = loc_parsed.get("city", "")
+    if not city:
+        return False
+
+    limiter.acquire()
+    code = guess_airport_code(city)
+    limiter.acquire()
+    geo = geocode_place(coordinate_search_for(loc_parsed))
+
+    if code:
+        limiter.acquire()
+        get_hotels_in_city(code, radius_km=10)
+    if geo:
+        limiter.acquire()
+        find_activities_cached(geo["latitude"], geo["longitude"], radius_km=5)
+    return bool(code and geo)
+
+
+def warm_route(route, limiter):
+    """Multi-airport expansion of both ends of a route (step 4)."""
+    origin, city = route
+    limiter.acquire()
+    origin_ok = bool(nearby_airport_codes(origin))
+    limiter.acquire()
+    dest_ok = bool(nearby_airport_codes(city))
+    return origin_ok and dest_ok
+
+
+def warm_up(log_path=QUERY_LOG_PATH, top_locations=200, top_routes=100,
+            concurrency=4, rate=5.0, max_seconds=None):
+    """
+    Replay the top locations and routes of 'log_path' with at most
+    'concurrency' in flight and 'rate' upstream/LLM calls per second.
+    Stops submitting new work after 'max_seconds'. Returns a report dict.
+    """
+    start = time.monotonic()
+    try:
+        locations, routes, total = top_queries(read_query_log(log_path), top_locations, top_routes)
+    except OSError as e:
+        print(f"Cannot read query log {log_path}: {e}")
+        return {"queries": 0, "warmed": 0, "failed": 0, "skipped": 0, "traffic_coverage": 0.0, "seconds": 0.0}
+
+    limiter = RateLimiter(rate)
+    work = [(warm_location, query, count) for query, count in locations]
+    work += [(warm_route, route, count) for route, count in routes]
+
+    def run(item):
+        fn, arg, count = item
+        if max_seconds is not None and time.monotonic() - start > max_seconds:
+            return None, count
+        try:
+            return fn(arg, limiter), count
+        except Exception as e:
+            print(f"Warm-up of {arg!r} failed: {e}")
+            return False, count
+
+    warmed = failed = skipped = covered = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        for ok, count in executor.map(run, work):
+            if ok is None:
+                skipped += 1
+            elif ok:
+                warmed += 1
+                covered += count
+            else:
+                failed += 1
+
+    return {
+        "queries": len(work),
+        "warmed": warmed,
+        "failed": failed,
+        "skipped": skipped,
+        # Share of all logged searches whose query is now warm
+        "traffic_coverage": covered / total if total else 0.0,
+        "seconds": time.monotonic() - start,
+        "cache_stats": {ns: dict(counts) for ns, counts in cache_stats.items()},
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Warm TravelBot caches from the query log.")
+    parser.add_argument("--log", default=QUERY_LOG_PATH, help="JSONL query log to replay")
+    parser.add_argument("--top-locations", type=int, default=200)
+    parser.add_argument("--top-routes", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4, help="queries replayed at once")
+    parser.add_argument("--rate", type=float, default=5.0, help="max upstream/LLM calls per second (0 = unlimited)")
+    parser.add_argument("--max-seconds", type=float, default=None, help="stop submitting work after this long")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    # Warm the store the web workers read; a memory cache dies with this command
+    use_cache_backend("sqlite")
+
+    report = warm_up(args.log, args.top_locations, args.top_routes,
+                     args.concurrency, args.rate, args.max_seconds)
+
+    print(
+        f"Warmed {report['warmed']}/{report['queries']} queries "
+        f"({report['failed']} failed, {report['skipped']} skipped), "
+        f"covering {report['traffic_coverage']:.1%} of logged traffic in {report['seconds']:.1f}s"
+    )
+    for namespace, counts in sorted(report.get("cache_stats", {}).items()):
+        print(f"  {namespace}: {counts['miss']} looked up, {counts['hit']} already cached")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
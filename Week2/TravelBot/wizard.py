@@ -0,0 +1,95 @@
+import os
+import uuid
+
+from apis.cache import cache, make_key
+from apis.tracing import span
+
+# The wizard as an explicit state machine. FLOWS lists the steps each service
+# goes through, so a step can redirect straight to the next one instead of
+# bouncing through steps that only redirect again.
+#
+# Step outputs (parsed location, airport code, search point, flight and hotel
+# results, activities, ...) are memoized per wizard session together with a
+# fingerprint of their inputs. Revisiting a step, refreshing, or going
+# back and forth reuses the stored output; it is recomputed only when an
+# input changes (e.g. a new location changes the city, which changes the
+# airport code and the search point, and so on down the chain).
+#
+# Empty outputs (None, {}, [], or a pair of empty lists) are never stored:
+# the API wrappers return them on errors too, and as in apis/cache.py an
+# outage must not be remembered for the whole WIZARD_TTL.
+#
+# Outputs live server-side in the apis.cache store (shared across workers
+# with TRAVELBOT_CACHE_BACKEND=sqlite); the session cookie only carries the
+# wizard id. They must be JSON-serializable.
+WIZARD_TTL = int(os.getenv("TRAVELBOT_WIZARD_TTL", str(6 * 3600)))
+
+FLOWS = {
+    "vacation": ["step2", "step3", "step4", "step5", "step6_options", "step6",
+                 "step7_options", "step7", "step8", "step9"],
+    "flight": ["step2", "step3", "step4", "step5", "step6_options", "step6", "step8"],
+    "hotel": ["step2", "step3", "step5", "step7", "step9"],
+    "activities": ["step2", "step3", "step8", "step9"],
+}
+
+
+def next_step(service, step):
+    """Endpoint after 'step' for 'service', or None when 'step' ends its flow."""
+    flow = FLOWS.get(service, FLOWS["vacation"])
+    if step not in flow:
+        return None
+    index = flow.index(step)
+    return flow[index + 1] if index + 1 < len(flow) else None
+
+
+def fingerprint(inputs):
+    """Stable hash of a step's inputs (same normalization as the caches)."""
+    return make_key("inputs", inputs).split(":", 1)[1]
+
+
+def is_empty(value):
+    """True for outputs that may stand for a failed upstream call."""
+    if isinstance(value, (list, tuple)) and value and all(isinstance(v, (list, tuple, dict)) for v in value):
+        return not any(value)
+    return not value
+
+
+class WizardState:
+    """Memoized step outputs of one wizard session."""
+
+    def __init__(self, session, store=cache, ttl=WIZARD_TTL):
+        if not session.get("wizard_id"):
+            session["wizard_id"] = uuid.uuid4().hex
+        self.wizard_id = session["wizard_id"]
+        self.store = store
+        self.ttl = ttl
+
+    def _key(self, step):
+        return f"wizard:{self.wizard_id}:{step}"
+
+    def lookup(self, step, inputs):
+        """(True, output) if 'step' was computed for these inputs, else (False, None)."""
+        hit, entry = self.store.get(self._key(step))
+        if hit and entry.get("fingerprint") == fingerprint(inputs):
+            return True, entry["value"]
+        return False, None
+
+    def save(self, step, inputs, value):
+        """Store the output of 'step' for 'inputs'; empty outputs are skipped."""
+        if is_empty(value):
+            return
+        self.store.set(self._key(step), {"fingerprint": fingerprint(inputs), "value": value}, self.ttl)
+
+    def memo(self, step, inputs, compute):
+        """
+        Output of 'step' for 'inputs', calling compute() only when they
+        changed (or when the last output was empty).
+        """
+        with span("cache", f"wizard.{step}") as s:
+            hit, value = self.lookup(step, inputs)
+            s.tags["hit"] = hit
+        if hit:
+            return value
+        value = compute()
+        self.save(step, inputs, value)
+        return value
@@ -0,0 +1,42 @@
+"""
+Production entry point. With gunicorn (Linux/macOS):
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+or, where gunicorn is unavailable, a single multi-threaded process:
+
+    python wsgi.py
+"""
+import os
+from dotenv import load_dotenv
+
+# Must run before the app is imported: apis.cache and jobs read their
+# backends at import time
+load_dotenv()
+# Worker processes share one cache and one job queue (SQLite files in WAL
+# mode under .cache/), so each cache entry exists once per host and a job
+# submitted by one worker can be polled through any other
+os.environ.setdefault("TRAVELBOT_CACHE_BACKEND", "sqlite")
+os.environ.setdefault("TRAVELBOT_JOB_BACKEND", "sqlite")
+# /metrics sums the span histograms of all workers
+os.environ.setdefault("TRAVELBOT_METRICS_BACKEND", "sqlite")
+
+from app import app as application, jobs  # noqa: E402
+from preload import preload  # noqa: E402
+
+if os.getenv("TRAVELBOT_PRELOAD", "1") == "1":
+    preload()
+
+
+if __name__ == "__main__":
+    try:
+        from waitress import serve
+    except ImportError:
+        raise SystemExit("Install gunicorn (gunicorn -c gunicorn.conf.py wsgi:application) or waitress.")
+    jobs.start()
+    serve(
+        application,
+        host=os.getenv("TRAVELBOT_HOST", "0.0.0.0"),
+        port=int(os.getenv("TRAVELBOT_PORT", "8000")),
+        threads=int(os.getenv("TRAVELBOT_THREADS", "8"))
+    )
@@ -0,0 +1,133 @@
+"""
+Cross-encoder re-ranking stage for retrieved documents.
+
+    from rerank import Reranker
+    reranker = Reranker()                                  # loads the model once
+    ranked = reranker.rerank(query, vectorstore.similarity_search(query, k=20))
+
+The cross-encoder is loaded once per process and shared by every Reranker
+using the same model. Pairs are scored in batches sorted by length, so each
+padded batch wastes little compute, and inputs are truncated to
+RERANK_MAX_LENGTH tokens. Scores are cached by (model, query hash, passage
+hash), so a repeated query or passage is not scored twice. The number of
+documents re-ranked per query is capped from the measured time per pair so a
+query fits in RERANK_BUDGET_MS; the rest keep their retrieval order.
+"""
+import os
+import time
+import hashlib
+import threading
+import functools
+from collections import OrderedDict
+
+import numpy as np
+
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", "50000"))
+# Latency target per query and the bounds on how many documents are re-ranked
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_MIN_DEPTH = int(os.getenv("RERANK_MIN_DEPTH", "3"))
+RERANK_MAX_DEPTH = int(os.getenv("RERANK_MAX_DEPTH", "20"))
+
+
+@functools.lru_cache(maxsize=None)
+def load_cross_encoder(model_name=RERANK_MODEL, max_length=RERANK_MAX_LENGTH):
+    """The sentence_transformers CrossEncoder 'model_name', loaded once per process."""
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(model_name, max_length=max_length)
+
+
+def text_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class Reranker:
+    """
+    Scores (query, passage) pairs with a cross-encoder and re-orders
+    retrieved documents by score. 'model' is a model name or an object with
+    CrossEncoder's predict(pairs, batch_size=...).
+    """
+
+    def __init__(self, model=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE, cache_size=RERANK_CACHE_SIZE,
+                 budget_ms=RERANK_BUDGET_MS, min_depth=RERANK_MIN_DEPTH, max_depth=RERANK_MAX_DEPTH):
+        self.model_name = model if isinstance(model, str) else type(model).__name__
+        self.model = load_cross_encoder(model) if isinstance(model, str) else model
+        self.batch_size = batch_size
+        self.cache_size = cache_size
+        self.budget_ms = budget_ms
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        # Moving average of model time per scored pair, in ms
+        self.ms_per_pair = None
+        self.stats = {"queries": 0, "cached": 0, "scored": 0}
+
+    def depth(self):
+        """How many documents one query can re-rank within the latency budget."""
+        if self.ms_per_pair is None:
+            return self.max_depth
+        return int(min(self.max_depth, max(self.min_depth, self.budget_ms // self.ms_per_pair)))
+
+    def warmup(self, pairs=8):
+        """Run the model once (not cached) so the first real query is timed and sized correctly."""
+        self._predict([("warm up query", "a short passage to warm up the model")] * pairs)
+        self.ms_per_pair = None
+        self._predict([("warm up query", "a short passage to warm up the model")] * pairs)
+
+    def _predict(self, pairs):
+        # Batches of similar length pad less; scores go back in input order
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        start = time.perf_counter()
+        sorted_scores = self.model.predict([pairs[i] for i in order], batch_size=self.batch_size,
+                                           show_progress_bar=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        per_pair = elapsed_ms / len(pairs)
+        self.ms_per_pair = per_pair if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * per_pair
+        scores = np.empty(len(pairs), dtype=np.float32)
+        scores[order] = np.asarray(sorted_scores, dtype=np.float32).reshape(len(pairs))
+        return scores
+
+    def score(self, query, passages):
+        """Cross-encoder scores of 'query' against each passage, from the cache where possible."""
+        query_hash = text_hash(query)
+        keys = [(self.model_name, query_hash, text_hash(p)) for p in passages]
+        scores = np.empty(len(passages), dtype=np.float32)
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    scores[i] = self._cache[key]
+                else:
+                    missing.append(i)
+            self.stats["cached"] += len(passages) - len(missing)
+        if missing:
+            new_scores = self._predict([(query, passages[i]) for i in missing])
+            with self._lock:
+                for i, value in zip(missing, new_scores):
+                    scores[i] = value
+                    self._cache[keys[i]] = float(value)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                self.stats["scored"] += len(missing)
+        return scores
+
+    def rerank(self, query, documents, top_n=None, depth=None):
+        """
+        [(document, score)] with the first 'depth' documents (default: the
+        adaptive depth) re-ordered by cross-encoder score, then the rest in
+        retrieval order with score None. 'documents' are LangChain Documents
+        or strings; top_n cuts the result.
+        """
+        depth = min(len(documents), depth or self.depth())
+        head, tail = documents[:depth], documents[depth:]
+        texts = [getattr(d, "page_content", d) for d in head]
+        scores = self.score(query, texts) if head else []
+        ranked = sorted(zip(head, (float(s) for s in scores)), key=lambda pair: pair[1], reverse=True)
+        ranked += [(d, None) for d in tail]
+        self.stats["queries"] += 1
+        return ranked[:top_n] if top_n else ranked
@@ -0,0 +1,69 @@
+"""
+Recall@k against single-query latency for the ANN indexes of
+helpers/ann_index.py (HNSW efSearch and IVF nprobe sweeps), with the exact
+scan as the baseline.
+
+    python benchmarks/ann_recall.py --glove               # the 400k GloVe words
+    python benchmarks/ann_recall.py --size 400000 --dim 50
+
+Without --glove the vectors are synthetic: 'size' points around 2000 random
+centres, which clusters like word vectors do (uniform random vectors have no
+neighbour structure and would understate ANN recall). Queries are perturbed
+copies of indexed vectors.
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from helpers.ann_index import AnnIndex, recall_latency
+
+
+def synthetic(size, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((2000, dim), dtype=np.float32)
+    return centres[rng.integers(0, len(centres), size)] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="ANN recall vs latency.")
+    parser.add_argument("--glove", action="store_true", help="index glove-wiki-gigaword-50 (gensim download)")
+    parser.add_argument("--size", type=int, default=400000)
+    parser.add_argument("--dim", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", default=["hnsw", "ivf"])
+    args = parser.parse_args(argv)
+
+    if args.glove:
+        import gensim.downloader as api
+        vectors = api.load("glove-wiki-gigaword-50").vectors
+    else:
+        vectors = synthetic(args.size, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    exact = AnnIndex.build(vectors, range(len(vectors)), "flat")
+    baseline = recall_latency(exact, queries[:50], args.k, exact=exact.index)[0]
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, recall@{args.k}")
+    print(f"{'index':>6} {'setting':>8} {'recall':>7} {'ms/query':>9} {'speedup':>8}")
+    print(f"{'flat':>6} {'-':>8} {1.0:>7.3f} {baseline['ms_per_query']:>9.3f} {1.0:>8.1f}")
+    for kind in args.kinds:
+        start = time.monotonic()
+        ann = AnnIndex.build(vectors, range(len(vectors)), kind)
+        print(f"{kind:>6} built in {time.monotonic() - start:.1f} s")
+        for row in recall_latency(ann, queries, args.k, exact=exact.index):
+            print(f"{kind:>6} {row['setting']:>8} {row['recall']:>7.3f} {row['ms_per_query']:>9.3f} "
+                  f"{baseline['ms_per_query'] / row['ms_per_query']:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""
+Cost of keeping an index up to date with helpers/incremental.py: one
+changed PDF in a corpus of --copies PDFs, re-synced incrementally, against
+rebuilding the whole corpus from scratch.
+
+    python benchmarks/incremental_update.py
+    python benchmarks/incremental_update.py --pdf Manifesto.pdf --copies 200 --embed-ms 2
+
+The corpus is --copies copies of --pdf (each with its own title, so each is
+a different file); one copy then loses its last page. Embeddings come from
+a stand-in model that sleeps --embed-ms per text, so no API key is needed.
+Copies share their text, which the embedding cache embeds only once in
+either case; the difference is in the files parsed and the rows written.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from langchain_core.embeddings import Embeddings
+
+from helpers.embedding_cache import content_hash
+from helpers.incremental import IncrementalIndex, load_incremental
+
+
+class SleepyEmbeddings(Embeddings):
+    """Deterministic random vectors, 'ms' milliseconds per text."""
+
+    def __init__(self, dim=256, ms=1.0):
+        self.dim = dim
+        self.ms = ms
+
+    def embed_documents(self, texts):
+        time.sleep(len(texts) * self.ms / 1000)
+        return [np.random.default_rng(int(content_hash(t)[:8], 16)).standard_normal(self.dim).tolist()
+                for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def write_copy(reader, path, title, drop_last=False):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for page in reader.pages[:-1] if drop_last else reader.pages:
+        writer.add_page(page)
+    writer.add_metadata({"/Title": title})
+    writer.write(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental index update vs full rebuild.")
+    parser.add_argument("--pdf", default=os.path.join(ROOT, "Manifesto.pdf"))
+    parser.add_argument("--copies", type=int, default=20)
+    parser.add_argument("--embed-ms", type=float, default=1.0, help="simulated embedding time per text")
+    parser.add_argument("--chunk-size", type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    from pypdf import PdfReader
+
+    reader = PdfReader(args.pdf)
+    embeddings = SleepyEmbeddings(ms=args.embed_ms)
+    work = tempfile.mkdtemp(prefix="incremental_")
+    try:
+        paths = [os.path.join(work, f"doc{i:04d}.pdf") for i in range(args.copies)]
+        for i, path in enumerate(paths):
+            write_copy(reader, path, f"copy {i}")
+
+        def fresh(name):
+            return IncrementalIndex(os.path.join(work, name), embeddings, chunk_size=args.chunk_size,
+                                    cache_path=os.path.join(work, f"{name}.sqlite3"))
+
+        index = fresh("incremental")
+        rows = [("initial build", index.sync(paths))]
+        rows.append(("no change", index.sync(paths)))
+        write_copy(reader, paths[0], "copy 0", drop_last=True)
+        rows.append(("1 PDF changed", index.sync(paths)))
+        rows.append(("full rebuild", fresh("rebuild").sync(paths)))
+
+        print(f"{args.copies} copies of {os.path.basename(args.pdf)} ({len(reader.pages)} pages), "
+              f"{args.embed_ms} ms per embedded text")
+        print(f"{'':>14} {'files':>6} {'added':>7} {'deleted':>8} {'embedded':>9} {'seconds':>8}")
+        for label, report in rows:
+            print(f"{label:>14} {report['files_indexed']:>6} {report['chunks_added']:>7} "
+                  f"{report['chunks_deleted']:>8} {report['embedded']:>9} {report['seconds']:>8.2f}")
+
+        vectorstore = load_incremental(index.path, embeddings)
+        query = vectorstore.docstore.search(0).page_content
+        start = time.perf_counter()
+        for _ in range(20):
+            vectorstore.similarity_search(query, k=5)
+        print(f"search over {vectorstore.index.ntotal} live chunks in "
+              f"{len(vectorstore.index.indexes)} segment(s): "
+              f"{(time.perf_counter() - start) / 20 * 1000:.2f} ms/query")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""
+Load time and memory of a saved FAISS index as the corpus grows, read fully
+versus memory-mapped (helpers/index_store.py).
+
+    python benchmarks/index_load.py --sizes 10000 50000 200000 --dim 1536
+
+Each size is built once from random vectors, then loaded in a fresh
+interpreter per mode. Reported per load: wall time, private (anonymous)
+memory, and file-backed memory, which worker processes share.
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_PROBE = """
+import sys, json, time
+sys.path.insert(0, {root!r})
+
+def status():
+    fields = {{}}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile"):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+from helpers.index_store import load_index
+import numpy as np
+import faiss
+from langchain_community.vectorstores import FAISS
+before = status()
+start = time.perf_counter()
+store = load_index({path!r}, None, mmap={mmap})
+load_ms = (time.perf_counter() - start) * 1000
+after_load = status()
+query = np.random.default_rng(0).random((1, store.index.d), dtype=np.float32)
+start = time.perf_counter()
+store.index.search(query, 5)
+search_ms = (time.perf_counter() - start) * 1000
+after_search = status()
+print(json.dumps({{
+    "load_ms": load_ms,
+    "search_ms": search_ms,
+    "anon_mb": after_load["RssAnon"] - before["RssAnon"],
+    "file_mb_after_search": after_search["RssFile"] - before["RssFile"],
+    "anon_mb_after_search": after_search["RssAnon"] - before["RssAnon"],
+}}))
+"""
+
+
+def build(path, size, dim):
+    """Save a random index of 'size' vectors with one short document each."""
+    import faiss
+    import numpy as np
+    from langchain_core.documents import Document
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from helpers.index_store import save_index
+
+    rng = np.random.default_rng(size)
+    index = faiss.IndexFlatL2(dim)
+    for start in range(0, size, 10000):
+        index.add(rng.random((min(10000, size - start), dim), dtype=np.float32))
+    docstore = InMemoryDocstore({str(i): Document(page_content=f"chunk {i}", metadata={"page": i}) for i in range(size)})
+    store = FAISS(None, index, docstore, {i: str(i) for i in range(size)})
+    save_index(store, path)
+
+
+def probe(path, mmap):
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(root=ROOT, path=path, mmap=mmap)],
+        check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="FAISS index load time and memory, full read vs mmap.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 100000])
+    parser.add_argument("--dim", type=int, default=1536, help="1536 = OpenAI text-embedding-ada-002")
+    parser.add_argument("--dir", default=None, help="where to build the indexes (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    base = args.dir or tempfile.mkdtemp(prefix="index_load_")
+    print(f"{'vectors':>9} {'mode':>5} {'load ms':>9} {'private MB':>11} {'shared MB*':>11} {'search ms':>10}")
+    for size in args.sizes:
+        path = os.path.join(base, f"n{size}_d{args.dim}")
+        if not os.path.exists(os.path.join(path, "CURRENT")):
+            build(path, size, args.dim)
+        for mmap in (False, True):
+            r = probe(path, mmap)
+            print(f"{size:>9} {'mmap' if mmap else 'read':>5} {r['load_ms']:>9.1f} "
+                  f"{r['anon_mb_after_search']:>11.1f} {r['file_mb_after_search']:>11.1f} {r['search_ms']:>10.1f}")
+    print("* file-backed pages touched by one search; shared by every process mapping the index")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
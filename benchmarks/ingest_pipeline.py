@@ -0,0 +1,105 @@
+"""
+Ingestion throughput and peak memory: the notebook's serial path
+(PyPDFLoader.load_and_split, then embed everything, then FAISS) against the
+streaming pipeline of helpers/pdf_pipeline.py.
+
+    python benchmarks/ingest_pipeline.py --pdf Manifesto.pdf --copies 8 --workers 4
+
+The corpus is 'copies' copies of the PDF. Embeddings come from a local fake
+model with a fixed latency per request (--embed-latency-ms), so the numbers
+show parsing and overlap, not network speed. Each mode runs in a fresh
+interpreter; peak memory is that process's max RSS.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_RUN = """
+import sys, json, time, hashlib, resource
+sys.path.insert(0, {root!r})
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+class FakeEmbeddings(Embeddings):
+    model = "fake-benchmark"
+    def __init__(self, dim, latency):
+        self.dim, self.latency = dim, latency
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+        return np.random.default_rng(seed).random(self.dim, dtype=np.float32)
+    def embed_documents(self, texts):
+        time.sleep(self.latency)
+        return [self._vector(t).tolist() for t in texts]
+    def embed_query(self, text):
+        return self._vector(text).tolist()
+
+paths, out, mode = {paths!r}, {out!r}, {mode!r}
+embeddings = FakeEmbeddings({dim}, {latency})
+start = time.perf_counter()
+if mode == "serial":
+    from langchain_community.document_loaders import PyPDFLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from langchain_community.vectorstores import FAISS
+    splitter = RecursiveCharacterTextSplitter(chunk_size=2000, chunk_overlap=100, length_function=len, is_separator_regex=False)
+    chunks = []
+    for p in paths:
+        chunks.extend(PyPDFLoader(p).load_and_split(text_splitter=splitter))
+    # OpenAIEmbeddings sends batches of {batch}
+    vectors = []
+    for i in range(0, len(chunks), {batch}):
+        vectors.extend(embeddings.embed_documents([c.page_content for c in chunks[i:i + {batch}]]))
+    FAISS.from_embeddings(list(zip([c.page_content for c in chunks], vectors)), embeddings,
+                          metadatas=[c.metadata for c in chunks])
+    count = len(chunks)
+else:
+    from helpers.pdf_pipeline import ingest_pdfs
+    report = ingest_pdfs(paths, embeddings, out, batch_size={batch}, workers={workers}, cache=False)
+    count = report["chunks"]
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "chunks": count,
+                  "peak_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+
+def run(mode, paths, out, args):
+    code = _RUN.format(root=ROOT, paths=paths, out=out, mode=mode, dim=args.dim,
+                       latency=args.embed_latency_ms / 1000, batch=args.batch_size, workers=args.workers)
+    stdout = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True).stdout
+    return json.loads(stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serial vs streaming PDF ingestion.")
+    parser.add_argument("--pdf", default=os.path.join(ROOT, "Manifesto.pdf"))
+    parser.add_argument("--copies", type=int, default=8, help="copies of the PDF in the corpus")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--embed-latency-ms", type=float, default=150.0, help="fake latency per embedding request")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="ingest_bench_")
+    try:
+        paths = []
+        for i in range(args.copies):
+            paths.append(os.path.join(work, f"doc{i}.pdf"))
+            shutil.copyfile(args.pdf, paths[-1])
+        print(f"{args.copies} x {os.path.basename(args.pdf)}, {args.workers} workers, "
+              f"{args.embed_latency_ms:.0f} ms per embedding request")
+        print(f"{'mode':>10} {'chunks':>7} {'seconds':>8} {'chunks/s':>9} {'peak MB':>8}")
+        for mode in ("serial", "streaming"):
+            r = run(mode, paths, os.path.join(work, "index"), args)
+            print(f"{mode:>10} {r['chunks']:>7} {r['seconds']:>8.2f} {r['chunks'] / r['seconds']:>9.1f} {r['peak_mb']:>8.1f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
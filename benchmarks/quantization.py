@@ -0,0 +1,93 @@
+"""
+Memory per vector against recall@k for the compressed index storages of
+helpers/quantize.py, with and without exact re-scoring, through the same
+IndexWriter / load_index path the RAG notebooks use.
+
+    python benchmarks/quantization.py --size 50000 --dim 1536
+    python benchmarks/quantization.py --glove     # the 400k GloVe vectors
+
+Without --glove the vectors are synthetic and clustered (points around 2000
+random centres), a rough stand-in for text embeddings. "index MB" is the
+size of index.faiss, what a server keeps in memory; the float32 vectors for
+re-scoring stay on disk and are read only for the candidates of a query.
+"""
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from helpers.ann_index import recall_at_k
+from helpers.index_store import IndexWriter, current_version, load_index
+from helpers.quantize import STORAGES
+
+
+def synthetic(size, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((2000, dim), dtype=np.float32)
+    return centres[rng.integers(0, len(centres), size)] + 0.6 * rng.standard_normal((size, dim), dtype=np.float32)
+
+
+def build(path, vectors, storage):
+    from langchain_core.documents import Document
+
+    writer = IndexWriter(path, storage=storage)
+    for start in range(0, len(vectors), 10000):
+        batch = vectors[start:start + 10000]
+        writer.add(batch, [Document(page_content=f"chunk {start + i}") for i in range(len(batch))])
+    return writer.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compressed index storage: memory per vector vs recall@k.")
+    parser.add_argument("--glove", action="store_true", help="use glove-wiki-gigaword-50 (gensim download)")
+    parser.add_argument("--size", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536, help="1536 = OpenAI text-embedding-ada-002")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.glove:
+        import gensim.downloader as api
+        vectors = api.load("glove-wiki-gigaword-50").vectors
+    else:
+        vectors = synthetic(args.size, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape, dtype=np.float32)
+
+    # load_index without an embeddings model: only the raw index is searched
+    logging.getLogger("langchain_community.vectorstores.faiss").setLevel(logging.ERROR)
+    work = tempfile.mkdtemp(prefix="quantization_")
+    try:
+        print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, recall@{args.k}")
+        print(f"{'storage':>8} {'rescore':>8} {'B/vector':>9} {'index MB':>9} {'recall':>7} {'ms/query':>9}")
+        truth = None
+        for storage in STORAGES:
+            path = os.path.join(work, storage)
+            build(path, vectors, storage)
+            size = os.path.getsize(os.path.join(current_version(path), "index.faiss"))
+            for rescore in ((False,) if storage == "float32" else (False, True)):
+                index = load_index(path, None, rescore=rescore).index
+                if truth is None:
+                    truth = index.search(queries, args.k)[1]
+                start = time.perf_counter()
+                found = np.vstack([index.search(queries[i:i + 1], args.k)[1] for i in range(len(queries))])
+                ms = (time.perf_counter() - start) / len(queries) * 1000
+                print(f"{storage:>8} {'yes' if rescore else 'no':>8} {size / len(vectors):>9.1f} "
+                      f"{size / 2 ** 20:>9.1f} {recall_at_k(found, truth):>7.3f} {ms:>9.3f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
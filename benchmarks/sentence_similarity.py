@@ -0,0 +1,89 @@
+"""
+Sentence embedding and scoring throughput: the notebook's get_embedding +
+scipy cosine, one pair at a time, against helpers/sentence_embeddings.py.
+
+    python benchmarks/sentence_similarity.py --queries 100 --candidates 1000
+    python benchmarks/sentence_similarity.py --glove   # real glove-wiki-gigaword-50
+
+By default the word vectors are random (400k words x 50 dims, the size of
+glove-wiki-gigaword-50), so nothing is downloaded. The one-pair-at-a-time
+path is timed on a sample of pairs and extrapolated.
+"""
+import os
+import sys
+import time
+import string
+import argparse
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from helpers.sentence_embeddings import SentenceEncoder, cosine_similarity_matrix
+
+
+class RandomVectors:
+    """Stand-in for a gensim KeyedVectors: 'size' random words."""
+
+    def __init__(self, size, dim, seed=0):
+        self.index_to_key = [f"w{i}" for i in range(size)]
+        self.key_to_index = {w: i for i, w in enumerate(self.index_to_key)}
+        self.vectors = np.random.default_rng(seed).standard_normal((size, dim), dtype=np.float32)
+
+    def __getitem__(self, word):
+        return self.vectors[self.key_to_index[word]]
+
+
+def get_embedding(sentence, model):
+    # As in embeddings-intro-soln.ipynb
+    words = [word for word in sentence.lower().split() if word not in string.punctuation]
+    return np.mean([model[word] for word in words], axis=0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pairwise vs batched sentence similarity.")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--candidates", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=12, help="words per sentence")
+    parser.add_argument("--sample", type=int, default=2000, help="pairs timed on the pairwise path")
+    parser.add_argument("--glove", action="store_true", help="load glove-wiki-gigaword-50 with gensim")
+    args = parser.parse_args(argv)
+
+    if args.glove:
+        import gensim.downloader as api
+        model = api.load("glove-wiki-gigaword-50")
+    else:
+        model = RandomVectors(400000, 50)
+    from scipy import spatial
+
+    rng = np.random.default_rng(1)
+    vocab = model.index_to_key[:50000]
+    sentences = [" ".join(rng.choice(vocab, args.words)) for _ in range(args.queries + args.candidates)]
+    queries, candidates = sentences[:args.queries], sentences[args.queries:]
+    pairs = args.queries * args.candidates
+
+    start = time.perf_counter()
+    for i in range(args.sample):
+        a, b = queries[i % len(queries)], candidates[i % len(candidates)]
+        1 - spatial.distance.cosine(get_embedding(a, model), get_embedding(b, model))
+    pairwise = (time.perf_counter() - start) / args.sample * pairs
+
+    encoder = SentenceEncoder(model)
+    start = time.perf_counter()
+    q, c = encoder.encode(queries), encoder.encode(candidates)
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    cosine_similarity_matrix(q, c)
+    score = time.perf_counter() - start
+
+    print(f"{pairs} pairs ({args.queries} queries x {args.candidates} candidates, {args.words} words each)")
+    print(f"  pairwise get_embedding + scipy: {pairwise * 1000:10.1f} ms (extrapolated from {args.sample} pairs)")
+    print(f"  batched encode:                 {encode * 1000:10.1f} ms")
+    print(f"  batched score (one matmul):     {score * 1000:10.1f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
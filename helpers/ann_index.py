@@ -0,0 +1,242 @@
+# helpers/ann_index.py
+
+import os
+import json
+import time
+import numpy as np
+
+from helpers.embedding_cache import RAG_CACHE_DIR
+from helpers.index_store import current_version, new_version, prune_versions, publish_version, read_index_mmap
+from helpers.quantize import EXACT_VECTORS_FILE, TRAINING_SAMPLE, effective_storage, load_exact, rescored_search, \
+    save_exact, storage_key, training_sample
+
+# Approximate nearest-neighbour search over word vectors (the 400k GloVe
+# words of embeddings-intro) or stored sentence embeddings, by cosine
+# similarity. Vectors are L2-normalized and indexed for inner product, in one
+# of:
+#   "hnsw"  faiss.IndexHNSWFlat - graph search, no training; efSearch trades
+#           recall for latency
+#   "ivf"   faiss.IndexIVFFlat  - k-means cells, nprobe of them scanned per query
+#   "flat"  exact scan, the baseline for recall
+# each with its vectors stored as float32, float16, int8 or pq (see
+# helpers/quantize.py); compressed indexes can re-score their candidates
+# with the exact vectors.
+# Indexes are saved with the versioned layout of helpers/index_store.py
+# (index.faiss + keys.json + meta.json, published through CURRENT) and
+# memory-mapped on load.
+ANN_DIR = os.getenv("RAG_ANN_DIR", os.path.join(RAG_CACHE_DIR, "ann"))
+HNSW_M = int(os.getenv("ANN_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("ANN_HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("ANN_HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("ANN_IVF_NPROBE", "16"))
+KINDS = ("hnsw", "ivf", "flat")
+
+
+def ann_path(name):
+    """Directory of the ANN index called 'name' under ANN_DIR."""
+    return os.path.join(ANN_DIR, name)
+
+
+def _normalized(vectors):
+    import faiss
+
+    vectors = np.array(vectors, dtype=np.float32, order="C")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def build_faiss_index(vectors, kind="hnsw", storage="float32", m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION,
+                      nlist=None):
+    """Inner-product faiss index of kind 'kind' over already normalized 'vectors'."""
+    import faiss
+
+    n, dim = vectors.shape
+    codes = storage_key(storage, dim, n)
+    if kind == "hnsw":
+        key = f"HNSW{m},{codes}"
+    elif kind == "ivf":
+        # ~4 sqrt(n) cells, trained on up to 64 points per cell (faiss wants >= 39)
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39))
+        key = f"IVF{nlist},{codes}"
+    elif kind == "flat":
+        key = codes
+    else:
+        raise ValueError(f"Unknown ANN index kind {kind!r}; expected one of {KINDS}")
+    index = faiss.index_factory(dim, key, faiss.METRIC_INNER_PRODUCT)
+    if kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efConstruction = ef_construction
+    if not index.is_trained:
+        index.train(training_sample(vectors, max(TRAINING_SAMPLE, 64 * (nlist or 0))))
+    index.add(vectors)
+    if kind == "ivf":
+        # Lets reconstruct(i) find vector i (most_similar, recall reports)
+        index.make_direct_map()
+    return index
+
+
+class AnnIndex:
+    """
+    Cosine top-k search over labelled vectors:
+
+        words = AnnIndex.build(model.vectors, model.index_to_key, kind="hnsw")
+        words.most_similar("tree", topn=5)
+        words.save(ann_path("glove-50"))
+        words = AnnIndex.load(ann_path("glove-50"))
+
+    'exact' holds the float32 (normalized) vectors of a compressed index;
+    when set, searches re-score their candidates with it.
+    """
+
+    def __init__(self, index, keys, kind, meta=None, exact=None):
+        self.index = index
+        self.keys = list(keys)
+        self.kind = kind
+        self.meta = meta or {}
+        self.exact = exact
+        self._key_to_id = None
+        self.set_search_params(HNSW_EF_SEARCH, IVF_NPROBE)
+
+    @classmethod
+    def build(cls, vectors, keys, kind="hnsw", storage="float32", rescore=True, **params):
+        """
+        Index 'vectors' (n x d), one key (word, sentence, id) per row, stored
+        as 'storage'. rescore=False drops the exact vectors of a compressed index.
+        """
+        if len(keys) != len(vectors):
+            raise ValueError(f"{len(keys)} keys for {len(vectors)} vectors")
+        start = time.monotonic()
+        vectors = _normalized(vectors)
+        storage = effective_storage(storage, len(vectors))
+        index = build_faiss_index(vectors, kind, storage, **params)
+        exact = vectors if storage != "float32" and rescore else None
+        meta = {"storage": storage, "build_seconds": time.monotonic() - start, **params}
+        return cls(index, keys, kind, meta, exact)
+
+    def set_search_params(self, ef_search=None, nprobe=None):
+        """Recall/latency knobs: HNSW efSearch, IVF nprobe."""
+        import faiss
+
+        if self.kind == "hnsw" and ef_search:
+            faiss.downcast_index(self.index).hnsw.efSearch = ef_search
+        elif self.kind == "ivf" and nprobe:
+            faiss.extract_index_ivf(self.index).nprobe = nprobe
+
+    def search(self, queries, k=10):
+        """(scores, ids) arrays, n_queries x k, best first; missing hits have id -1."""
+        import faiss
+
+        queries = _normalized(np.atleast_2d(queries))
+        if self.exact is not None:
+            scores, ids = rescored_search(self.index, self.exact, queries, k)
+        else:
+            scores, ids = self.index.search(queries, k)
+        if self.index.metric_type == faiss.METRIC_L2:
+            # HNSW+PQ only supports L2; on unit vectors |a - b|^2 = 2 - 2 cos
+            scores = 1 - scores / 2
+        return scores, ids
+
+    def query(self, vector, k=10):
+        """[(key, cosine similarity)] of the k nearest neighbours of 'vector'."""
+        scores, ids = self.search(vector, k)
+        return [(self.keys[i], float(s)) for s, i in zip(scores[0], ids[0]) if i >= 0]
+
+    def most_similar(self, key, topn=10):
+        """Like gensim's most_similar: neighbours of an indexed key, without itself."""
+        if self._key_to_id is None:
+            self._key_to_id = {k: i for i, k in enumerate(self.keys)}
+        i = self._key_to_id[key]
+        vector = self.exact[i] if self.exact is not None else self.index.reconstruct(i)
+        hits = self.query(vector, topn + 1)
+        return [(k, s) for k, s in hits if k != key][:topn]
+
+    def save(self, path):
+        """Write a new version under 'path' and publish it. Returns its directory."""
+        import faiss
+
+        os.makedirs(path, exist_ok=True)
+        version = new_version(path)
+        version_dir = os.path.join(path, version)
+        faiss.write_index(self.index, os.path.join(version_dir, "index.faiss"))
+        with open(os.path.join(version_dir, "keys.json"), "w", encoding="utf-8") as f:
+            json.dump(self.keys, f, ensure_ascii=False)
+        exact_file = None
+        if self.exact is not None:
+            exact_file = EXACT_VECTORS_FILE
+            save_exact(os.path.join(version_dir, exact_file), self.exact)
+        with open(os.path.join(version_dir, "meta.json"), "w") as f:
+            json.dump({**self.meta, "kind": self.kind, "dim": self.index.d, "count": self.index.ntotal,
+                       "exact_vectors": exact_file, "created_at": time.time()}, f)
+        publish_version(path, version)
+        prune_versions(path)
+        return version_dir
+
+    @classmethod
+    def load(cls, path, mmap=True, rescore=True):
+        """
+        The current version saved at 'path', memory-mapped unless mmap=False.
+        rescore=False searches a compressed index without the exact vectors.
+        """
+        import faiss
+
+        version_dir = current_version(path)
+        if version_dir is None:
+            raise FileNotFoundError(f"No ANN index saved at {path}")
+        with open(os.path.join(version_dir, "meta.json")) as f:
+            meta = json.load(f)
+        with open(os.path.join(version_dir, "keys.json"), encoding="utf-8") as f:
+            keys = json.load(f)
+        index_file = os.path.join(version_dir, "index.faiss")
+        index = read_index_mmap(index_file) if mmap else faiss.read_index(index_file)
+        exact_file = meta.pop("exact_vectors", None)
+        exact = load_exact(os.path.join(version_dir, exact_file)) if rescore and exact_file else None
+        return cls(index, keys, meta.pop("kind"), meta, exact)
+
+
+def word_index(model, kind="hnsw", **params):
+    """AnnIndex over every word of a gensim KeyedVectors 'model'."""
+    return AnnIndex.build(model.vectors, model.index_to_key, kind, **params)
+
+
+def sentence_index(encoder, sentences, kind="hnsw", **params):
+    """AnnIndex over 'sentences' embedded with a helpers.sentence_embeddings.SentenceEncoder."""
+    return AnnIndex.build(encoder.encode(sentences), sentences, kind, **params)
+
+
+def recall_at_k(found, truth):
+    """Mean fraction of each row of 'truth' (exact top-k ids) present in 'found'."""
+    k = truth.shape[1]
+    return float(np.mean([len(set(f[:k]) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def recall_latency(ann, queries, k=10, settings=None, exact=None):
+    """
+    Recall@k and single-query latency of 'ann' for each search setting
+    (efSearch for HNSW, nprobe for IVF), against exact search over the same
+    vectors (ann.exact if kept; otherwise the index's own, possibly
+    compressed, vectors). Returns a list of dicts.
+    """
+    import faiss
+
+    if exact is None:
+        exact = faiss.IndexFlatIP(ann.index.d)
+        if ann.exact is not None:
+            exact.add(np.ascontiguousarray(ann.exact, dtype=np.float32))
+        else:
+            exact.add(ann.index.reconstruct_n(0, ann.index.ntotal))
+    queries = _normalized(queries)
+    _, truth = exact.search(queries, k)
+    settings = settings or {"hnsw": [16, 32, 64, 128, 256], "ivf": [1, 4, 16, 64], "flat": [None]}[ann.kind]
+
+    rows = []
+    for setting in settings:
+        ann.set_search_params(ef_search=setting, nprobe=setting)
+        found = np.empty_like(truth)
+        start = time.perf_counter()
+        # One query at a time: the latency an interactive lookup sees
+        for i in range(len(queries)):
+            found[i] = ann.search(queries[i:i + 1], k)[1][0]
+        seconds = time.perf_counter() - start
+        rows.append({"kind": ann.kind, "setting": setting, "recall": recall_at_k(found, truth),
+                     "ms_per_query": seconds / len(queries) * 1000})
+    ann.set_search_params(HNSW_EF_SEARCH, IVF_NPROBE)
+    return rows
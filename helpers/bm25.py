@@ -0,0 +1,234 @@
+# helpers/bm25.py
+
+import os
+import re
+import numpy as np
+
+# In-process BM25 keyword index over the chunks of a FAISS index, addressed
+# by the same vector positions, so lexical and vector hits can be fused
+# (helpers/hybrid.py) without an external search engine. The postings are
+# stored compactly, CSR style:
+#   term_bytes, term_offsets   sorted vocabulary as one UTF-8 buffer; term t
+#                              is term_bytes[term_offsets[t]:term_offsets[t + 1]]
+#   offsets   postings of term t are doc_ids/tfs[offsets[t]:offsets[t + 1]]
+#   doc_ids   int32 vector positions
+#   tfs       uint16 term frequencies
+#   doc_len   tokens per position
+# IndexWriter (helpers/index_store.py) builds one next to every index
+# version as bm25.npz; a query is a few vectorized array operations per term.
+# While building, postings are packed into arrays and spilled to run files
+# every BM25_SPILL_POSTINGS postings, so a large build does not hold a Python
+# object per posting.
+BM25_FILE = "bm25.npz"
+BM25_K1 = float(os.getenv("RAG_BM25_K1", "1.2"))
+BM25_B = float(os.getenv("RAG_BM25_B", "0.75"))
+BM25_SPILL_POSTINGS = int(os.getenv("RAG_BM25_SPILL_POSTINGS", "500000"))
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below between both but
+by can could did do does doing down during each few for from further had has have having he her here hers herself him
+himself his how i if in into is it its itself just me more most my myself no nor not now of off on once only or other
+our ours ourselves out over own same she should so some such than that the their theirs them themselves then there
+these they this those through to too under until up very was we were what when where which while who whom why will
+with would you your yours yourself yourselves
+""".split())
+
+
+def tokenize(text):
+    """Lowercase word tokens of 'text' without stopwords."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def pack_terms(terms):
+    """(uint8 UTF-8 buffer, int64 offsets) of a list of strings."""
+    encoded = [t.encode("utf-8") for t in terms]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_terms(buffer, offsets):
+    data = np.asarray(buffer, dtype=np.uint8).tobytes()
+    return [data[start:stop].decode("utf-8") for start, stop in zip(offsets[:-1].tolist(), offsets[1:].tolist())]
+
+
+class BM25Builder:
+    """
+    Accumulates (position, text) pairs; build() returns the BM25Index.
+    Every 'spill_postings' postings the pending ones are packed into arrays
+    (a run), written to 'spill_dir' when given; build() merges the runs.
+    """
+
+    def __init__(self, spill_dir=None, spill_postings=BM25_SPILL_POSTINGS):
+        self.spill_dir = spill_dir
+        self.spill_postings = spill_postings
+        self.runs = []
+        self._reset()
+
+    def _reset(self):
+        self.postings = {}
+        self.positions = []
+        self.lengths = []
+        self.pending = 0
+
+    def add(self, position, text):
+        tokens = tokenize(text)
+        self.positions.append(position)
+        self.lengths.append(len(tokens))
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, tf in counts.items():
+            self.postings.setdefault(token, []).append((position, tf))
+        self.pending += len(counts)
+        if self.pending >= self.spill_postings:
+            self.flush()
+
+    def flush(self):
+        """Pack the pending postings into a run."""
+        if not self.positions:
+            return
+        terms = sorted(self.postings)
+        entries = np.array([e for t in terms for e in self.postings[t]], dtype=np.int64).reshape(-1, 2)
+        term_bytes, term_offsets = pack_terms(terms)
+        run = {
+            "term_bytes": term_bytes,
+            "term_offsets": term_offsets,
+            "counts": np.array([len(self.postings[t]) for t in terms], dtype=np.int64),
+            "doc_ids": entries[:, 0].astype(np.int32),
+            "tfs": np.minimum(entries[:, 1], np.iinfo(np.uint16).max).astype(np.uint16),
+            "positions": np.array(self.positions, dtype=np.int64),
+            "lengths": np.array(self.lengths, dtype=np.int32),
+        }
+        if self.spill_dir is not None:
+            path = os.path.join(self.spill_dir, f"bm25-run-{len(self.runs)}.npz")
+            np.savez(path, **run)
+            run = path
+        self.runs.append(run)
+        self._reset()
+
+    def _load_runs(self):
+        for run in self.runs:
+            if isinstance(run, str):
+                with np.load(run) as data:
+                    yield {key: data[key] for key in data.files}
+            else:
+                yield run
+
+    def build(self):
+        self.flush()
+        runs = list(self._load_runs())
+        run_terms = [unpack_terms(r["term_bytes"], r["term_offsets"]) for r in runs]
+        terms = sorted(set().union(*run_terms))
+        term_id = {term: i for i, term in enumerate(terms)}
+        if runs:
+            term_ids = np.concatenate([
+                np.repeat(np.array([term_id[t] for t in names], dtype=np.int64), r["counts"])
+                for names, r in zip(run_terms, runs)
+            ])
+            # Stable: each term's postings stay in the order they were added
+            order = np.argsort(term_ids, kind="stable")
+            doc_ids = np.concatenate([r["doc_ids"] for r in runs])[order]
+            tfs = np.concatenate([r["tfs"] for r in runs])[order]
+            positions = np.concatenate([r["positions"] for r in runs])
+            lengths = np.concatenate([r["lengths"] for r in runs])
+        else:
+            term_ids = np.zeros(0, dtype=np.int64)
+            doc_ids, tfs = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.uint16)
+            positions, lengths = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int32)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(term_ids, minlength=len(terms)))
+        doc_len = np.zeros(int(positions.max()) + 1 if positions.size else 0, dtype=np.int32)
+        doc_len[positions] = lengths
+        for run in self.runs:
+            if isinstance(run, str):
+                os.remove(run)
+        self.runs = []
+        return BM25Index(terms, offsets, doc_ids, tfs, doc_len)
+
+
+class BM25Index:
+    """
+    Okapi BM25 search over vector positions:
+
+        bm25 = BM25Index.from_vectorstore(vectorstore)   # or load_bm25(path)
+        positions, scores = bm25.search("carbon dioxide emissions", k=5)
+    """
+
+    def __init__(self, terms, offsets, doc_ids, tfs, doc_len, k1=BM25_K1, b=BM25_B):
+        # Sorted vocabulary, a list of str
+        self.terms = list(terms)
+        self.term_ids = {term: i for i, term in enumerate(self.terms)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        count = len(doc_len)
+        df = np.diff(offsets)
+        self.idf = np.log1p((count - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_len = doc_len.mean() if count else 1.0
+        # Length normalization of each position, computed once
+        self._norm = (k1 * (1 - b + b * doc_len / max(avg_len, 1e-9))).astype(np.float32)
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    @classmethod
+    def from_texts(cls, texts):
+        """Index 'texts'; position i is texts[i]."""
+        builder = BM25Builder()
+        for position, text in enumerate(texts):
+            builder.add(position, text)
+        return builder.build()
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        """Index the chunks of a LangChain FAISS vectorstore by vector position."""
+        docstore, ids = vectorstore.docstore, vectorstore.index_to_docstore_id
+        return cls.from_texts(docstore.search(ids[i]).page_content for i in range(vectorstore.index.ntotal))
+
+    def query_terms(self, query):
+        """Ids of the distinct query terms that occur in the index."""
+        seen = []
+        for token in tokenize(query):
+            term_id = self.term_ids.get(token)
+            if term_id is not None and term_id not in seen:
+                seen.append(term_id)
+        return seen
+
+    def covers(self, query, max_terms):
+        """True if 'query' has 1..max_terms terms and every one is in the index."""
+        tokens = set(tokenize(query))
+        return 0 < len(tokens) <= max_terms and all(t in self.term_ids for t in tokens)
+
+    def search(self, query, k=10):
+        """(positions, scores) of the k best-scoring chunks, best first; only chunks matching a term."""
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        for term_id in self.query_terms(query):
+            start, stop = self.offsets[term_id], self.offsets[term_id + 1]
+            ids = self.doc_ids[start:stop]
+            tf = self.tfs[start:stop].astype(np.float32)
+            # Positions are unique within one term's postings, so += is safe
+            scores[ids] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self._norm[ids])
+        matched = np.flatnonzero(scores)
+        if matched.size > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return best, scores[best]
+
+    def save(self, directory):
+        term_bytes, term_offsets = pack_terms(self.terms)
+        np.savez(os.path.join(directory, BM25_FILE), term_bytes=term_bytes, term_offsets=term_offsets,
+                 offsets=self.offsets, doc_ids=self.doc_ids, tfs=self.tfs, doc_len=self.doc_len)
+
+    @classmethod
+    def load(cls, directory):
+        with np.load(os.path.join(directory, BM25_FILE)) as data:
+            if "term_bytes" in data.files:
+                terms = unpack_terms(data["term_bytes"], data["term_offsets"])
+            else:
+                # Written before the vocabulary became a byte buffer
+                terms = data["terms"].tolist()
+            return cls(terms, data["offsets"], data["doc_ids"], data["tfs"], data["doc_len"])
@@ -0,0 +1,139 @@
+# helpers/embedding_cache.py
+
+import os
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Persistent embedding cache for the RAG notebooks. Vectors are stored in a
+# SQLite file keyed by (embedding model, SHA-256 of the text), so re-indexing
+# a corpus only embeds chunks whose text (or model) changed: an unchanged PDF
+# with unchanged splitter settings costs zero embedding calls.
+RAG_CACHE_DIR = os.getenv(
+    "RAG_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".cache")
+)
+EMBEDDING_CACHE_PATH = os.getenv("RAG_EMBEDDING_CACHE", os.path.join(RAG_CACHE_DIR, "embeddings.sqlite3"))
+
+# SQLite caps the number of bound parameters per statement
+_LOOKUP_CHUNK = 500
+
+
+def content_hash(text):
+    """SHA-256 hex digest of a chunk's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_name(embeddings):
+    """Name identifying what produced a vector (OpenAIEmbeddings.model etc.)."""
+    for attr in ("model", "model_name", "deployment"):
+        name = getattr(embeddings, attr, None)
+        if isinstance(name, str) and name:
+            return name
+    return type(embeddings).__name__
+
+
+class EmbeddingCache:
+    """float32 vectors in a SQLite file, keyed by (model, content hash)."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT, hash TEXT, dim INTEGER, vector BLOB,"
+            " PRIMARY KEY (model, hash)) WITHOUT ROWID"
+        )
+
+    def _conn(self):
+        # One connection per thread and per process
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get_many(self, model, hashes):
+        """{hash: vector} for the hashes stored for 'model'."""
+        found = {}
+        conn = self._conn()
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), _LOOKUP_CHUNK):
+            chunk = unique[start:start + _LOOKUP_CHUNK]
+            rows = conn.execute(
+                f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+                (model, *chunk)
+            )
+            for h, blob in rows:
+                found[h] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, items):
+        """Store (hash, vector) pairs for 'model' in one transaction."""
+        rows = []
+        for h, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((model, h, len(vector), vector.tobytes()))
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def count(self, model=None):
+        if model is None:
+            return self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps a LangChain Embeddings object (e.g. OpenAIEmbeddings) so documents
+    are embedded at most once per model:
+
+        embedding = CachedEmbeddings(OpenAIEmbeddings(api_key=api_key))
+        vectorstore = FAISS.from_documents(chunks, embedding=embedding)
+
+    Only texts missing from the cache are sent to the wrapped model, each
+    distinct text once. 'stats' counts cache hits and embedded texts.
+    """
+
+    def __init__(self, embeddings, cache=None, model=None, cache_queries=False):
+        self.embeddings = embeddings
+        self.cache = cache if cache is not None else EmbeddingCache()
+        self.model = model or model_name(embeddings)
+        self.cache_queries = cache_queries
+        self.stats = {"hits": 0, "embedded": 0}
+
+    def embed_documents(self, texts):
+        hashes = [content_hash(t) for t in texts]
+        found = self.cache.get_many(self.model, hashes)
+
+        missing = {}
+        for h, text in zip(hashes, texts):
+            if h not in found and h not in missing:
+                missing[h] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            new = dict(zip(missing, (np.asarray(v, dtype=np.float32) for v in vectors)))
+            self.cache.put_many(self.model, new.items())
+            found.update(new)
+
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["embedded"] += len(missing)
+        return [found[h].tolist() for h in hashes]
+
+    def embed_query(self, text):
+        # Queries are rarely repeated verbatim; cache them only on request
+        if not self.cache_queries:
+            return self.embeddings.embed_query(text)
+        return self.embed_documents([text])[0]
@@ -0,0 +1,193 @@
+# helpers/embedding_client.py
+
+import os
+import time
+import random
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.embeddings import Embeddings
+
+# Token-aware embedding client for large corpora. Instead of a fixed number of
+# texts per request, chunks are packed in order into batches of up to
+# EMBED_BATCH_TOKENS tokens (counted with tiktoken, like the API does). The
+# batches are sent concurrently under requests/min and tokens/min limits,
+# with retries on rate-limit and transient errors, and the vectors come back
+# in the original order. With enough concurrency, throughput is set by the
+# rate limits rather than by request latency.
+#
+#     embeddings = BatchedEmbeddings(model="text-embedding-3-small")
+#     splitter = RecursiveCharacterTextSplitter(chunk_size=512, chunk_overlap=32,
+#                                               length_function=token_length)
+EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-ada-002")
+EMBED_BATCH_TOKENS = int(os.getenv("OPENAI_EMBED_BATCH_TOKENS", "50000"))
+# The API accepts at most 2048 inputs per request and 8191 tokens per input
+EMBED_BATCH_ITEMS = int(os.getenv("OPENAI_EMBED_BATCH_ITEMS", "2048"))
+EMBED_MAX_INPUT_TOKENS = 8191
+EMBED_CONCURRENCY = int(os.getenv("OPENAI_EMBED_CONCURRENCY", "8"))
+# Account limits; see https://platform.openai.com/account/limits
+EMBED_RPM = float(os.getenv("OPENAI_EMBED_RPM", "3000"))
+EMBED_TPM = float(os.getenv("OPENAI_EMBED_TPM", "1000000"))
+EMBED_RETRIES = int(os.getenv("OPENAI_EMBED_RETRIES", "6"))
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model=EMBED_MODEL):
+    """tiktoken encoding of 'model' (cl100k_base for the OpenAI embedding models)."""
+    import tiktoken
+
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def token_length(text, model=EMBED_MODEL):
+    """
+    Tokens of 'text' for 'model'. Pass it as a text splitter's
+    length_function so chunk_size is measured in tokens.
+    """
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def pack_batches(token_counts, max_tokens=EMBED_BATCH_TOKENS, max_items=EMBED_BATCH_ITEMS):
+    """
+    Split positions 0..n-1 into consecutive (start, stop) ranges whose token
+    counts sum to at most 'max_tokens' (a single larger item gets its own
+    batch) with at most 'max_items' items each.
+    """
+    batches = []
+    start, tokens = 0, 0
+    for i, count in enumerate(token_counts):
+        if i > start and (tokens + count > max_tokens or i - start >= max_items):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += count
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+class TokenRateLimiter:
+    """
+    Two token buckets shared by threads: requests per minute and tokens per
+    minute. acquire(tokens) blocks until both allow the request.
+    """
+
+    def __init__(self, rpm=EMBED_RPM, tpm=EMBED_TPM):
+        self.rates = (rpm / 60.0, tpm / 60.0)
+        self.capacity = [max(1.0, rpm / 60.0), max(1.0, tpm / 60.0)]
+        self.available = list(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens):
+        need = (1.0, float(tokens))
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                for i, rate in enumerate(self.rates):
+                    # A request larger than one second's budget may borrow ahead
+                    self.capacity[i] = max(self.capacity[i], need[i])
+                    self.available[i] = min(self.capacity[i], self.available[i] + (now - self.updated) * rate)
+                self.updated = now
+                if all(self.available[i] >= need[i] for i in range(2)):
+                    for i in range(2):
+                        self.available[i] -= need[i]
+                    return
+                wait = max((need[i] - self.available[i]) / rate
+                           for i, rate in enumerate(self.rates) if self.available[i] < need[i])
+            time.sleep(wait)
+
+
+def _is_retryable(exc):
+    """Rate limits, timeouts, connection errors and 5xx from the OpenAI client."""
+    import openai
+
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                        openai.InternalServerError)):
+        return True
+    return isinstance(exc, openai.APIStatusError) and exc.status_code >= 500
+
+
+class BatchedEmbeddings(Embeddings):
+    """
+    OpenAI embeddings with token-budget batching, concurrent requests, rate
+    limiting and retries. A drop-in LangChain Embeddings (FAISS.from_documents,
+    CachedEmbeddings, helpers/pdf_pipeline.py).
+    """
+
+    def __init__(self, model=EMBED_MODEL, client=None, max_batch_tokens=EMBED_BATCH_TOKENS,
+                 max_batch_items=EMBED_BATCH_ITEMS, concurrency=EMBED_CONCURRENCY,
+                 limiter=None, retries=EMBED_RETRIES):
+        self.model = model
+        self._client = client
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self.concurrency = concurrency
+        self.limiter = limiter if limiter is not None else TokenRateLimiter()
+        self.retries = retries
+        self.stats = {"requests": 0, "retries": 0, "tokens": 0, "truncated": 0}
+        self._stats_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        return self._client
+
+    def _count(self, **deltas):
+        with self._stats_lock:
+            for name, value in deltas.items():
+                self.stats[name] += value
+
+    def _prepare(self, texts):
+        """Token ids per text, truncated to the model's input limit."""
+        encoding = get_encoding(self.model)
+        inputs = []
+        for text in texts:
+            # Newlines hurt embedding quality for older models (OpenAI guidance)
+            tokens = encoding.encode(text.replace("\n", " "), disallowed_special=())
+            if len(tokens) > EMBED_MAX_INPUT_TOKENS:
+                tokens = tokens[:EMBED_MAX_INPUT_TOKENS]
+                self._count(truncated=1)
+            inputs.append(tokens)
+        return inputs
+
+    def _request(self, batch):
+        tokens = sum(len(t) for t in batch)
+        for attempt in range(self.retries + 1):
+            self.limiter.acquire(tokens)
+            try:
+                response = self.client.embeddings.create(model=self.model, input=batch)
+                self._count(requests=1, tokens=tokens)
+                return [d.embedding for d in sorted(response.data, key=lambda d: d.index)]
+            except Exception as e:
+                if attempt == self.retries or not _is_retryable(e):
+                    raise
+                self._count(retries=1)
+                # Jittered exponential backoff, capped at a minute
+                time.sleep(random.uniform(0, min(60.0, 0.5 * 2 ** attempt)))
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        inputs = self._prepare(texts)
+        batches = pack_batches([len(t) for t in inputs], self.max_batch_tokens, self.max_batch_items)
+        vectors = [None] * len(texts)
+
+        def run(bounds):
+            start, stop = bounds
+            vectors[start:stop] = self._request(inputs[start:stop])
+
+        if len(batches) == 1:
+            run(batches[0])
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+                # list() re-raises the first failed batch
+                list(executor.map(run, batches))
+        return vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
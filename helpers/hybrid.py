@@ -0,0 +1,99 @@
+# helpers/hybrid.py
+
+import os
+import threading
+from typing import Any, List
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, Field, PrivateAttr
+
+# Hybrid retrieval: BM25 keyword hits (helpers/bm25.py) and FAISS vector hits
+# merged with reciprocal-rank fusion, score(d) = sum 1 / (RRF_K + rank).
+# RRF only uses ranks, so BM25 and vector scores never need calibrating
+# against each other.
+#
+# Modes:
+#   "hybrid"   both, fused
+#   "vector"   FAISS only (as_retriever)
+#   "lexical"  BM25 only: no embedding call at all
+#   "auto"     lexical for keyword queries (at most LEXICAL_MAX_TERMS terms,
+#              all of them in the index vocabulary), hybrid otherwise
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+LEXICAL_MAX_TERMS = int(os.getenv("RAG_LEXICAL_MAX_TERMS", "3"))
+MODES = ("auto", "hybrid", "vector", "lexical")
+
+
+def reciprocal_rank_fusion(rankings, rrf_k=RRF_K):
+    """Ids from several best-first rankings, ordered by fused RRF score."""
+    scores = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item] = scores.get(item, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    LangChain retriever over a FAISS vectorstore and its BM25 index:
+
+        retriever = HybridRetriever(vectorstore=vectorstore, bm25=load_bm25(path), k=5)
+        chain = {"context": retriever, "question": RunnablePassthrough()} | prompt | model
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: Any
+    bm25: Any
+    k: int = 5
+    # Candidates taken from each ranking before fusion
+    fetch_k: int = 20
+    mode: str = "auto"
+    rrf_k: int = RRF_K
+    lexical_max_terms: int = LEXICAL_MAX_TERMS
+    stats: dict = Field(default_factory=lambda: {"lexical": 0, "hybrid": 0, "vector": 0})
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def choose_mode(self, query):
+        """The mode 'query' runs in; resolves "auto"."""
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown retrieval mode {self.mode!r}; expected one of {MODES}")
+        if self.mode != "auto":
+            return self.mode
+        return "lexical" if self.bm25.covers(query, self.lexical_max_terms) else "hybrid"
+
+    def lexical_positions(self, query, k):
+        return self.bm25.search(query, k)[0].tolist()
+
+    def vector_positions(self, query, k):
+        import faiss
+
+        vector = np.asarray([self.vectorstore.embeddings.embed_query(query)], dtype=np.float32)
+        if getattr(self.vectorstore, "_normalize_L2", False):
+            faiss.normalize_L2(vector)
+        _, ids = self.vectorstore.index.search(vector, k)
+        return [int(i) for i in ids[0] if i >= 0]
+
+    def documents(self, positions):
+        docstore, ids = self.vectorstore.docstore, self.vectorstore.index_to_docstore_id
+        return [docstore.search(ids[p]) for p in positions]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        mode = self.choose_mode(query)
+        with self._lock:
+            self.stats[mode] += 1
+        if mode == "lexical":
+            positions = self.lexical_positions(query, self.k)
+            if not positions and self.mode == "auto":
+                # Nothing matched the keywords after all; fall back to vectors
+                positions = self.vector_positions(query, self.k)
+        elif mode == "vector":
+            positions = self.vector_positions(query, self.k)
+        else:
+            positions = reciprocal_rank_fusion(
+                [self.lexical_positions(query, self.fetch_k), self.vector_positions(query, self.fetch_k)],
+                self.rrf_k,
+            )[:self.k]
+        return self.documents(positions)
@@ -0,0 +1,500 @@
+# helpers/incremental.py
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import warnings
+import contextlib
+import numpy as np
+
+from helpers.bm25 import BM25Index
+from helpers.embedding_cache import EMBEDDING_CACHE_PATH, CachedEmbeddings, EmbeddingCache, content_hash
+from helpers.index_store import (KEEP_VERSIONS, IndexWriter, PositionIds, SQLiteDocstore, current_version,
+                                 publish_version, read_index_mmap)
+from helpers.ingest import DEFAULT_SPLITTER, ChunkCache, file_hash, load_chunks
+from helpers.pdf_pipeline import EMBED_BATCH_SIZE
+from helpers.quantize import INDEX_STORAGE, RescoredIndex, flat_vectors, load_exact
+
+# Incremental index over a changing set of PDFs. Instead of one FAISS index
+# rebuilt from scratch, the index is a list of immutable segments (each an
+# index of helpers/index_store.py, with its own docstore and BM25) plus a
+# manifest:
+#
+#   <path>/segments/<segment>/...        written once by IndexWriter
+#   <path>/manifests/m<time>.json        live segments, tombstones, and per
+#                                        source file its content hash and
+#                                        where each of its chunks lives
+#   <path>/manifests/CURRENT             the manifest readers load
+#
+# sync() hashes every file; an unchanged file costs nothing. A changed file
+# is re-chunked, chunks already indexed are kept, only new chunks are
+# embedded (through the embedding cache) and written to one new segment,
+# and chunks that disappeared are tombstoned: hidden from searches, still on
+# disk. The new manifest is published with an atomic rename, so readers see
+# either the old or the new index, never a partial one. When tombstones pass
+# COMPACT_DEAD_FRACTION of the rows, or there are more than
+# COMPACT_MAX_SEGMENTS segments, the live rows are copied into a single new
+# segment (compaction). Updating one PDF therefore costs time proportional
+# to that PDF, plus the occasional compaction.
+COMPACT_DEAD_FRACTION = float(os.getenv("RAG_COMPACT_DEAD_FRACTION", "0.2"))
+COMPACT_MAX_SEGMENTS = int(os.getenv("RAG_COMPACT_MAX_SEGMENTS", "8"))
+MANIFEST_FORMAT = 1
+
+
+def chunk_key(document, occurrence=0):
+    """
+    Identity of a chunk: hash of its text and metadata (and repeat count).
+    Metadata counts, so chunks whose page number shifted are re-inserted,
+    but their embeddings still come from the cache.
+    """
+    payload = document.page_content + "\0" + json.dumps(document.metadata, sort_keys=True)
+    return f"{content_hash(payload)[:32]}:{occurrence}"
+
+
+def _manifest_dir(path):
+    return os.path.join(path, "manifests")
+
+
+def _segment_path(path, segment):
+    return os.path.join(path, "segments", segment)
+
+
+def read_manifest(path):
+    """The current manifest of the incremental index at 'path', or None."""
+    manifest_file = current_version(_manifest_dir(path))
+    if manifest_file is None:
+        return None
+    with open(manifest_file) as f:
+        return json.load(f)
+
+
+def _open_segment(segment_dir, mmap=True, rescore=True):
+    """(faiss index, docstore, meta) of the current version of one segment."""
+    import faiss
+
+    version_dir = current_version(segment_dir)
+    with open(os.path.join(version_dir, "meta.json")) as f:
+        meta = json.load(f)
+    index_file = os.path.join(version_dir, "index.faiss")
+    index = read_index_mmap(index_file) if mmap else faiss.read_index(index_file)
+    if rescore and meta.get("exact_vectors"):
+        index = RescoredIndex(index, load_exact(os.path.join(version_dir, meta["exact_vectors"])))
+    return index, SQLiteDocstore(os.path.join(version_dir, "docstore.sqlite3")), meta
+
+
+def _segment_vectors(segment_dir):
+    """
+    (float32 vectors, owner) of a segment for compaction, from the exact copy
+    if one was kept. Keep 'owner' alive while using the vectors: a flat
+    index's vectors are a view into it.
+    """
+    version_dir = current_version(segment_dir)
+    with open(os.path.join(version_dir, "meta.json")) as f:
+        meta = json.load(f)
+    if meta.get("exact_vectors"):
+        return load_exact(os.path.join(version_dir, meta["exact_vectors"])), None
+    index = read_index_mmap(os.path.join(version_dir, "index.faiss"))
+    if meta.get("storage", "float32") == "float32":
+        return flat_vectors(index), index
+    warnings.warn(f"{segment_dir} kept no exact vectors; compacting its decoded {meta['storage']} vectors",
+                  stacklevel=2)
+    return index.reconstruct_n(0, index.ntotal), None
+
+
+def _lock_file(f):
+    """Block until this process holds the exclusive lock on open file 'f' (POSIX or Windows)."""
+    if os.name == "nt":
+        import msvcrt
+
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after ~10 s; keep waiting
+                continue
+    import fcntl
+
+    fcntl.flock(f, fcntl.LOCK_EX)
+
+
+def _unlock_file(f):
+    if os.name == "nt":
+        import msvcrt
+
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    import fcntl
+
+    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class IncrementalIndex:
+    """
+    Keeps an index at 'path' in step with a set of PDFs:
+
+        index = IncrementalIndex(index_path("environmental_sci"), OpenAIEmbeddings(api_key=api_key))
+        index.sync(["environmental_sci.pdf", "climate.pdf"])   # after any file changes
+        vectorstore = load_incremental(index.path, embeddings)
+
+    One writer at a time (a lock file guards updates); any number of readers.
+    """
+
+    def __init__(self, path, embeddings, chunk_size=2000, chunk_overlap=100, storage=INDEX_STORAGE,
+                 distance_strategy="EUCLIDEAN_DISTANCE", cache_path=EMBEDDING_CACHE_PATH,
+                 batch_size=EMBED_BATCH_SIZE):
+        self.path = path
+        self.embedder = CachedEmbeddings(embeddings, cache=EmbeddingCache(cache_path))
+        self.chunk_cache = ChunkCache(cache_path)
+        self.settings = dict(DEFAULT_SPLITTER, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.storage = storage
+        self.distance_strategy = distance_strategy
+        self.batch_size = batch_size
+        os.makedirs(_manifest_dir(path), exist_ok=True)
+        os.makedirs(os.path.join(path, "segments"), exist_ok=True)
+
+    @contextlib.contextmanager
+    def _lock(self):
+        with open(os.path.join(self.path, ".lock"), "a+") as f:
+            _lock_file(f)
+            try:
+                yield
+            finally:
+                _unlock_file(f)
+
+    def _empty_manifest(self):
+        return {
+            "format": MANIFEST_FORMAT,
+            "segments": [],
+            "tombstones": {},
+            "sources": {},
+            "settings": dict(self.settings, storage=self.storage, distance_strategy=self.distance_strategy),
+        }
+
+    def _new_writer(self):
+        segment = f"s{time.time_ns()}"
+        writer = IndexWriter(_segment_path(self.path, segment), distance_strategy=self.distance_strategy,
+                             storage=self.storage)
+        return segment, writer
+
+    def _add_chunks(self, writer, chunks):
+        """Embed and append (key, Document) pairs; returns their positions in the segment."""
+        positions = []
+        for start in range(0, len(chunks), self.batch_size):
+            batch = [doc for _, doc in chunks[start:start + self.batch_size]]
+            vectors = np.asarray(self.embedder.embed_documents([d.page_content for d in batch]), dtype=np.float32)
+            positions.extend(range(writer.count, writer.count + len(batch)))
+            writer.add(vectors, batch)
+        return positions
+
+    def sync(self, pdf_paths, remove_missing=True):
+        """
+        Bring the index in line with 'pdf_paths': add new files, re-index
+        changed ones and, if remove_missing, drop indexed files not listed.
+        Returns a report dict.
+        """
+        return self._update(pdf_paths, remove=None if remove_missing else ())
+
+    def update(self, pdf_paths):
+        """Add or re-index 'pdf_paths', leaving other indexed files alone."""
+        return self._update(pdf_paths, remove=())
+
+    def remove(self, pdf_paths):
+        """Drop 'pdf_paths' from the index."""
+        return self._update((), remove=[os.path.abspath(p) for p in pdf_paths])
+
+    def compact(self):
+        """Rewrite the live rows into a single segment now."""
+        with self._lock():
+            manifest = read_manifest(self.path)
+            if manifest is None:
+                return None
+            self._compact(manifest)
+            self._publish(manifest)
+            return manifest
+
+    def _update(self, pdf_paths, remove):
+        start = time.monotonic()
+        stats_before = dict(self.embedder.stats)
+        report = {"files_unchanged": 0, "files_indexed": 0, "files_removed": 0,
+                  "chunks_kept": 0, "chunks_added": 0, "chunks_deleted": 0, "compacted": False}
+        with self._lock():
+            manifest = read_manifest(self.path) or self._empty_manifest()
+            sources, tombstones = manifest["sources"], manifest["tombstones"]
+            wanted = {os.path.abspath(p): p for p in pdf_paths}
+
+            def bury(locations):
+                for segment, position in locations:
+                    tombstones.setdefault(segment, []).append(position)
+                report["chunks_deleted"] += len(locations)
+
+            # remove=None drops every indexed file not in pdf_paths
+            for key in list(sources):
+                if (key not in wanted) if remove is None else (key in remove):
+                    bury(sources.pop(key)["chunks"].values())
+                    report["files_removed"] += 1
+
+            segment, writer = None, None
+            try:
+                for key, pdf_path in wanted.items():
+                    digest = file_hash(pdf_path)
+                    old = sources.get(key)
+                    if old is not None and old["hash"] == digest:
+                        report["files_unchanged"] += 1
+                        continue
+                    old_chunks = old["chunks"] if old is not None else {}
+                    kept, new, seen = {}, [], {}
+                    for doc in load_chunks(pdf_path, chunk_cache=self.chunk_cache, **self.settings):
+                        base = chunk_key(doc)
+                        ck = chunk_key(doc, seen.get(base, 0))
+                        seen[base] = seen.get(base, 0) + 1
+                        if ck in old_chunks:
+                            kept[ck] = old_chunks[ck]
+                        else:
+                            new.append((ck, doc))
+                    bury([loc for ck, loc in old_chunks.items() if ck not in kept])
+                    if new:
+                        if writer is None:
+                            segment, writer = self._new_writer()
+                        for (ck, _), position in zip(new, self._add_chunks(writer, new)):
+                            kept[ck] = [segment, position]
+                    sources[key] = {"hash": digest, "path": pdf_path, "chunks": kept}
+                    report["files_indexed"] += 1
+                    report["chunks_added"] += len(new)
+                    report["chunks_kept"] += len(kept) - len(new)
+                if writer is not None:
+                    writer.commit({"segment": segment})
+                    manifest["segments"].append({"name": segment, "count": writer.count})
+            except BaseException:
+                if writer is not None:
+                    writer.abort()
+                    shutil.rmtree(_segment_path(self.path, segment), ignore_errors=True)
+                raise
+
+            if report["files_indexed"] or report["files_removed"]:
+                total = sum(s["count"] for s in manifest["segments"])
+                dead = sum(len(t) for t in tombstones.values())
+                if (total and dead / total > COMPACT_DEAD_FRACTION) or len(manifest["segments"]) > COMPACT_MAX_SEGMENTS:
+                    self._compact(manifest)
+                    report["compacted"] = True
+                self._publish(manifest)
+
+        report.update(
+            embedded=self.embedder.stats["embedded"] - stats_before["embedded"],
+            cached=self.embedder.stats["hits"] - stats_before["hits"],
+            seconds=time.monotonic() - start,
+        )
+        return report
+
+    def _compact(self, manifest):
+        """Copy every live row into one new segment and point the manifest at it."""
+        from langchain_core.documents import Document
+
+        tombstones = manifest["tombstones"]
+        relocated = {}
+        segment, writer = self._new_writer()
+        try:
+            for entry in manifest["segments"]:
+                segment_dir = _segment_path(self.path, entry["name"])
+                dead = set(tombstones.get(entry["name"], ()))
+                live = [p for p in range(entry["count"]) if p not in dead]
+                vectors, owner = _segment_vectors(segment_dir)
+                db = sqlite3.connect(f"file:{os.path.join(current_version(segment_dir), 'docstore.sqlite3')}?mode=ro",
+                                     uri=True)
+                try:
+                    for start in range(0, len(live), 1000):
+                        batch = live[start:start + 1000]
+                        rows = db.execute(
+                            f"SELECT position, page_content, metadata FROM docs WHERE position IN "
+                            f"({','.join('?' * len(batch))}) ORDER BY position", batch
+                        ).fetchall()
+                        for (position, _, _), new_position in zip(rows, range(writer.count, writer.count + len(rows))):
+                            relocated[(entry["name"], position)] = new_position
+                        writer.add(np.asarray(vectors[[r[0] for r in rows]], dtype=np.float32),
+                                   [Document(page_content=r[1], metadata=json.loads(r[2])) for r in rows])
+                finally:
+                    db.close()
+                    del vectors, owner
+            if writer.count:
+                writer.commit({"segment": segment, "compacted": True})
+            else:
+                writer.abort()
+        except BaseException:
+            writer.abort()
+            shutil.rmtree(_segment_path(self.path, segment), ignore_errors=True)
+            raise
+
+        for source in manifest["sources"].values():
+            source["chunks"] = {ck: [segment, relocated[(seg, pos)]] for ck, (seg, pos) in source["chunks"].items()}
+        manifest["segments"] = [{"name": segment, "count": writer.count}] if writer.count else []
+        manifest["tombstones"] = {}
+
+    def _publish(self, manifest):
+        """Write 'manifest' as a new version, make it current, then drop unreferenced files."""
+        manifest_dir = _manifest_dir(self.path)
+        name = f"m{time.time_ns()}.json"
+        manifest["created_at"] = time.time()
+        tmp = os.path.join(manifest_dir, f"{name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(manifest_dir, name))
+        publish_version(manifest_dir, name)
+
+        # Readers may still be on the last few manifests; keep their segments
+        names = sorted(n for n in os.listdir(manifest_dir) if n.startswith("m") and n.endswith(".json"))
+        keep, drop = names[-max(KEEP_VERSIONS, 1):], names[:-max(KEEP_VERSIONS, 1)]
+        referenced = set()
+        for kept in keep:
+            with open(os.path.join(manifest_dir, kept)) as f:
+                referenced.update(s["name"] for s in json.load(f)["segments"])
+        for old in drop:
+            os.remove(os.path.join(manifest_dir, old))
+        segments_dir = os.path.join(self.path, "segments")
+        for segment in os.listdir(segments_dir):
+            if segment not in referenced:
+                shutil.rmtree(os.path.join(segments_dir, segment), ignore_errors=True)
+
+
+class SegmentedIndex:
+    """
+    The segments of a manifest searched as one faiss index: positions are
+    numbered segment after segment, tombstoned rows never come back.
+    """
+
+    def __init__(self, indexes, counts, dead, metric_type):
+        self.indexes = indexes
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+        self.dead = [np.asarray(sorted(d), dtype=np.int64) for d in dead]
+        self.metric_type = metric_type
+        self.d = indexes[0].d if indexes else 0
+
+    @property
+    def ntotal(self):
+        return int(self.offsets[-1])
+
+    def search(self, queries, k):
+        import faiss
+
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        inner = self.metric_type == faiss.METRIC_INNER_PRODUCT
+        all_distances, all_ids = [], []
+        for index, offset, dead in zip(self.indexes, self.offsets, self.dead):
+            # Enough candidates that k live ones remain after dropping the dead
+            fetch = min(index.ntotal, k + len(dead))
+            if fetch <= 0:
+                continue
+            distances, ids = index.search(queries, fetch)
+            hidden = (ids < 0) | np.isin(ids, dead)
+            distances = np.where(hidden, -np.inf if inner else np.inf, distances)
+            all_distances.append(distances)
+            all_ids.append(np.where(hidden, -1, ids + offset))
+        if not all_distances:
+            return (np.full((len(queries), k), np.inf, dtype=np.float32),
+                    np.full((len(queries), k), -1, dtype=np.int64))
+        distances, ids = np.hstack(all_distances), np.hstack(all_ids)
+        order = np.argsort(-distances if inner else distances, axis=1, kind="stable")[:, :k]
+        distances = np.take_along_axis(distances, order, axis=1)
+        ids = np.take_along_axis(ids, order, axis=1)
+        if ids.shape[1] < k:
+            pad = k - ids.shape[1]
+            distances = np.pad(distances, ((0, 0), (0, pad)), constant_values=-np.inf if inner else np.inf)
+            ids = np.pad(ids, ((0, 0), (0, pad)), constant_values=-1)
+        return distances, ids
+
+    def _locate(self, position):
+        segment = int(np.searchsorted(self.offsets, position, side="right")) - 1
+        return segment, int(position - self.offsets[segment])
+
+    def reconstruct(self, position):
+        segment, local = self._locate(int(position))
+        return self.indexes[segment].reconstruct(local)
+
+
+class SegmentedDocstore(SQLiteDocstore):
+    """Read-only docstore over every segment; ids are global positions."""
+
+    def __init__(self, docstores, offsets):
+        self.docstores = docstores
+        self.offsets = offsets
+
+    def search(self, search):
+        position = int(search)
+        segment = int(np.searchsorted(self.offsets, position, side="right")) - 1
+        if not 0 <= segment < len(self.docstores):
+            return f"ID {search} not found."
+        return self.docstores[segment].search(position - int(self.offsets[segment]))
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+
+class SegmentedBM25:
+    """BM25 over every segment (helpers/bm25.py interface), without tombstoned rows."""
+
+    def __init__(self, indexes, offsets, dead):
+        self.indexes = indexes
+        self.offsets = offsets
+        self.dead = [set(d) for d in dead]
+
+    def covers(self, query, max_terms):
+        from helpers.bm25 import tokenize
+
+        tokens = set(tokenize(query))
+        return 0 < len(tokens) <= max_terms and all(any(t in b.term_ids for b in self.indexes) for t in tokens)
+
+    def search(self, query, k=10):
+        # Term statistics are per segment; compaction brings them back to one
+        hits = []
+        for bm25, offset, dead in zip(self.indexes, self.offsets, self.dead):
+            positions, scores = bm25.search(query, k + len(dead))
+            hits.extend((float(s), int(p) + int(offset)) for p, s in zip(positions, scores) if int(p) not in dead)
+        hits.sort(key=lambda hit: -hit[0])
+        hits = hits[:k]
+        return (np.array([p for _, p in hits], dtype=np.int64), np.array([s for s, _ in hits], dtype=np.float32))
+
+
+def _live_segments(path, manifest):
+    for entry in manifest["segments"]:
+        yield entry, _segment_path(path, entry["name"]), manifest["tombstones"].get(entry["name"], [])
+
+
+def load_incremental(path, embeddings, mmap=True, rescore=True):
+    """LangChain FAISS vectorstore over the current manifest of the incremental index at 'path'."""
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No incremental index at {path}")
+    indexes, docstores, counts, dead = [], [], [], []
+    for entry, segment_dir, tombstones in _live_segments(path, manifest):
+        index, docstore, _ = _open_segment(segment_dir, mmap, rescore)
+        indexes.append(index)
+        docstores.append(docstore)
+        counts.append(entry["count"])
+        dead.append(tombstones)
+    strategy = DistanceStrategy(manifest["settings"]["distance_strategy"])
+    metric = faiss.METRIC_INNER_PRODUCT if strategy == DistanceStrategy.MAX_INNER_PRODUCT else faiss.METRIC_L2
+    index = SegmentedIndex(indexes, counts, dead, metric)
+    return FAISS(embeddings, index, SegmentedDocstore(docstores, index.offsets), PositionIds(index.ntotal),
+                 distance_strategy=strategy)
+
+
+def load_incremental_bm25(path):
+    """Keyword index matching load_incremental(path, ...), for helpers/hybrid.py."""
+    manifest = read_manifest(path)
+    if manifest is None:
+        raise FileNotFoundError(f"No incremental index at {path}")
+    indexes, counts, dead = [], [], []
+    for entry, segment_dir, tombstones in _live_segments(path, manifest):
+        indexes.append(BM25Index.load(current_version(segment_dir)))
+        counts.append(entry["count"])
+        dead.append(tombstones)
+    return SegmentedBM25(indexes, np.concatenate(([0], np.cumsum(counts))).astype(np.int64), dead)
@@ -0,0 +1,358 @@
+# helpers/index_store.py
+
+import os
+import json
+import time
+import shutil
+import sqlite3
+import threading
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+
+from helpers.bm25 import BM25_FILE, BM25Builder, BM25Index
+from helpers.embedding_cache import RAG_CACHE_DIR
+from helpers.quantize import INDEX_STORAGE, EXACT_VECTORS_FILE, RescoredIndex, effective_storage, flat_vectors, \
+    load_exact, quantized_index, save_exact
+
+# Persistent FAISS indexes for serving. A build writes, once:
+#   <path>/<version>/index.faiss      the FAISS index
+#   <path>/<version>/docstore.sqlite3 chunk text + metadata by vector position
+#   <path>/<version>/bm25.npz         keyword index of the chunks (helpers/bm25.py)
+#   <path>/<version>/meta.json        dimension, count, distance settings, ...
+# and then points <path>/CURRENT at the new version with an atomic rename, so
+# a reader never sees a half-written index.
+#
+# load_index() maps index.faiss into memory instead of reading it: startup
+# does not deserialize the vectors, and worker processes on one host share
+# the same page-cache pages. Documents are fetched from SQLite only for the
+# hits of a search.
+#
+# The vectors can be stored compressed (storage="float16", "int8" or "pq",
+# see helpers/quantize.py). The float32 vectors are then also written to
+# vectors.npy and, by default, used to re-score the top candidates.
+INDEX_DIR = os.getenv("RAG_INDEX_DIR", os.path.join(RAG_CACHE_DIR, "indexes"))
+# Older versions are deleted after a build; keep a few for readers still on them
+KEEP_VERSIONS = int(os.getenv("RAG_INDEX_KEEP_VERSIONS", "2"))
+FORMAT_VERSION = 1
+
+
+def index_path(name):
+    """Directory of the index called 'name' under INDEX_DIR."""
+    return os.path.join(INDEX_DIR, name)
+
+
+def current_version(path):
+    """Directory of the version CURRENT points at, or None if never built."""
+    try:
+        with open(os.path.join(path, "CURRENT")) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(path, version) if version else None
+
+
+def publish_version(path, version):
+    """Atomically make 'version' the one readers load."""
+    tmp = os.path.join(path, f"CURRENT.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, os.path.join(path, "CURRENT"))
+
+
+def prune_versions(path, keep=KEEP_VERSIONS):
+    """Delete all but the 'keep' newest versions under 'path'."""
+    versions = sorted(d for d in os.listdir(path) if d.startswith("v") and os.path.isdir(os.path.join(path, d)))
+    for old in versions[:-keep] if keep > 0 else versions:
+        shutil.rmtree(os.path.join(path, old), ignore_errors=True)
+
+
+def new_version(path):
+    """Create an empty version directory under 'path'; returns its name."""
+    version = f"v{time.time_ns()}"
+    os.makedirs(os.path.join(path, version))
+    return version
+
+
+class IndexWriter:
+    """
+    Builds a new version of the index at 'path' batch by batch, so a caller
+    never holds more than one batch of chunks:
+
+        writer = IndexWriter(path)
+        writer.add(vectors, documents)   # repeatedly
+        writer.commit()                  # publish; or writer.abort()
+
+    Only the FAISS vectors stay in memory until commit; documents go
+    straight to the version's SQLite docstore. With a compressed 'storage'
+    the index is quantized at commit; keep_exact=False skips writing the
+    float32 vectors used for re-scoring.
+    """
+
+    def __init__(self, path, distance_strategy="EUCLIDEAN_DISTANCE", normalize_L2=False,
+                 storage=INDEX_STORAGE, keep_exact=True):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.version = new_version(path)
+        self.version_dir = os.path.join(path, self.version)
+        self.distance_strategy = distance_strategy
+        self.normalize_L2 = normalize_L2
+        self.storage = storage
+        self.keep_exact = keep_exact
+        self.index = None
+        # Spills its postings into the version directory every BM25_SPILL_POSTINGS
+        self.bm25 = BM25Builder(spill_dir=self.version_dir)
+        self._conn = sqlite3.connect(os.path.join(self.version_dir, "docstore.sqlite3"))
+        self._conn.execute(
+            "CREATE TABLE docs (position INTEGER PRIMARY KEY, id TEXT, page_content TEXT, metadata TEXT)"
+        )
+
+    @property
+    def count(self):
+        return self.index.ntotal if self.index is not None else 0
+
+    def add(self, vectors, documents, ids=None):
+        """Append float32 'vectors' (n x d) and their n Documents."""
+        import faiss
+        import numpy as np
+
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(vectors):
+            return
+        if self.index is None:
+            # Same index type LangChain's FAISS.from_documents picks
+            inner = self.distance_strategy == "MAX_INNER_PRODUCT"
+            self.index = faiss.IndexFlatIP(vectors.shape[1]) if inner else faiss.IndexFlatL2(vectors.shape[1])
+        if self.normalize_L2:
+            faiss.normalize_L2(vectors)
+        start = self.count
+        ids = ids if ids is not None else [str(start + i) for i in range(len(documents))]
+        for i, doc in enumerate(documents):
+            self.bm25.add(start + i, doc.page_content)
+        self._conn.executemany(
+            "INSERT INTO docs VALUES (?, ?, ?, ?)",
+            ((start + i, str(doc_id), doc.page_content, json.dumps(doc.metadata))
+             for i, (doc_id, doc) in enumerate(zip(ids, documents)))
+        )
+        self.index.add(vectors)
+
+    def add_index(self, index, documents_by_position):
+        """Take over a ready FAISS index; documents_by_position yields (id, Document) in order."""
+        self.index = index
+        rows = []
+        for pos, (doc_id, doc) in enumerate(documents_by_position):
+            self.bm25.add(pos, doc.page_content)
+            rows.append((pos, str(doc_id), doc.page_content, json.dumps(doc.metadata)))
+            if len(rows) == 1000:
+                self._conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+                rows = []
+        self._conn.executemany("INSERT INTO docs VALUES (?, ?, ?, ?)", rows)
+
+    def commit(self, extra_meta=None):
+        """Write the index and metadata, then publish this version. Returns its directory."""
+        import faiss
+
+        if self.index is None:
+            self.abort()
+            raise ValueError("Nothing was added to the index")
+        self._conn.commit()
+        self._conn.close()
+        index, exact_file = self.index, None
+        storage = effective_storage(self.storage, self.index.ntotal)
+        if storage != "float32":
+            if not isinstance(faiss.downcast_index(self.index), faiss.IndexFlat):
+                self.abort()
+                raise ValueError(f"Only flat indexes can be stored as {storage}")
+            vectors = flat_vectors(self.index)
+            if self.keep_exact:
+                exact_file = EXACT_VECTORS_FILE
+                save_exact(os.path.join(self.version_dir, exact_file), vectors)
+            index = quantized_index(vectors, storage, self.index.metric_type)
+        faiss.write_index(index, os.path.join(self.version_dir, "index.faiss"))
+        self.bm25.build().save(self.version_dir)
+        meta = {
+            "format": FORMAT_VERSION,
+            "dim": self.index.d,
+            "count": self.index.ntotal,
+            "distance_strategy": self.distance_strategy,
+            "normalize_L2": self.normalize_L2,
+            # What was written: "pq" may have fallen back to "int8"
+            "storage": storage,
+            "exact_vectors": exact_file,
+            "bm25": BM25_FILE,
+            "created_at": time.time(),
+            **(extra_meta or {}),
+        }
+        with open(os.path.join(self.version_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+        publish_version(self.path, self.version)
+        prune_versions(self.path)
+        return self.version_dir
+
+    def abort(self):
+        """Drop the unpublished version."""
+        self._conn.close()
+        shutil.rmtree(self.version_dir, ignore_errors=True)
+
+
+def save_index(vectorstore, path, extra_meta=None, storage=INDEX_STORAGE):
+    """
+    Write a LangChain FAISS vectorstore as a new version of the index at
+    'path' and publish it, with its vectors in 'storage' (see
+    helpers/quantize.py). Returns the version directory.
+    """
+    writer = IndexWriter(
+        path,
+        distance_strategy=str(getattr(vectorstore.distance_strategy, "value", vectorstore.distance_strategy)),
+        normalize_L2=bool(getattr(vectorstore, "_normalize_L2", False)),
+        storage=storage,
+    )
+
+    def documents():
+        for pos in range(vectorstore.index.ntotal):
+            doc_id = vectorstore.index_to_docstore_id[pos]
+            yield doc_id, vectorstore.docstore.search(doc_id)
+    writer.add_index(vectorstore.index, documents())
+    return writer.commit(extra_meta)
+
+
+class SQLiteDocstore(Docstore):
+    """
+    Read-only docstore over docstore.sqlite3; ids are vector positions.
+
+    The file is opened when the docstore is created and that one connection
+    serves every thread, so a long-running reader keeps its version readable
+    after newer builds prune its directory (the open descriptor keeps the
+    deleted file alive). A forked process reopens it by path.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._pid = None
+        self._connection = None
+        self._conn()
+
+    def _conn(self):
+        # Never reuse a connection across fork
+        if self._connection is None or self._pid != os.getpid():
+            conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            # Map the file too, so its pages are shared like the index's
+            conn.execute("PRAGMA mmap_size=268435456")
+            # Touch the schema now: SQLite opens the file lazily
+            conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            self._connection = conn
+            self._pid = os.getpid()
+        return self._connection
+
+    def search(self, search):
+        with self._lock:
+            row = self._conn().execute(
+                "SELECT page_content, metadata FROM docs WHERE position = ?", (int(search),)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def add(self, texts):
+        raise NotImplementedError("SQLiteDocstore is read-only; rebuild the index to add documents")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn().execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+
+class PositionIds:
+    """index_to_docstore_id for a SQLiteDocstore: position i -> i, no dict of N ids."""
+
+    def __init__(self, count):
+        self.count = count
+
+    def __getitem__(self, i):
+        i = int(i)  # faiss hands out numpy ints
+        if not 0 <= i < self.count:
+            raise KeyError(i)
+        return i
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(range(self.count))
+
+    def __contains__(self, i):
+        try:
+            return 0 <= int(i) < self.count
+        except (TypeError, ValueError):
+            return False
+
+    def get(self, i, default=None):
+        return int(i) if i in self else default
+
+    def values(self):
+        return range(self.count)
+
+
+def read_index_mmap(index_file):
+    """faiss.read_index with the vectors memory-mapped (read-only)."""
+    import faiss
+
+    # IO_FLAG_MMAP_IFC (faiss >= 1.8) also maps flat indexes; older builds
+    # only map IVF inverted lists
+    flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+    return faiss.read_index(index_file, flags)
+
+
+def load_index(path, embeddings, mmap=True, rescore=True):
+    """
+    LangChain FAISS vectorstore over the current version of the index at
+    'path', for similarity search. 'embeddings' embeds the queries and must be
+    the model the index was built with. A compressed index re-scores its top
+    candidates with the exact vectors unless rescore=False.
+    """
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from langchain_community.vectorstores.utils import DistanceStrategy
+
+    version_dir = current_version(path)
+    if version_dir is None:
+        raise FileNotFoundError(f"No index built at {path}")
+    with open(os.path.join(version_dir, "meta.json")) as f:
+        meta = json.load(f)
+
+    index_file = os.path.join(version_dir, "index.faiss")
+    index = read_index_mmap(index_file) if mmap else faiss.read_index(index_file)
+    if rescore and meta.get("exact_vectors"):
+        index = RescoredIndex(index, load_exact(os.path.join(version_dir, meta["exact_vectors"])))
+    return FAISS(
+        embeddings,
+        index,
+        SQLiteDocstore(os.path.join(version_dir, "docstore.sqlite3")),
+        PositionIds(meta["count"]),
+        normalize_L2=meta.get("normalize_L2", False),
+        distance_strategy=DistanceStrategy(meta.get("distance_strategy", DistanceStrategy.EUCLIDEAN_DISTANCE.value)),
+    )
+
+
+def load_bm25(path):
+    """The BM25 keyword index of the current version of the index at 'path'."""
+    version_dir = current_version(path)
+    if version_dir is None:
+        raise FileNotFoundError(f"No index built at {path}")
+    if not os.path.exists(os.path.join(version_dir, BM25_FILE)):
+        raise FileNotFoundError(f"{version_dir} has no keyword index; rebuild it to add one")
+    return BM25Index.load(version_dir)
+
+
+def build_index(name, pdf_paths, embeddings, **splitter):
+    """
+    Build step: chunk and embed 'pdf_paths' (see helpers/ingest.py) and save
+    the index as 'name'. Returns (path, report).
+    """
+    from helpers.ingest import build_vectorstore
+
+    vectorstore, report = build_vectorstore(pdf_paths, embeddings, **splitter)
+    path = index_path(name)
+    save_index(vectorstore, path, extra_meta={"sources": [os.path.basename(p) for p in pdf_paths]})
+    return path, report
@@ -0,0 +1,117 @@
+# helpers/ingest.py
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from helpers.embedding_cache import EMBEDDING_CACHE_PATH, EmbeddingCache, CachedEmbeddings
+
+# Reusable ingestion path of langchain-rag.ipynb: PDF -> chunks -> FAISS.
+#
+#     vectorstore, report = build_vectorstore(
+#         ["environmental_sci.pdf"], OpenAIEmbeddings(api_key=api_key),
+#         chunk_size=2000, chunk_overlap=100)
+#
+# Two caches make re-indexing an unchanged corpus cheap:
+#   - chunks per (file content hash, splitter settings), so an unchanged PDF
+#     is not parsed and split again
+#   - embeddings per (model, chunk text hash), see helpers/embedding_cache.py
+# Both live in the same SQLite file.
+DEFAULT_SPLITTER = {"chunk_size": 2000, "chunk_overlap": 100}
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def splitter_key(chunk_size, chunk_overlap, length_function=len):
+    """The splitter settings that change the chunks, as a string."""
+    return f"recursive:{chunk_size}:{chunk_overlap}:{getattr(length_function, '__name__', repr(length_function))}"
+
+
+class ChunkCache:
+    """Chunks of a file version under given splitter settings."""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn().execute("CREATE TABLE IF NOT EXISTS chunks (key TEXT PRIMARY KEY, data TEXT)")
+
+    def _conn(self):
+        # One connection per thread and per process, as in EmbeddingCache
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._conn().execute("SELECT data FROM chunks WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def set(self, key, chunks):
+        self._conn().execute("INSERT OR REPLACE INTO chunks VALUES (?, ?)", (key, json.dumps(chunks)))
+
+
+def load_chunks(pdf_path, chunk_size=2000, chunk_overlap=100, length_function=len, chunk_cache=None):
+    """
+    PyPDFLoader(pdf_path).load_and_split(RecursiveCharacterTextSplitter(...))
+    as in the notebook, served from 'chunk_cache' when the file and the
+    splitter settings are unchanged. Returns a list of LangChain Documents.
+    """
+    from langchain_core.documents import Document
+
+    key = f"{file_hash(pdf_path)}:{splitter_key(chunk_size, chunk_overlap, length_function)}"
+    stored = chunk_cache.get(key) if chunk_cache is not None else None
+    if stored is None:
+        from langchain_community.document_loaders import PyPDFLoader
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            length_function=length_function,
+            is_separator_regex=False,
+        )
+        chunks = PyPDFLoader(pdf_path).load_and_split(text_splitter=text_splitter)
+        stored = [{"page_content": c.page_content, "metadata": c.metadata} for c in chunks]
+        if chunk_cache is not None:
+            chunk_cache.set(key, stored)
+    return [Document(page_content=c["page_content"], metadata=c["metadata"]) for c in stored]
+
+
+def build_vectorstore(pdf_paths, embeddings, cache_path=EMBEDDING_CACHE_PATH, **splitter):
+    """
+    FAISS vectorstore over the chunks of every PDF in 'pdf_paths', embedding
+    only chunks not already cached for this embedding model.
+    Returns (vectorstore, report) where report counts chunks, cache hits and
+    newly embedded chunks.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    start = time.monotonic()
+    settings = dict(DEFAULT_SPLITTER, **splitter)
+    chunk_cache = ChunkCache(cache_path)
+    chunks = []
+    for path in pdf_paths:
+        chunks.extend(load_chunks(path, chunk_cache=chunk_cache, **settings))
+
+    cached = CachedEmbeddings(embeddings, cache=EmbeddingCache(cache_path))
+    vectorstore = FAISS.from_documents(chunks, embedding=cached)
+    report = {
+        "chunks": len(chunks),
+        "cached": cached.stats["hits"],
+        "embedded": cached.stats["embedded"],
+        "seconds": time.monotonic() - start,
+    }
+    return vectorstore, report
@@ -0,0 +1,143 @@
+# helpers/pdf_pipeline.py
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from helpers.embedding_cache import CachedEmbeddings
+
+# Streaming PDF ingestion, a fixed chain of stages:
+#
+#   page ranges -> [process pool: extract text + split] -> chunks -> batches
+#     -> embed -> IndexWriter (helpers/index_store.py)
+#
+# Pages are read lazily, a few per task, by a pool of worker processes that
+# also split them into chunks, so parsing runs on every core. The parent
+# keeps at most 'max_pending' tasks in flight and embeds each batch while the
+# workers extract the next pages. Chunk text goes straight to the index's
+# SQLite docstore, so memory is bounded by the in-flight pages and one batch,
+# not by the size of the documents (only the vectors stay in memory until
+# the index is written).
+PAGES_PER_TASK = int(os.getenv("RAG_PAGES_PER_TASK", "8"))
+EMBED_BATCH_SIZE = int(os.getenv("RAG_EMBED_BATCH_SIZE", "64"))
+
+# Per worker process: the PdfReader of the file it last worked on
+_reader = {"path": None, "reader": None}
+
+
+def _open_reader(path):
+    from pypdf import PdfReader
+
+    if _reader["path"] != path:
+        _reader["path"], _reader["reader"] = path, PdfReader(path)
+    return _reader["reader"]
+
+
+def page_count(path):
+    """Pages of a PDF, without extracting any of them."""
+    return len(_open_reader(path).pages)
+
+
+def extract_and_split(path, start, stop, splitter_settings):
+    """
+    Worker task: text of pages [start, stop) of 'path', split like
+    PyPDFLoader(...).load_and_split (each page on its own). Returns a list of
+    (text, metadata) chunks in page order.
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(is_separator_regex=False, **splitter_settings)
+    reader = _open_reader(path)
+    chunks = []
+    for page_no in range(start, stop):
+        text = reader.pages[page_no].extract_text() or ""
+        metadata = {"source": path, "page": page_no}
+        chunks.extend((piece, metadata) for piece in splitter.split_text(text))
+    return chunks
+
+
+def page_tasks(pdf_paths, pages_per_task=PAGES_PER_TASK):
+    """Lazily yield (path, start, stop) page ranges over every PDF."""
+    for path in pdf_paths:
+        pages = page_count(path)
+        for start in range(0, pages, pages_per_task):
+            yield path, start, min(start + pages_per_task, pages)
+
+
+def stream_chunks(pdf_paths, chunk_size=2000, chunk_overlap=100, workers=None,
+                  pages_per_task=PAGES_PER_TASK, max_pending=None):
+    """
+    Generator of (text, metadata) chunks of 'pdf_paths' in document and page
+    order, extracted and split by a process pool. At most 'max_pending' page
+    ranges (default: 2 per worker) are in flight or waiting to be consumed.
+    """
+    settings = {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 2 * workers
+    tasks = page_tasks(pdf_paths, pages_per_task)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(extract_and_split, *task, settings))
+            if len(pending) >= max_pending:
+                # Oldest first keeps the output in page order
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def batched(iterable, size):
+    """Lists of up to 'size' consecutive items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_pdfs(pdf_paths, embeddings, path, chunk_size=2000, chunk_overlap=100,
+                batch_size=EMBED_BATCH_SIZE, workers=None, cache=True, storage=None):
+    """
+    Stream 'pdf_paths' into a new version of the index at 'path' (load it
+    with helpers.index_store.load_index). Embeddings go through the
+    persistent cache unless cache=False. 'storage' compresses the vectors
+    (see helpers/quantize.py). Returns a report dict.
+    """
+    import numpy as np
+    from langchain_core.documents import Document
+    from helpers.index_store import IndexWriter
+    from helpers.quantize import INDEX_STORAGE
+
+    start = time.monotonic()
+    embedder = CachedEmbeddings(embeddings) if cache else embeddings
+    writer = IndexWriter(path, storage=storage or INDEX_STORAGE)
+    batches = 0
+    try:
+        chunks = stream_chunks(pdf_paths, chunk_size, chunk_overlap, workers)
+        for batch in batched(chunks, batch_size):
+            vectors = np.asarray(embedder.embed_documents([text for text, _ in batch]), dtype=np.float32)
+            writer.add(vectors, [Document(page_content=text, metadata=metadata) for text, metadata in batch])
+            batches += 1
+        version_dir = writer.commit({
+            "sources": [os.path.basename(p) for p in pdf_paths],
+            "chunk_size": chunk_size,
+            "chunk_overlap": chunk_overlap,
+        })
+    except BaseException:
+        writer.abort()
+        raise
+
+    report = {
+        "chunks": writer.count,
+        "batches": batches,
+        "seconds": time.monotonic() - start,
+        "version": version_dir,
+    }
+    if cache:
+        report.update(cached=embedder.stats["hits"], embedded=embedder.stats["embedded"])
+    return report
@@ -0,0 +1,177 @@
+# helpers/quantize.py
+
+import os
+import warnings
+import numpy as np
+
+# Compressed vector storage for the FAISS indexes (helpers/index_store.py,
+# helpers/ann_index.py). Bytes per vector, for d dimensions:
+#   "float32"  4d  exact (IndexFlat)
+#   "float16"  2d  half precision (SQfp16); scores almost unchanged
+#   "int8"     d   per-dimension 8-bit scalar quantization (SQ8), trained on
+#                  the value range of each dimension
+#   "pq"       d/PQ_DIMS_PER_CODE  product quantization: the vector is cut
+#                  into sub-vectors, each stored as one byte (a k-means code)
+# Lossy storage ranks a little differently from the exact vectors. With
+# re-scoring, the compressed index fetches RESCORE_FACTOR x k candidates and
+# they are re-ranked by exact distance against the float32 vectors, kept in
+# a .npy file next to the index and memory-mapped: only the rows of the
+# candidates are read, so they cost page cache, not process memory.
+STORAGES = ("float32", "float16", "int8", "pq")
+INDEX_STORAGE = os.getenv("RAG_INDEX_STORAGE", "float32")
+PQ_DIMS_PER_CODE = int(os.getenv("RAG_PQ_DIMS_PER_CODE", "8"))
+RESCORE_FACTOR = int(os.getenv("RAG_RESCORE_FACTOR", "4"))
+# PQ trains a 256-centroid k-means per code; 64 points per centroid is plenty
+TRAINING_SAMPLE = int(os.getenv("RAG_QUANTIZER_TRAINING_SAMPLE", "16384"))
+EXACT_VECTORS_FILE = "vectors.npy"
+
+
+def pq_subquantizers(dim, dims_per_code=PQ_DIMS_PER_CODE):
+    """Largest number of PQ codes that divides 'dim' with >= dims_per_code dimensions each."""
+    for m in range(max(1, dim // dims_per_code), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _pq_bits(count):
+    # k-means of 2^bits centroids per code wants >= 39 training points each
+    return min(8, int(np.log2(max(count, 1) / 39))) if count >= 39 * 16 else 0
+
+
+def effective_storage(storage, count):
+    """
+    The storage 'count' vectors actually get: "pq" falls back to "int8"
+    (with a warning) when there are too few vectors to train it. Record
+    this one in index metadata.
+    """
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown vector storage {storage!r}; expected one of {STORAGES}")
+    if storage == "pq" and _pq_bits(count) < 4:
+        warnings.warn(f"Only {count} vectors, too few to train product quantization; storing int8 instead",
+                      stacklevel=2)
+        return "int8"
+    return storage
+
+
+def storage_key(storage, dim, count):
+    """
+    faiss index_factory suffix ("Flat", "SQfp16", "SQ8", "PQ<m>x<bits>")
+    for 'storage'; resolve it with effective_storage() first.
+    """
+    if storage == "float32":
+        return "Flat"
+    if storage == "float16":
+        return "SQfp16"
+    if storage == "int8":
+        return "SQ8"
+    if storage == "pq":
+        bits = _pq_bits(count)
+        if bits < 4:
+            raise ValueError(f"Only {count} vectors, too few to train product quantization")
+        return f"PQ{pq_subquantizers(dim)}x{bits}"
+    raise ValueError(f"Unknown vector storage {storage!r}; expected one of {STORAGES}")
+
+
+def training_sample(vectors, size=TRAINING_SAMPLE, seed=0):
+    """Up to 'size' random rows of 'vectors' for training a quantizer."""
+    if len(vectors) <= size:
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+    rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size, replace=False))
+    return np.ascontiguousarray(vectors[rows], dtype=np.float32)
+
+
+def add_in_batches(index, vectors, batch=65536):
+    """index.add without converting all of 'vectors' (e.g. a memmap) at once."""
+    for start in range(0, len(vectors), batch):
+        index.add(np.ascontiguousarray(vectors[start:start + batch], dtype=np.float32))
+
+
+def quantized_index(vectors, storage, metric):
+    """
+    Trained flat index of 'vectors' in 'storage' (see STORAGES, already
+    resolved with effective_storage) for faiss 'metric'.
+    """
+    import faiss
+
+    index = faiss.index_factory(vectors.shape[1], storage_key(storage, vectors.shape[1], len(vectors)), metric)
+    if not index.is_trained:
+        index.train(training_sample(vectors))
+    add_in_batches(index, vectors)
+    return index
+
+
+def flat_vectors(index):
+    """The float32 vectors of a faiss IndexFlat as an (n, d) array, without a copy."""
+    import faiss
+
+    flat = faiss.downcast_index(index)
+    return faiss.rev_swig_ptr(flat.get_xb(), flat.ntotal * flat.d).reshape(flat.ntotal, flat.d)
+
+
+def save_exact(path, vectors):
+    """Write float32 'vectors' for re-scoring (memory-mapped by load_exact)."""
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=vectors.shape)
+    for start in range(0, len(vectors), 65536):
+        out[start:start + 65536] = vectors[start:start + 65536]
+    out.flush()
+    del out
+
+
+def load_exact(path):
+    return np.load(path, mmap_mode="r")
+
+
+def rescored_search(index, exact, queries, k, factor=RESCORE_FACTOR):
+    """
+    index.search for k * factor candidates, re-ranked by exact distance to
+    the rows of 'exact'. Same (distances, ids) contract as faiss: squared L2
+    ascending, or inner product descending.
+    """
+    import faiss
+
+    queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+    _, candidates = index.search(queries, k * factor)
+    inner = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    distances = np.full((len(queries), k), -np.inf if inner else np.inf, dtype=np.float32)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    for row, (query, found) in enumerate(zip(queries, candidates)):
+        found = found[found >= 0]
+        if not found.size:
+            continue
+        # Sorted ids read the memmap front to back
+        found = np.sort(found)
+        vectors = np.asarray(exact[found], dtype=np.float32)
+        scores = vectors @ query if inner else ((vectors - query) ** 2).sum(axis=1)
+        best = np.argsort(-scores if inner else scores, kind="stable")[:k]
+        distances[row, :len(best)] = scores[best]
+        ids[row, :len(best)] = found[best]
+    return distances, ids
+
+
+class RescoredIndex:
+    """
+    A compressed faiss index plus its exact vectors, searched with
+    rescored_search. Stands in for the faiss index of a LangChain FAISS
+    vectorstore (search, reconstruct, d, ntotal).
+    """
+
+    def __init__(self, index, exact, factor=RESCORE_FACTOR):
+        self.index = index
+        self.exact = exact
+        self.factor = factor
+        self.d = index.d
+        self.metric_type = index.metric_type
+
+    @property
+    def ntotal(self):
+        return self.index.ntotal
+
+    def search(self, queries, k):
+        return rescored_search(self.index, self.exact, queries, k, self.factor)
+
+    def reconstruct(self, i):
+        return np.array(self.exact[int(i)], dtype=np.float32)
+
+    def reconstruct_n(self, start, count):
+        return np.array(self.exact[start:start + count], dtype=np.float32)
@@ -0,0 +1,116 @@
+# helpers/sentence_embeddings.py
+
+import re
+import string
+import numpy as np
+
+# Batch sentence embeddings from word vectors (the GloVe model of
+# embeddings-intro, a gensim KeyedVectors). Same recipe as get_embedding in
+# the notebook, the mean of the word vectors, but for many sentences at once:
+#
+#   tokenize every sentence -> one flat array of word ids
+#     -> model.vectors[ids]        (a single gather)
+#     -> np.add.reduceat per sentence, / word counts   (mean pooling)
+#
+# Out-of-vocabulary words are skipped instead of raising KeyError; a sentence
+# with no known words gets the zero vector, which scores 0 against anything.
+# Scoring is one normalized matrix product, so every query against every
+# candidate costs a single BLAS call.
+_STRIP = string.punctuation + "“”‘’—–…"
+_WORD = re.compile(r"\S+")
+
+
+def tokenize(sentence):
+    """
+    Lowercase words of 'sentence' (the GloVe vocabulary is lowercase),
+    without punctuation-only tokens and with punctuation stripped from
+    the ends of words ("park." -> "park").
+    """
+    words = []
+    for token in _WORD.findall(sentence.lower()):
+        word = token.strip(_STRIP)
+        if word:
+            words.append(word)
+    return words
+
+
+class SentenceEncoder:
+    """
+    Mean-pooled sentence embeddings over a gensim KeyedVectors 'model'
+    (anything with .key_to_index and .vectors).
+
+        encoder = SentenceEncoder(model)
+        vectors = encoder.encode(sentences)          # (n, dim) float32
+        scores = cosine_similarity_matrix(vectors[:1], vectors)
+
+        oov = {}
+        encoder.encode(sentences, oov=oov)           # also counts skipped words
+    """
+
+    def __init__(self, model):
+        self.key_to_index = model.key_to_index
+        self.vectors = np.asarray(model.vectors, dtype=np.float32)
+        self.dim = self.vectors.shape[1]
+
+    def word_ids(self, sentences, oov=None):
+        """
+        Flat array of vocabulary ids for every known word of every sentence,
+        and the number of known words per sentence. Unknown words are
+        counted into the dict 'oov' when one is given.
+        """
+        lookup = self.key_to_index.get
+        ids, counts = [], np.zeros(len(sentences), dtype=np.int64)
+        oov = {} if oov is None else oov
+        for i, sentence in enumerate(sentences):
+            for word in tokenize(sentence):
+                index = lookup(word)
+                if index is None:
+                    oov[word] = oov.get(word, 0) + 1
+                else:
+                    ids.append(index)
+                    counts[i] += 1
+        return np.asarray(ids, dtype=np.int64), counts
+
+    def encode(self, sentences, oov=None):
+        """
+        (len(sentences), dim) float32 matrix of mean word vectors. Skipped
+        words are added to the dict 'oov' (word -> count) when one is given.
+        """
+        ids, counts = self.word_ids(sentences, oov)
+        embeddings = np.zeros((len(sentences), self.dim), dtype=np.float32)
+        known = counts > 0
+        if not ids.size:
+            return embeddings
+        gathered = self.vectors[ids]
+        # Start of each non-empty sentence's run in 'gathered'; reduceat on
+        # empty segments would repeat the next row, so they are left out
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[known]
+        embeddings[known] = np.add.reduceat(gathered, starts, axis=0) / counts[known, None]
+        return embeddings
+
+    def similarity(self, queries, candidates, oov=None):
+        """
+        Cosine similarity of every query sentence to every candidate
+        sentence; words skipped on either side are counted into 'oov'.
+        """
+        return cosine_similarity_matrix(self.encode(queries, oov), self.encode(candidates, oov))
+
+
+def normalize_rows(matrix):
+    """Rows scaled to unit length; all-zero rows stay zero."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def cosine_similarity_matrix(queries, candidates):
+    """(n_queries, n_candidates) cosine similarities as one matrix product."""
+    return normalize_rows(np.atleast_2d(queries)) @ normalize_rows(np.atleast_2d(candidates)).T
+
+
+def top_k(scores, k):
+    """Indices of the k best candidates per row of 'scores', best first."""
+    k = min(k, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, best, axis=1), axis=1)
+    return np.take_along_axis(best, order, axis=1)
@@ -0,0 +1,66 @@
+import numpy as np
+
+from helpers.bm25 import BM25Builder, BM25Index, pack_terms, unpack_terms
+
+TEXTS = [
+    "The history of all hitherto existing society is the history of class struggles.",
+    "Freeman and slave, patrician and plebeian, lord and serf.",
+    "A spectre is haunting Europe, the spectre of communism.",
+    "Naïve café owners and their ünïcode menus.",
+    "",
+    "Society as a whole is more and more splitting up into two great hostile camps.",
+]
+
+
+def build(texts, **kwargs):
+    builder = BM25Builder(**kwargs)
+    for position, text in enumerate(texts):
+        builder.add(position, text)
+    return builder.build()
+
+
+def assert_same(a, b):
+    assert a.terms == b.terms
+    for name in ("offsets", "doc_ids", "tfs", "doc_len"):
+        np.testing.assert_array_equal(getattr(a, name), getattr(b, name))
+
+
+def test_pack_terms_round_trip():
+    terms = ["", "a", "café", "ünïcode", "x" * 300]
+    assert unpack_terms(*pack_terms(terms)) == terms
+
+
+def test_spilled_runs_match_in_memory_build(tmp_path):
+    in_memory = build(TEXTS * 3)
+    spilled = build(TEXTS * 3, spill_dir=str(tmp_path), spill_postings=5)
+    assert_same(in_memory, spilled)
+    # The run files are removed once merged
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_search_ranks_matching_document_first():
+    index = build(TEXTS)
+    positions, scores = index.search("spectre communism", 3)
+    assert positions[0] == 2
+    assert np.all(np.diff(scores) <= 0)
+
+
+def test_save_and_load(tmp_path):
+    index = build(TEXTS)
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path))
+    assert_same(index, loaded)
+    assert loaded.covers("café", 1)
+
+
+def test_load_fixed_width_terms(tmp_path):
+    # Indexes written before the vocabulary became a byte buffer
+    index = build(TEXTS)
+    np.savez(tmp_path / "bm25.npz", terms=np.array(index.terms, dtype=str), offsets=index.offsets,
+             doc_ids=index.doc_ids, tfs=index.tfs, doc_len=index.doc_len)
+    assert_same(index, BM25Index.load(str(tmp_path)))
+
+
+def test_empty_index():
+    positions, scores = BM25Builder().build().search("anything", 3)
+    assert len(positions) == 0 and len(scores) == 0
@@ -0,0 +1,31 @@
+import random
+
+from helpers.embedding_client import pack_batches
+
+
+def check(token_counts, max_tokens, max_items):
+    batches = pack_batches(token_counts, max_tokens=max_tokens, max_items=max_items)
+    # Consecutive ranges covering every position once
+    assert [i for start, stop in batches for i in range(start, stop)] == list(range(len(token_counts)))
+    for start, stop in batches:
+        assert stop - start <= max_items
+        tokens = sum(token_counts[start:stop])
+        assert tokens <= max_tokens or stop - start == 1
+    return batches
+
+
+def test_token_and_item_limits():
+    assert check([3, 3, 3, 3], max_tokens=6, max_items=10) == [(0, 2), (2, 4)]
+    assert check([1] * 5, max_tokens=100, max_items=2) == [(0, 2), (2, 4), (4, 5)]
+
+
+def test_oversized_item_gets_its_own_batch():
+    assert check([2, 50, 2], max_tokens=10, max_items=10) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_random_inputs():
+    rng = random.Random(0)
+    for _ in range(200):
+        counts = [rng.randint(1, 40) for _ in range(rng.randint(0, 60))]
+        check(counts, max_tokens=rng.randint(10, 120), max_items=rng.randint(1, 16))
+    assert pack_batches([]) == []
@@ -0,0 +1,18 @@
+from helpers.hybrid import reciprocal_rank_fusion
+
+
+def test_item_ranked_well_by_both_lists_wins():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c", "a"]])
+    assert fused[0] == "b"
+    assert set(fused) == {"a", "b", "c"}
+
+
+def test_scores_follow_rrf_formula():
+    # a: 1/61 + 1/63, d: 1/61, c: 1/62 + 1/62
+    fused = reciprocal_rank_fusion([["a", "c"], ["d", "c", "a"]], rrf_k=60)
+    assert fused == ["a", "c", "d"]
+
+
+def test_single_ranking_keeps_its_order():
+    assert reciprocal_rank_fusion([[3, 1, 2]]) == [3, 1, 2]
+    assert reciprocal_rank_fusion([]) == []
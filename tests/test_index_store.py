@@ -0,0 +1,15 @@
+import os
+
+from helpers.index_store import current_version, new_version, prune_versions, publish_version
+
+
+def test_publish_and_prune_versions(tmp_path):
+    path = str(tmp_path)
+    assert current_version(path) is None
+    versions = [new_version(path) for _ in range(4)]
+    publish_version(path, versions[-1])
+    assert current_version(path) == os.path.join(path, versions[-1])
+
+    prune_versions(path, keep=2)
+    assert sorted(d for d in os.listdir(path) if d.startswith("v")) == sorted(versions[-2:])
+    assert not any(name.endswith(".tmp") for name in os.listdir(path))
@@ -0,0 +1,30 @@
+import os
+
+from helpers.ingest import ChunkCache, file_hash, splitter_key
+
+
+def test_chunk_cache_round_trip(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache.sqlite3"))
+    chunks = [{"page_content": "text", "metadata": {"page": 1}}]
+    assert cache.get("missing") is None
+    cache.set("key", chunks)
+    assert cache.get("key") == chunks
+
+
+def test_chunk_cache_reuses_its_connection(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache.sqlite3"))
+    open_files = len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None
+    for i in range(200):
+        cache.set(str(i), [])
+        cache.get(str(i))
+    if open_files is not None:
+        assert len(os.listdir("/proc/self/fd")) <= open_files + 1
+
+
+def test_keys_change_with_content_and_settings(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_bytes(b"one")
+    first = file_hash(str(path))
+    path.write_bytes(b"two")
+    assert file_hash(str(path)) != first
+    assert splitter_key(2000, 100) != splitter_key(2000, 200)
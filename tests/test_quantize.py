@@ -0,0 +1,55 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from helpers.quantize import effective_storage, load_exact, pq_subquantizers, quantized_index, save_exact, \
+    rescored_search, storage_key
+
+faiss = pytest.importorskip("faiss")
+
+
+def vectors(n=2000, dim=32, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_pq_falls_back_to_int8_with_a_warning():
+    with pytest.warns(UserWarning):
+        assert effective_storage("pq", 100) == "int8"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        assert effective_storage("pq", 100_000) == "pq"
+        assert effective_storage("float16", 10) == "float16"
+    with pytest.raises(ValueError):
+        effective_storage("int4", 10)
+    with pytest.raises(ValueError):
+        storage_key("pq", 32, 100)
+
+
+def test_pq_subquantizers_divide_the_dimension():
+    for dim in (32, 50, 300, 384, 1536):
+        m = pq_subquantizers(dim)
+        assert dim % m == 0 and m >= 1
+
+
+def test_exact_vectors_round_trip(tmp_path):
+    data = vectors()
+    save_exact(str(tmp_path / "vectors.npy"), data)
+    np.testing.assert_array_equal(load_exact(str(tmp_path / "vectors.npy")), data)
+
+
+@pytest.mark.parametrize("storage", ["float32", "float16", "int8"])
+def test_quantized_vectors_reconstruct_closely(storage):
+    data = vectors()
+    index = quantized_index(data, storage, faiss.METRIC_INNER_PRODUCT)
+    error = np.abs(index.reconstruct_n(0, len(data)) - data).max()
+    assert error < {"float32": 1e-6, "float16": 1e-2, "int8": 0.1}[storage]
+
+
+def test_rescoring_restores_exact_top_hits():
+    data = vectors()
+    queries = data[:20]
+    index = quantized_index(data, "int8", faiss.METRIC_INNER_PRODUCT)
+    _, ids = rescored_search(index, data, queries, k=5)
+    _, exact = faiss.knn(queries, data, 5, metric=faiss.METRIC_INNER_PRODUCT)
+    np.testing.assert_array_equal(ids[:, 0], exact[:, 0])
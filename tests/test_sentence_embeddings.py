@@ -0,0 +1,41 @@
+import numpy as np
+
+from helpers.sentence_embeddings import SentenceEncoder, cosine_similarity_matrix, tokenize, top_k
+
+
+class FakeModel:
+    """The two attributes SentenceEncoder reads from gensim KeyedVectors."""
+
+    def __init__(self, words, dim=8, seed=0):
+        self.key_to_index = {w: i for i, w in enumerate(words)}
+        self.vectors = np.random.default_rng(seed).standard_normal((len(words), dim)).astype(np.float32)
+
+
+MODEL = FakeModel(["i", "took", "my", "dog", "to", "the", "park", "a", "puppy", "cats"])
+
+
+def test_tokenize_strips_punctuation():
+    assert tokenize("I took my dog to the park.") == ["i", "took", "my", "dog", "to", "the", "park"]
+    assert tokenize(" -- ") == []
+
+
+def test_encode_is_the_mean_of_known_word_vectors():
+    encoder = SentenceEncoder(MODEL)
+    vectors = encoder.encode(["my dog", "unknown words only", "the park"])
+    ids = MODEL.key_to_index
+    np.testing.assert_allclose(vectors[0], (MODEL.vectors[ids["my"]] + MODEL.vectors[ids["dog"]]) / 2, rtol=1e-6)
+    np.testing.assert_array_equal(vectors[1], np.zeros(8, dtype=np.float32))
+    np.testing.assert_allclose(vectors[2], (MODEL.vectors[ids["the"]] + MODEL.vectors[ids["park"]]) / 2, rtol=1e-6)
+
+
+def test_oov_words_accumulate_across_calls():
+    encoder = SentenceEncoder(MODEL)
+    oov = {}
+    encoder.similarity(["frobnicating the quux"], ["quux cats"], oov=oov)
+    assert oov == {"frobnicating": 1, "quux": 2}
+
+
+def test_top_k_matches_full_sort():
+    scores = cosine_similarity_matrix(np.random.default_rng(1).standard_normal((5, 8)),
+                                      np.random.default_rng(2).standard_normal((20, 8)))
+    np.testing.assert_array_equal(top_k(scores, 3), np.argsort(-scores, axis=1)[:, :3])